@@ -0,0 +1,270 @@
+"""
+Measures the export throughput and memory usage of the event exporters and of
+whole storage file exports, using synthetic plaso events.
+
+Usage (from the root of the repository):
+    python -m benchmarks.run --events 100000
+
+The memory held per file by the file system exporter's caches (reported as MB
+per million files) is best measured without a graph holding the triples:
+    python -m benchmarks.run --events 1000000 --mix fs:stat=1 --distinct 1 \
+        --graph stream --cases exporter:fs:stat
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+import case
+
+from benchmarks import synthetic
+from case_plaso import buffering, identifiers, plaso_exporter, progress, streaming
+
+
+def _peak_rss():
+    """Retrieves the peak resident set size of the current process in megabytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    if sys.platform == 'darwin':
+        peak //= 1024
+    return peak / 1024.0
+
+
+def _create_document(graph_type, buffer_events):
+    """Creates the document to export into and a function returning its triple count."""
+    if graph_type == 'stream':
+        graph = streaming.StreamingGraph(os.devnull)
+    else:
+        graph = case.Document().graph
+    if buffer_events:
+        document = case.Document(buffering.TripleBuffer(graph, flush_events=buffer_events))
+    else:
+        document = case.Document(graph)
+    return document, lambda: progress.count_triples(document.graph)
+
+
+def _run_case(task):
+    """Runs a single benchmark case. (Executed in a fresh worker process.)
+
+    Returns:
+        Dictionary containing the measurements.
+    """
+    name, data_types, options = task
+    mix = dict((data_type, options.mix[data_type]) for data_type in data_types)
+    generator = synthetic.EventGenerator(
+        mix=mix, path_depth=options.path_depth, distinct=options.distinct,
+        snapshots=options.snapshots, seed=options.seed)
+    document, triple_count = _create_document(options.graph, options.buffer_events)
+    # Multiple workers require content derived identifiers.
+    scheme = identifiers.ContentIdentifiers() if options.workers > 1 else None
+    exporter = plaso_exporter.PlasoExporter(
+        document, identifiers=scheme, read_ahead=options.read_ahead)
+
+    if name == 'export_storage_file':
+        temp_directory = tempfile.mkdtemp(prefix='case_plaso_benchmark_')
+        try:
+            storage_file = os.path.join(temp_directory, 'synthetic.plaso')
+            synthetic.write_storage_file(
+                storage_file, options.events, mix=mix, path_depth=options.path_depth,
+                distinct=options.distinct, snapshots=options.snapshots, seed=options.seed)
+            base_rss = _peak_rss()
+            start_time = time.time()
+            exporter.export_storage_file(storage_file, workers=options.workers)
+            seconds = time.time() - start_time
+        finally:
+            shutil.rmtree(temp_directory)
+    else:
+        events = list(generator.generate(options.events))
+        base_rss = _peak_rss()
+        start_time = time.time()
+        exporter.export_events(events)
+        seconds = time.time() - start_time
+
+    triples = triple_count()
+    # Number of files cached by the file system exporter. (Unknown if exported by workers.)
+    files = 0
+    if name != 'export_storage_file' or options.workers <= 1:
+        files = len(getattr(exporter._event_exporters.get('fs:stat'), '_path_spec_traces', ()))
+    peak_rss = _peak_rss()
+    return {
+        'name': name,
+        'events': options.events,
+        'seconds': seconds,
+        'events_per_second': options.events / seconds if seconds else 0.0,
+        'triples': triples,
+        'triples_per_second': triples / seconds if seconds else 0.0,
+        'base_rss_mb': base_rss,
+        'peak_rss_mb': peak_rss,
+        'files': files,
+        'mb_per_million_files': (peak_rss - base_rss) * 1000000 / files if files else 0.0,
+    }
+
+
+def _print_results(results):
+    print '{:<32} {:>10} {:>12} {:>10} {:>12} {:>10} {:>10} {:>10}'.format(
+        'case', 'seconds', 'events/s', 'triples', 'triples/s', 'base MB', 'peak MB',
+        'MB/M files')
+    for result in results:
+        print '{name:<32} {seconds:>10.2f} {events_per_second:>12.0f} {triples:>10} ' \
+              '{triples_per_second:>12.0f} {base_rss_mb:>10.1f} {peak_rss_mb:>10.1f} ' \
+              '{mb_per_million_files:>10.0f}'.format(**result)
+
+
+def _put_case_result(task, results):
+    """Runs a single benchmark case and puts its result on the queue."""
+    try:
+        results.put((True, _run_case(task)))
+    except Exception:
+        results.put((False, traceback.format_exc()))
+
+
+def _run_case_in_process(task):
+    """Runs a single benchmark case in a fresh process, so the peak memory usage is its own.
+
+    Unlike the processes of a multiprocessing.Pool, the process is not daemonic, so
+    the case can start worker processes of its own (e.g. with --workers).
+    """
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_put_case_result, args=(task, results))
+    process.start()
+    succeeded, result = results.get()
+    process.join()
+    if not succeeded:
+        raise RuntimeError('Benchmark case {} failed:\n{}'.format(task[0], result))
+    return result
+
+
+def _compare(results, baseline, tolerance):
+    """Compares results against a baseline.
+
+    Returns:
+        List of messages describing the cases that got slower than the tolerance allows.
+    """
+    baseline = dict((result['name'], result) for result in baseline)
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['name'])
+        if not previous or not previous['events_per_second']:
+            continue
+        change = result['events_per_second'] / previous['events_per_second'] - 1
+        if change < -tolerance:
+            regressions.append('{}: {:.0f} events/s, down {:.0%} from {:.0f} events/s'.format(
+                result['name'], result['events_per_second'], -change,
+                previous['events_per_second']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        'Plaso-CASE benchmarks',
+        description='Measures the throughput and memory usage of exporting synthetic '
+                    'plaso events.')
+    parser.add_argument(
+        '--events',
+        type=int,
+        default=10000,
+        help='Number of events to export in each case. (default: %(default)s)')
+    parser.add_argument(
+        '--mix',
+        type=synthetic.parse_mix,
+        default=synthetic.DEFAULT_MIX,
+        help='Comma separated data types and their relative weights, '
+             'e.g. "fs:stat=3,android:event:call=1". (default: all supported data types)')
+    parser.add_argument(
+        '--path-depth',
+        type=int,
+        default=5,
+        help='Number of path specs in the chain of each file. (default: %(default)s)')
+    parser.add_argument(
+        '--distinct',
+        type=float,
+        default=0.1,
+        help='Ratio of distinct files, contacts and accounts to events. (default: %(default)s)')
+    parser.add_argument(
+        '--snapshots',
+        type=int,
+        default=1,
+        help='Number of volume shadow snapshots the files are spread over. Files in '
+             'different snapshots share their path and content. (default: %(default)s)')
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+        help='Seed of the synthetic event generator. (default: %(default)s)')
+    parser.add_argument(
+        '--graph',
+        choices=('memory', 'stream'),
+        default='memory',
+        help='Export into an in-memory graph or stream N-Triples to /dev/null. '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '--buffer-events',
+        type=int,
+        default=0,
+        metavar='N',
+        help='Add the triples of this many events to the graph in bulk. (default: %(default)s)')
+    parser.add_argument(
+        '--read-ahead',
+        type=int,
+        default=0,
+        metavar='N',
+        help='Number of blocks of events the storage file export reads ahead in a thread '
+             'of its own. (default: %(default)s)')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Number of worker processes for the storage file export. (default: %(default)s)')
+    parser.add_argument(
+        '--cases',
+        help='Comma separated names of the cases to run. (default: all cases)')
+    parser.add_argument(
+        '--save',
+        metavar='FILE',
+        help='Write the results as JSON to this file.')
+    parser.add_argument(
+        '--compare',
+        metavar='FILE',
+        help='Compare the results with ones previously written by --save and exit with '
+             'an error if a case got slower.')
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.1,
+        help='Fraction by which events/s may drop before --compare reports a '
+             'regression. (default: %(default)s)')
+    options = parser.parse_args()
+
+    tasks = [('exporter:' + data_type, [data_type], options) for data_type in sorted(options.mix)]
+    tasks.append(('export_events', sorted(options.mix), options))
+    tasks.append(('export_storage_file', sorted(options.mix), options))
+    if options.cases:
+        names = options.cases.split(',')
+        tasks = [task for task in tasks if task[0] in names]
+
+    results = [_run_case_in_process(task) for task in tasks]
+    _print_results(results)
+
+    if options.save:
+        with open(options.save, 'w') as file_object:
+            json.dump(results, file_object, indent=2, sort_keys=True)
+
+    if options.compare:
+        with open(options.compare) as file_object:
+            regressions = _compare(results, json.load(file_object), options.tolerance)
+        if regressions:
+            print 'Performance regressions:'
+            for regression in regressions:
+                print '  ' + regression
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
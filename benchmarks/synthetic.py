@@ -0,0 +1,265 @@
+"""Generates synthetic plaso events and storage files for benchmarking."""
+
+import random
+
+from dfvfs.lib import definitions as dfvfs_definitions
+from dfvfs.path import factory as path_spec_factory
+from plaso.containers import event_sources, events, sessions
+from plaso.lib.eventdata import EventTimestamp
+from plaso.storage import zip_file
+
+
+# Default mix of data types, as relative weights.
+DEFAULT_MIX = {
+    'fs:stat': 40,
+    'fs:stat:ntfs': 20,
+    'android:event:call': 10,
+    'android:messaging:sms': 10,
+    'skype:event:chat': 10,
+    'skype:event:call': 5,
+    'skype:event:account': 5,
+}
+
+_FIRST_NAMES = ('Alice', 'Bob', 'Carol', 'Dave', 'Eve', 'Frank', 'Grace', 'Heidi')
+_LAST_NAMES = ('Smith', 'Jones', 'Brown', 'Taylor', 'Wilson', 'Davies', 'Evans')
+_EXTENSIONS = ('.txt', '.doc', '.jpg', '.exe', '.dll', '.log', '')
+
+
+def parse_mix(expression):
+    """Parses a data type mix expression. (e.g. 'fs:stat=3,android:event:call=1')
+
+    Returns:
+        Dictionary of data types and their relative weights.
+    """
+    mix = {}
+    for item in expression.split(','):
+        data_type, _, weight = item.strip().partition('=')
+        mix[data_type] = int(weight) if weight else 1
+    return mix
+
+
+class EventGenerator(object):
+    """Generates a reproducible stream of synthetic plaso events.
+
+    Events refer to a limited pool of files, contacts and accounts, so the
+    exporters' deduplication caches are exercised the way they are by real
+    storage files.
+    """
+
+    # Timestamp of the first event. (2016-09-08 in microseconds since epoch)
+    START_TIMESTAMP = 1473363328000000
+
+    def __init__(self, mix=None, path_depth=5, distinct=0.1, snapshots=1, seed=0):
+        """Initializes EventGenerator.
+
+        Args:
+            mix: Dictionary of data types and their relative weights.
+                Data types without a generator get a generic event.
+            path_depth: Number of path specs in the chain of each file.
+            distinct: Ratio of distinct files, contacts and accounts to events.
+            snapshots: Number of volume shadow snapshots the files are spread over.
+                Files in different snapshots share their path and content (hashes).
+            seed: Seed of the random number generator.
+        """
+        self.mix = mix or DEFAULT_MIX
+        self.path_depth = path_depth
+        self.distinct = distinct
+        self.snapshots = snapshots
+        self._random = random.Random(seed)
+        self._data_types = sorted(self.mix)
+        self._weights = [self.mix[data_type] for data_type in self._data_types]
+        self._pool_size = 1
+        self._path_specs = {}
+
+    def _choose_data_type(self):
+        point = self._random.uniform(0, sum(self._weights))
+        for data_type, weight in zip(self._data_types, self._weights):
+            point -= weight
+            if point <= 0:
+                return data_type
+        return self._data_types[-1]
+
+    def _choose(self, prefix):
+        """Chooses one of a pool of identifiers, which grows with the number of events."""
+        return u'{}{}'.format(prefix, self._random.randrange(self._pool_size))
+
+    def _name(self, index):
+        return u'{} {}'.format(
+            _FIRST_NAMES[index % len(_FIRST_NAMES)], _LAST_NAMES[index % len(_LAST_NAMES)])
+
+    def path_spec(self, index, location=None):
+        """Creates the path spec chain of the file with the given index.
+
+        The file is stored on a volume shadow snapshot in a partition of an EWF
+        image. Deeper chains continue into files within zip archives and gzip
+        compressed files. Shallower chains leave out the outer layers.
+        """
+        if index in self._path_specs:
+            return self._path_specs[index]
+
+        new_path_spec = path_spec_factory.Factory.NewPathSpec
+        path_spec = new_path_spec(dfvfs_definitions.TYPE_INDICATOR_OS, location=u'/cases/image.E01')
+        layers = [
+            lambda parent: new_path_spec(dfvfs_definitions.TYPE_INDICATOR_EWF, parent=parent),
+            lambda parent: new_path_spec(
+                dfvfs_definitions.TYPE_INDICATOR_TSK_PARTITION, location=u'/p1', part_index=2,
+                start_offset=1048576, parent=parent),
+            lambda parent: new_path_spec(
+                dfvfs_definitions.TYPE_INDICATOR_VSHADOW,
+                location=u'/vss{}'.format(index % self.snapshots + 1),
+                store_index=index % self.snapshots, parent=parent)]
+        for create in layers[:max(0, self.path_depth - 2)]:
+            path_spec = create(path_spec)
+
+        content = index // self.snapshots
+        if location is None:
+            location = u'/Users/user{}/dir{}/file{}{}'.format(
+                content % 10, content % 100, content, _EXTENSIONS[content % len(_EXTENSIONS)])
+        path_spec = new_path_spec(
+            dfvfs_definitions.TYPE_INDICATOR_TSK, location=location, inode=1000 + content,
+            parent=path_spec)
+
+        for level in range(max(0, self.path_depth - 5)):
+            if level % 2:
+                path_spec = new_path_spec(dfvfs_definitions.TYPE_INDICATOR_GZIP, parent=path_spec)
+            else:
+                path_spec = new_path_spec(
+                    dfvfs_definitions.TYPE_INDICATOR_ZIP,
+                    location=u'/archive{}/file{}.gz'.format(level, content), parent=path_spec)
+
+        self._path_specs[index] = path_spec
+        return path_spec
+
+    def _fs_stat(self, event):
+        index = self._random.randrange(self._pool_size)
+        event.pathspec = self.path_spec(index)
+        event.timestamp_desc = self._random.choice((u'atime', u'ctime', u'crtime', u'mtime'))
+        event.file_system_type = u'TSK'
+        event.file_entry_type = 5
+        event.is_allocated = self._random.random() > 0.1
+        content = index // self.snapshots
+        event.file_size = content * 512
+        event.inode = 1000 + content
+        if self._random.random() > 0.5:
+            event.md5_hash = u'{:032x}'.format(content)
+            event.sha256_hash = u'{:064x}'.format(content)
+
+    def _fs_stat_ntfs(self, event):
+        index = self._random.randrange(self._pool_size)
+        event.pathspec = self.path_spec(-1, location=u'/$MFT')
+        event.timestamp_desc = self._random.choice((
+            EventTimestamp.CREATION_TIME, EventTimestamp.MODIFICATION_TIME,
+            EventTimestamp.ACCESS_TIME, EventTimestamp.ENTRY_MODIFICATION_TIME))
+        event.attribute_type = 0x30
+        event.file_attribute_flags = 0x20
+        event.file_reference = (1 << 48) | index
+        event.parent_file_reference = (1 << 48) | (index // 10)
+        event.is_allocated = True
+        event.name = u'file{}'.format(index)
+
+    def _android_call(self, event):
+        index = self._random.randrange(self._pool_size)
+        event.timestamp_desc = self._random.choice((u'Call Started', u'Call Ended'))
+        event.call_type = self._random.choice((u'INCOMING', u'OUTGOING', u'MISSED', u'UNKNOWN'))
+        event.duration = self._random.randrange(3600)
+        event.name = self._name(index)
+        event.number = u'555{:07d}'.format(index)
+        event.offset = index
+
+    def _android_sms(self, event):
+        index = self._random.randrange(self._pool_size)
+        event.timestamp_desc = u'Creation Time'
+        event.address = u'555{:07d}'.format(index)
+        event.body = u'Message {} to {}'.format(self._random.randrange(1 << 32), index)
+        event.sms_read = self._random.choice((u'READ', u'UNREAD', u'UNKNOWN'))
+        event.sms_type = self._random.choice((u'RECEIVED', u'SENT', u'UNKNOWN'))
+        event.offset = index
+
+    def _skype_chat(self, event):
+        author = self._random.randrange(self._pool_size)
+        event.timestamp_desc = u'Creation Time'
+        event.from_account = u'{} <{}>'.format(self._name(author), self._choose(u'user'))
+        event.to_account = u', '.join(
+            self._choose(u'user') for _ in range(self._random.randint(1, 3)))
+        event.title = self._choose(u'Chat ')
+        event.text = u'Message {}'.format(self._random.randrange(1 << 32))
+
+    def _skype_call(self, event):
+        event.timestamp_desc = u'Call'
+        event.call_type = self._random.choice((u'WAITING', u'ACCEPTED', u'FINISHED'))
+        event.src_call = self._choose(u'user')
+        event.dst_call = self._choose(u'user')
+        event.user_start_call = self._random.random() > 0.5
+        event.video_conference = self._random.random() > 0.8
+
+    def _skype_account(self, event):
+        index = self._random.randrange(self._pool_size)
+        event.timestamp_desc = self._random.choice((u'Profile Changed', u'Last Online'))
+        event.username = u'{} <{}>'.format(self._name(index), self._choose(u'user'))
+        event.display_name = self._name(index)
+        event.email = u'user{}@example.com'.format(index)
+        event.country = u'US'
+
+    def _generic(self, event):
+        event.timestamp_desc = u'Last Visited Time'
+        event.url = u'http://example.com/{}'.format(self._random.randrange(1 << 32))
+        event.title = u'Page'
+
+    _GENERATORS = {
+        'fs:stat': _fs_stat,
+        'fs:stat:ntfs': _fs_stat_ntfs,
+        'android:event:call': _android_call,
+        'android:messaging:sms': _android_sms,
+        'skype:event:chat': _skype_chat,
+        'skype:event:call': _skype_call,
+        'skype:event:account': _skype_account,
+    }
+
+    def generate(self, count):
+        """Generates the given number of events, sorted by timestamp.
+
+        Yields:
+            plaso EventObjects.
+        """
+        self._pool_size = max(1, int(count * self.distinct))
+        timestamp = self.START_TIMESTAMP
+        for _ in xrange(count):
+            data_type = self._choose_data_type()
+            event = events.EventObject()
+            event.data_type = unicode(data_type)
+            # A few events share each timestamp, like they do in real storage files.
+            timestamp += self._random.randrange(3) * 1000000
+            event.timestamp = timestamp
+            self._GENERATORS.get(data_type, EventGenerator._generic)(self, event)
+            yield event
+
+    def path_specs(self):
+        """Retrieves the path specs of the files referred to by the generated events."""
+        return list(self._path_specs.values())
+
+
+def write_storage_file(path, count, **kwargs):
+    """Writes a plaso storage file containing synthetic events.
+
+    Args:
+        path: File path of the storage file to create.
+        count: Number of events to write.
+        **kwargs: Arguments for the EventGenerator.
+    """
+    generator = EventGenerator(**kwargs)
+    session = sessions.Session()
+    storage_file = zip_file.ZIPStorageFile()
+    storage_file.Open(path=path, read_only=False)
+    try:
+        storage_file.WriteSessionStart(session.CreateSessionStart())
+        for event in generator.generate(count):
+            storage_file.AddEvent(event)
+        for path_spec in generator.path_specs():
+            event_source = event_sources.FileEntryEventSource(path_spec=path_spec)
+            event_source.file_entry_type = dfvfs_definitions.FILE_ENTRY_TYPE_FILE
+            storage_file.AddEventSource(event_source)
+        session.parsers_counter['total'] = count
+        session.completion_time = session.start_time
+        storage_file.WriteSessionCompletion(session.CreateSessionCompletion())
+    finally:
+        storage_file.Close()
@@ -0,0 +1,123 @@
+"""Exporting many plaso storage files at once, each in a worker process of its own."""
+
+import copy
+import multiprocessing
+import os
+
+import case
+
+from case_plaso import event_filter, identifiers, plaso_exporter, sharding, streaming
+
+
+def output_file_names(storage_files, format):
+    """Generates the names of the output files of the given storage files.
+
+    Args:
+        storage_files: Paths to the plaso storage files.
+        format: The serialization format.
+
+    Returns:
+        List of file names, in the order of the storage files.
+
+    Raises:
+        ValueError: If two storage files would be written to the same output file.
+    """
+    extension = sharding.FORMAT_EXTENSIONS.get(format, '.' + format)
+    names = []
+    for storage_file in storage_files:
+        name = os.path.splitext(os.path.basename(storage_file))[0] + extension
+        if name in names:
+            raise ValueError('Storage files {} and {} have the same output file {}.'.format(
+                storage_files[names.index(name)], storage_file, name))
+        names.append(name)
+    return names
+
+
+def _export_storage_file(task):
+    """Worker process function exporting a single storage file into its output file.
+
+    Returns:
+        Tuple containing the path of the storage file, the path of the output file,
+        the number of written triples and the number of skipped events per data type.
+    """
+    storage_file, output_file, format, stream, data_type_filter, include_all_sources = task
+    # Count the skipped events of this storage file only (even when not in a worker).
+    data_type_filter = copy.deepcopy(data_type_filter)
+    if stream:
+        graph = streaming.create_streaming_graph(
+            output_file, format=format,
+            graph_name=streaming.storage_file_graph_name(storage_file))
+        document = case.Document(graph)
+    else:
+        graph = None
+        document = case.Document()
+    # Content derived identifiers let the outputs refer to the same files, tools
+    # and accounts, so they can be combined afterwards.
+    exporter = plaso_exporter.PlasoExporter(
+        document, identifiers=identifiers.ContentIdentifiers(),
+        data_type_filter=data_type_filter, include_all_sources=include_all_sources)
+    try:
+        exporter.export_storage_file(storage_file)
+    finally:
+        if graph:
+            graph.close()
+    if graph:
+        triple_count = graph.triple_count
+    else:
+        triple_count = len(document.graph)
+        document.serialize(format=format, destination=output_file)
+    return storage_file, output_file, triple_count, data_type_filter.skipped
+
+
+def export_storage_files(storage_files, output_directory, format='json-ld', stream=False,
+                         workers=1, data_type_filter=None, include_all_sources=False):
+    """Exports each of the given storage files into its own output file.
+
+    The storage files are spread over a pool of worker processes, each exporting
+    a whole storage file at a time. Every output file is complete on its own, so
+    traces found in more than one storage file (e.g. a shared image) are written
+    to each of their output files, with the same identifiers and properties.
+
+    Args:
+        storage_files: Paths to the plaso storage files.
+        output_directory: Directory to write the output files to, named after the
+            storage files. (Created if missing.)
+        format: The serialization format.
+        stream: Whether to write the triples as they are exported instead of
+            building each graph in memory first. (Requires one of streaming.FORMATS)
+        workers: Number of worker processes.
+        data_type_filter: Optional DataTypeFilter selecting the events to export.
+        include_all_sources: Whether to export every event source of the storage
+            files, instead of only the ones referred to by exported events.
+
+    Yields:
+        Tuples containing the path of a storage file, the path of its output file,
+        the number of written triples and the number of skipped events per data
+        type, in the order the exports finish.
+
+    Raises:
+        ValueError: If two storage files would be written to the same output file.
+    """
+    names = output_file_names(storage_files, format)
+    if not os.path.isdir(output_directory):
+        os.makedirs(output_directory)
+    if data_type_filter is None:
+        data_type_filter = event_filter.DataTypeFilter()
+    tasks = [
+        (storage_file, os.path.join(output_directory, name), format, stream, data_type_filter,
+         include_all_sources)
+        for storage_file, name in zip(storage_files, names)]
+
+    if workers <= 1:
+        for task in tasks:
+            yield _export_storage_file(task)
+        return
+
+    # Each worker only exports a single storage file, so the memory held by its
+    # caches is freed before it takes on the next one.
+    pool = multiprocessing.Pool(min(workers, len(tasks)), maxtasksperchild=1)
+    try:
+        for result in pool.imap_unordered(_export_storage_file, tasks, chunksize=1):
+            yield result
+    finally:
+        pool.terminate()
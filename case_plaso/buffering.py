@@ -0,0 +1,52 @@
+"""Buffering of exported triples, so they reach the graph in bulk."""
+
+from case_plaso import progress
+
+
+class TripleBuffer(object):
+    """Stand-in for an rdflib.Graph which collects added triples and passes them on
+    to the wrapped graph with a single addN() call when flushed.
+
+    Duplicate triples are passed on as-is. (Hashing rdflib terms to drop them costs
+    more than the wrapped graph spends on them.)
+
+    PlasoExporter flushes the buffer every flush_events events. Anything else done
+    with the buffer is passed on to the wrapped graph, after flushing.
+    """
+
+    def __init__(self, graph, flush_events=1000):
+        """Initializes TripleBuffer.
+
+        Args:
+            graph: rdflib Graph (or graph-like sink) to pass the triples on to.
+            flush_events: Number of exported events between flushes.
+        """
+        self.graph = graph
+        self.flush_events = flush_events
+        self._triples = []
+
+    def __getattr__(self, name):
+        self.flush()
+        return getattr(self.graph, name)
+
+    @property
+    def triple_count(self):
+        """Number of triples added to the wrapped graph, including the buffered ones."""
+        return progress.count_triples(self.graph) + len(self._triples)
+
+    def add(self, triple):
+        """Buffers the given (subject, predicate, object) triple."""
+        self._triples.append(triple)
+
+    def addN(self, quads):
+        """Buffers the given quads. The context is replaced by the wrapped graph."""
+        self._triples.extend(
+            (subject, predicate, object_) for subject, predicate, object_, _ in quads)
+
+    def flush(self):
+        """Passes the buffered triples on to the wrapped graph."""
+        if self._triples:
+            graph = self.graph
+            graph.addN(
+                (subject, predicate, object_, graph) for subject, predicate, object_ in self._triples)
+            self._triples = []
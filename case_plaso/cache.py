@@ -0,0 +1,285 @@
+"""Caches used by the event exporters to deduplicate exported nodes."""
+
+import collections
+import cPickle as pickle
+import cStringIO
+import os
+import sqlite3
+import tempfile
+
+from case_plaso import nodes
+
+
+class CountingDict(dict):
+    """Dictionary which counts the hits and misses of its lookups.
+
+    Membership tests, get() and item access each count as a lookup, so callers
+    look a key up once (e.g. with get()) rather than testing for it first.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CountingDict, self).__init__(*args, **kwargs)
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, key):
+        found = dict.__contains__(self, key)
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return found
+
+    def __contains__(self, key):
+        return self._count(key)
+
+    def __getitem__(self, key):
+        self._count(key)
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if self._count(key):
+            return dict.__getitem__(self, key)
+        return default
+
+
+class CountingSet(set):
+    """Set which counts the hits and misses of its membership tests."""
+
+    def __init__(self, *args, **kwargs):
+        super(CountingSet, self).__init__(*args, **kwargs)
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        found = set.__contains__(self, key)
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return found
+
+
+class MemoryCacheFactory(object):
+    """Default cache factory, which keeps every cache entry in memory."""
+
+    def __init__(self, counted=False):
+        """Initializes MemoryCacheFactory.
+
+        Args:
+            counted: Whether the caches should count their hits and misses.
+        """
+        self.counted = counted
+
+    def create_dict(self, document, name):
+        """Creates a dictionary-like cache.
+
+        Args:
+            document: CASE document the cached nodes are exported to.
+            name: Unique name of the cache.
+        """
+        return CountingDict() if self.counted else {}
+
+    def create_set(self, document, name):
+        """Creates a set-like cache."""
+        return CountingSet() if self.counted else set()
+
+    def commit(self):
+        """Makes the current contents of all caches durable. (Used for checkpoints.)"""
+
+    def close(self, remove=False):
+        """Releases the resources used by the caches.
+
+        Args:
+            remove: Whether to also remove any persisted cache entries.
+        """
+
+
+class DiskCache(object):
+    """Dictionary-like cache which keeps the most recently used entries in memory and
+    moves the rest into an SQLite table.
+
+    Keys and values may contain CASE API nodes. They are stored on disk as their
+    rdflib terms and come back as NodeRefs.
+    """
+
+    def __init__(self, document, connection, table, capacity):
+        """Initializes DiskCache.
+
+        Args:
+            document: CASE document the cached nodes are exported to.
+            connection: sqlite3 connection to store evicted entries in.
+            table: Name of the table to store evicted entries in.
+            capacity: Maximum number of entries to keep in memory.
+        """
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._document = document
+        self._connection = connection
+        self._table = table
+        # Maps keys to (value, dirty) tuples, ordered from least to most recently used.
+        # Dirty entries have not been written to disk yet.
+        self._memory = collections.OrderedDict()
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS "{}" (key BLOB PRIMARY KEY, value BLOB)'.format(table))
+
+    @staticmethod
+    def _encode(value):
+        return sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def _encode_key(key):
+        # cPickle doesn't memoize objects that are only referenced once, so equal keys
+        # could be pickled differently and miss their row. Without a memo they can't.
+        # (Keys are never recursive.)
+        file_object = cStringIO.StringIO()
+        pickler = pickle.Pickler(file_object, pickle.HIGHEST_PROTOCOL)
+        pickler.fast = True
+        pickler.dump(key)
+        return sqlite3.Binary(file_object.getvalue())
+
+    def _load(self, key):
+        """Retrieves the entry for the given dehydrated key, moving it to the front of the
+        memory cache.
+
+        Raises:
+            KeyError: If the key is not in the cache.
+        """
+        if key in self._memory:
+            self.hits += 1
+            entry = self._memory.pop(key)
+            self._memory[key] = entry
+            return entry[0]
+
+        row = self._connection.execute(
+            'SELECT value FROM "{}" WHERE key = ?'.format(self._table),
+            (self._encode_key(key),)).fetchone()
+        if row is None:
+            self.misses += 1
+            raise KeyError(key)
+        self.hits += 1
+        value = nodes.rehydrate(self._document, pickle.loads(bytes(row[0])))
+        self._store(key, value, dirty=False)
+        return value
+
+    def _store(self, key, value, dirty=True):
+        self._memory.pop(key, None)
+        self._memory[key] = (value, dirty)
+        while len(self._memory) > self.capacity:
+            evicted_key, (evicted_value, evicted_dirty) = self._memory.popitem(last=False)
+            if evicted_dirty:
+                self._write(evicted_key, evicted_value)
+
+    def _write(self, key, value):
+        self._connection.execute(
+            'INSERT OR REPLACE INTO "{}" (key, value) VALUES (?, ?)'.format(self._table),
+            (self._encode_key(key), self._encode(nodes.dehydrate(value))))
+
+    def __contains__(self, key):
+        try:
+            self._load(nodes.dehydrate(key))
+        except KeyError:
+            return False
+        return True
+
+    def __getitem__(self, key):
+        return self._load(nodes.dehydrate(key))
+
+    def __setitem__(self, key, value):
+        self._store(nodes.dehydrate(key), value)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key, *default):
+        """Removes the entry for the given key and returns its value.
+
+        Raises:
+            KeyError: If the key is not in the cache and no default is given.
+        """
+        key = nodes.dehydrate(key)
+        try:
+            value = self._load(key)
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        del self._memory[key]
+        self._connection.execute(
+            'DELETE FROM "{}" WHERE key = ?'.format(self._table), (self._encode_key(key),))
+        return value
+
+    def flush(self):
+        """Writes all entries that are only held in memory to disk."""
+        for key, (value, dirty) in list(self._memory.items()):
+            if dirty:
+                self._write(key, value)
+                self._memory[key] = (value, False)
+
+
+class DiskSet(DiskCache):
+    """Set-like variant of DiskCache."""
+
+    def add(self, key):
+        self[key] = True
+
+
+class DiskCacheFactory(MemoryCacheFactory):
+    """Creates caches that share a memory budget and spill over into an SQLite database.
+
+    Entries written since the last commit() are discarded if the process dies, so
+    the database always matches the last checkpoint.
+    """
+
+    # Rough estimate of the memory used by a cache entry holding CASE API nodes.
+    ENTRY_SIZE = 1024
+
+    def __init__(self, memory_size, path=None, resume=False):
+        """Initializes DiskCacheFactory.
+
+        Args:
+            memory_size: Number of bytes of memory the caches may use in total.
+            path: Path of the SQLite database. A temporary file is used if not provided.
+            resume: Whether to reuse the entries committed to an existing database.
+        """
+        self.memory_size = memory_size
+        self._caches = []
+        if path:
+            self._temporary = False
+            if not resume and os.path.exists(path):
+                os.remove(path)
+        else:
+            self._temporary = True
+            file_descriptor, path = tempfile.mkstemp(prefix='case_plaso_', suffix='.cache')
+            os.close(file_descriptor)
+        self.path = path
+        self._connection = sqlite3.connect(path)
+
+    def _create(self, cache_class, document, name):
+        cache = cache_class(document, self._connection, name, capacity=1)
+        self._caches.append(cache)
+        # Split the memory budget evenly between all the caches.
+        capacity = max(1, self.memory_size // self.ENTRY_SIZE // len(self._caches))
+        for cache_ in self._caches:
+            cache_.capacity = capacity
+        return cache
+
+    def create_dict(self, document, name):
+        return self._create(DiskCache, document, name)
+
+    def create_set(self, document, name):
+        return self._create(DiskSet, document, name)
+
+    def commit(self):
+        for cache in self._caches:
+            cache.flush()
+        self._connection.commit()
+
+    def close(self, remove=False):
+        self._connection.close()
+        if self._temporary or remove:
+            os.remove(self.path)
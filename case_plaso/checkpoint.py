@@ -0,0 +1,78 @@
+"""Periodic checkpoints allowing an interrupted export to be resumed."""
+
+import cPickle as pickle
+import os
+
+
+class Checkpointer(object):
+    """Records the progress of an export and the state of its exporters to a file.
+
+    The checkpoint also contains the size of the (streamed) output at the time of
+    the checkpoint, so anything written after it can be discarded on resume.
+    """
+
+    def __init__(self, path, storage_file, interval=100000):
+        """Initializes Checkpointer.
+
+        Args:
+            path: File path to write the checkpoint to.
+            storage_file: Path to the plaso storage file being exported.
+            interval: Number of events to export between checkpoints.
+        """
+        self.path = path
+        self.interval = interval
+        self._storage_file = os.path.abspath(storage_file)
+        self._storage_file_size = os.path.getsize(storage_file)
+        self._graph = None
+
+    def attach(self, graph):
+        """Sets the (streaming) graph whose output position is recorded in the checkpoint."""
+        self._graph = graph
+
+    def save(self, position, exporter_state):
+        """Writes a checkpoint.
+
+        Args:
+            position: Number of events from GetEvents() that have been exported.
+            exporter_state: State produced by PlasoExporter.get_state().
+        """
+        self._graph.flush()
+        checkpoint = {
+            'storage_file': self._storage_file,
+            'storage_file_size': self._storage_file_size,
+            'position': position,
+            'output_offset': self._graph.tell(),
+            'triple_count': self._graph.triple_count,
+            'exporter_state': exporter_state,
+        }
+        # Write to a temporary file first, so a crash in the middle of writing
+        # doesn't destroy the previous checkpoint.
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as file_object:
+            pickle.dump(checkpoint, file_object, pickle.HIGHEST_PROTOCOL)
+        os.rename(temp_path, self.path)
+
+    def load(self):
+        """Reads the last checkpoint.
+
+        Returns:
+            Dictionary containing the checkpoint or None if there is no checkpoint.
+
+        Raises:
+            RuntimeError: If the checkpoint was created for a different storage file.
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'rb') as file_object:
+            checkpoint = pickle.load(file_object)
+        if (checkpoint['storage_file'] != self._storage_file or
+                checkpoint['storage_file_size'] != self._storage_file_size):
+            raise RuntimeError(
+                'Checkpoint {} was created for a different storage file: {}'.format(
+                    self.path, checkpoint['storage_file']))
+        return checkpoint
+
+    def remove(self):
+        """Removes the checkpoint once the export has finished."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
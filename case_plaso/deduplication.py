@@ -0,0 +1,177 @@
+"""Suppression of duplicate triples in streamed output, without holding every triple in memory."""
+
+import hashlib
+import os
+import sqlite3
+import struct
+import sys
+import tempfile
+
+
+class BloomFilter(object):
+    """Fixed size set of digests which may report false positives, but no false negatives.
+
+    Each digest sets four bits, picked by the four 32-bit words of its (MD5) digest.
+    At about 10 bits of filter per digest, about 1% of the checks are false positives.
+    """
+
+    _WORDS = struct.Struct('<IIII')
+
+    def __init__(self, memory_size):
+        """Initializes BloomFilter.
+
+        Args:
+            memory_size: Number of bytes of memory the filter may use. (Only the
+                first 512 MB can be addressed.)
+        """
+        self._bits = bytearray(max(1, min(memory_size, 1 << 29)))
+        self._bit_count = len(self._bits) * 8
+
+    def add(self, digest):
+        """Adds the given 16 byte digest.
+
+        Returns:
+            True if the digest may have been added before, False if it definitely wasn't.
+        """
+        bits = self._bits
+        bit_count = self._bit_count
+        present = True
+        for position in self._WORDS.unpack(digest):
+            position %= bit_count
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                present = False
+        return present
+
+
+class TripleFilter(object):
+    """Tells whether a serialized triple is written for the first time.
+
+    Each check goes through three tiers:
+      1. The lines of the most recently written triples, which catch the common
+         case of an exporter re-adding the triples of the event it just exported.
+         They take up to RECENT_SHARE of the memory budget.
+      2. A Bloom filter of the digests of all written triples, which rules out
+         most triples that have not been written before.
+      3. An SQLite table of the digests of all written triples, which settles
+         the remaining cases exactly.
+
+    The table is committed along with the output (see commit()) and its rows are
+    in the order the triples were written, so resuming from a checkpoint only
+    needs the number of triples written by then.
+    """
+
+    # Number of rows to insert into the table at a time.
+    BATCH_SIZE = 10000
+
+    # Share of the memory budget used by the recent lines. The Bloom filter gets the rest.
+    RECENT_SHARE = 0.25
+
+    # Estimated bytes of set table taken by each recent line, on top of the line
+    # itself. (A hash and a pointer, at the lowest fill of a set's table.)
+    _SET_ENTRY_SIZE = 48
+
+    def __init__(self, memory_size=64 * 1024 * 1024, path=None, written=None):
+        """Initializes TripleFilter.
+
+        Args:
+            memory_size: Number of bytes of memory used by the recent lines and
+                the Bloom filter together.
+            path: Path of the SQLite database. A temporary file is used if not provided.
+            written: If provided, the triples recorded in an existing database are
+                reused, up to this number of triples. (Used when resuming.)
+        """
+        self.duplicates = 0
+        self.false_positives = 0
+        # Each of the two generations of recent lines takes half of their share.
+        self.recent_memory_size = int(memory_size * self.RECENT_SHARE) // 2
+        if path:
+            self._temporary = False
+            if written is None and os.path.exists(path):
+                os.remove(path)
+        else:
+            self._temporary = True
+            file_descriptor, path = tempfile.mkstemp(prefix='case_plaso_', suffix='.dedup')
+            os.close(file_descriptor)
+        self.path = path
+        self._bloom_filter = BloomFilter(memory_size - 2 * self.recent_memory_size)
+        # The recent lines are kept in two generations, the older one being dropped
+        # once the newer one is full.
+        self._recent = set()
+        self._recent_memory = 0
+        self._previous = set()
+        self._pending = []
+        self._pending_digests = set()
+        # NOTE: A pipeline.WriterStage adds the triples from its own thread, but
+        # never while the exporting thread flushes or closes the graph.
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.text_factory = str
+        self._connection.execute('CREATE TABLE IF NOT EXISTS triples (digest BLOB UNIQUE)')
+        if written is not None:
+            # Forget the triples written after the checkpoint, since the output is truncated.
+            self._connection.execute('DELETE FROM triples WHERE rowid > ?', (written,))
+            self._connection.commit()
+            for digest, in self._connection.execute('SELECT digest FROM triples'):
+                self._bloom_filter.add(str(digest))
+
+    def _remember(self, line):
+        size = sys.getsizeof(line) + self._SET_ENTRY_SIZE
+        if self._recent_memory + size > self.recent_memory_size:
+            self._previous = self._recent
+            self._recent = set()
+            self._recent_memory = 0
+            if size > self.recent_memory_size:
+                return
+        self._recent.add(line)
+        self._recent_memory += size
+
+    def add(self, line):
+        """Records the given serialized triple.
+
+        Args:
+            line: String uniquely identifying the triple, e.g. its N-Triples line.
+
+        Returns:
+            True if the triple should be written, False if it was already written.
+        """
+        if line in self._recent or line in self._previous:
+            self.duplicates += 1
+            return False
+        digest = hashlib.md5(line).digest()
+        if self._bloom_filter.add(digest):
+            if digest in self._pending_digests or self._connection.execute(
+                    'SELECT 1 FROM triples WHERE digest = ?',
+                    (sqlite3.Binary(digest),)).fetchone():
+                self.duplicates += 1
+                self._remember(line)
+                return False
+            self.false_positives += 1
+        self._pending.append(digest)
+        self._pending_digests.add(digest)
+        if len(self._pending) >= self.BATCH_SIZE:
+            self._write_pending()
+        self._remember(line)
+        return True
+
+    def _write_pending(self):
+        self._connection.executemany(
+            'INSERT INTO triples (digest) VALUES (?)',
+            ((sqlite3.Binary(digest),) for digest in self._pending))
+        self._pending = []
+        self._pending_digests = set()
+
+    def commit(self):
+        """Makes the record of the triples written so far durable. (Used for checkpoints.)"""
+        self._write_pending()
+        self._connection.commit()
+
+    def close(self, remove=True):
+        """Releases the database.
+
+        Args:
+            remove: Whether to also remove the database.
+        """
+        self._connection.close()
+        if self._temporary or remove:
+            os.remove(self.path)
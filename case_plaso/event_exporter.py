@@ -1,6 +1,12 @@
 
 import collections
-from case_plaso import lib
+import importlib
+import itertools
+
+from case_plaso import cache as cache_lib
+from case_plaso import event_exporters
+from case_plaso import identifiers as identifiers_lib
+from case_plaso import lib, nodes
 
 
 class EventExporter(object):
@@ -8,22 +14,43 @@ class EventExporter(object):
 
     TIMESTAMP_MAP = {}
 
-    # A knowledge base that will be shared among all instances of this class.
-    # NOTE: This will obviously break in the future if/when we support multiprocessing
-    # TODO: Make this more robust and harder for an event exporter to accidentally destroy everything.
-    knowledge_base = {}
+    # Names of the cache attributes recorded in checkpoints.
+    _STATE_ATTRIBUTES = ('_cached_property_bundles', '_contacts')
+
+    # Names of the methods which are timed separately when recording statistics.
+    _TIMED_METHODS = ()
 
     _registry = {}
 
-    def __init__(self, document):
+    # Functions importing the exporter of each data type not in _registry yet.
+    _loaders = None
+
+    def __init__(self, document, knowledge_base=None, identifiers=None, cache_factory=None):
         """Initializes PlasoExporter.
 
         Args:
             document: CASE document to export plaso objects to.
+            knowledge_base: Dictionary of topics shared among all the event exporters
+                of a single export. (Each process gets its own.)
+            identifiers: Scheme used to identify traces which are shared among events.
+                (Defaults to random identifiers.)
+            cache_factory: Factory used to create the deduplication caches.
+                (Defaults to keeping everything in memory.)
         """
         self.document = document
-        self._cached_property_bundles = {}
-        self._contacts = {}
+        self.knowledge_base = knowledge_base if knowledge_base is not None else {}
+        self.identifiers = identifiers or identifiers_lib.RandomIdentifiers()
+        self.cache_factory = cache_factory or cache_lib.MemoryCacheFactory()
+        self._fingerprinter = lib.EventDataFingerprinter()
+        self._cached_property_bundles = self._create_cache('_cached_property_bundles')
+        self._contacts = self._create_cache('_contacts')
+
+    def _create_cache(self, name, set_like=False):
+        """Creates the cache stored in the given attribute name."""
+        name = '{}.{}'.format(type(self).__name__, name)
+        if set_like:
+            return self.cache_factory.create_set(self.document, name)
+        return self.cache_factory.create_dict(self.document, name)
 
     def export_contact(self, **properties):
         """Exports contact information from given properties.
@@ -37,10 +64,11 @@ class EventExporter(object):
         contact_hash = lib.hash_dict(properties)
         contact = self._contacts.get(contact_hash, None)
         if not contact:
-            contact = self.document.create_trace()
-            contact.create_property_bundle('Contact', **properties)
-            self._contacts[contact_hash] = contact
-        return contact
+            contact = self.identifiers.create_trace(
+                self.document, 'contact', *itertools.chain(*sorted(properties.items())))
+            self.identifiers.create_property_bundle(self.document, contact, 'Contact', **properties)
+            self._contacts[contact_hash] = nodes.term(contact)
+        return nodes.reference(self.document, contact)
 
     def export_timestamp(self, event, property_bundle):
         """Exports the timestamp information from the element.
@@ -73,13 +101,64 @@ class EventExporter(object):
         # If this is not the case, (single timestamp events) please overwrite this function.
         # TODO: Refactor this out when github.com/log2timeline/plaso/issues/910 is solved.
 
-        event_data_hash = lib.hash_event_data(event)
+        event_data_hash = self._fingerprinter.fingerprint(event)
 
         # Run export_event_data only on the first instance.
-        if event_data_hash not in self._cached_property_bundles:
-            self._cached_property_bundles[event_data_hash] = self.export_event_data(event)
+        property_bundle = self._cached_property_bundles.get(event_data_hash)
+        if property_bundle is None:
+            property_bundle = nodes.term(self.export_event_data(event))
+            self._cached_property_bundles[event_data_hash] = property_bundle
+
+        self.export_timestamp(event, nodes.reference(self.document, property_bundle))
+
+    def get_state(self):
+        """Retrieves the state of the exporter's caches in a form that can be pickled.
+
+        Only caches kept in memory are copied into the state. (Checkpoints require
+        disk caches, see PlasoExporter.export_storage_file().)
+        """
+        state = {}
+        for name in self._STATE_ATTRIBUTES:
+            value = getattr(self, name)
+            # Disk caches are committed along with the checkpoint instead of being
+            # copied into it.
+            if not isinstance(value, cache_lib.DiskCache):
+                state[name] = nodes.dehydrate(value)
+        return state
+
+    def set_state(self, state):
+        """Restores the exporter's caches from a state produced by get_state()."""
+        for name, value in state.items():
+            # Fill the existing caches, so they keep their type.
+            getattr(self, name).update(nodes.rehydrate(self.document, value))
+
+    def get_shard_key(self, event):
+        """Produces an integer used to assign the event to a worker process.
+
+        Events which share cached state in this exporter must produce the same key,
+        so they end up being exported by the same worker.
+        """
+        return lib.fingerprint_to_int(self._fingerprinter.fingerprint(event))
 
-        self.export_timestamp(event, self._cached_property_bundles[event_data_hash])
+    def export_shared(self, event, shard):
+        """Exports the nodes the given event shares with events of other shards.
+
+        With multiple workers, the process reading the events calls this before it
+        hands each event to the worker exporting its shard, so the shared nodes are
+        exported once instead of by every worker.
+
+        Args:
+            event: The plaso EventObject.
+            shard: Index of the shard the event is exported in.
+
+        Returns:
+            State (which can be pickled) for import_shared() in the worker exporting
+            the shard, or None if it has nothing new to import.
+        """
+        return None
+
+    def import_shared(self, event, state):
+        """Adopts the state returned by export_shared() for the given event."""
 
     @classmethod
     def register(cls, data_type):
@@ -90,12 +169,64 @@ class EventExporter(object):
         return _register
 
     @classmethod
-    def from_data_type(cls, data_type, document):
+    def _get_loaders(cls):
+        """Retrieves the functions importing the exporters which are not registered yet.
+
+        Returns:
+            Dictionary of data types and functions returning their EventExporter class.
+        """
+        if EventExporter._loaders is None:
+            loaders = {}
+            # NOTE: Imported here, since pkg_resources takes a while to import.
+            try:
+                import pkg_resources
+            except ImportError:
+                pkg_resources = None
+            if pkg_resources:
+                for entry_point in pkg_resources.iter_entry_points(
+                        event_exporters.ENTRY_POINT_GROUP):
+                    loaders[entry_point.name] = entry_point.load
+            # Built-in exporters take precedence over ones from other packages.
+            for data_type, module_name in event_exporters.MODULES.items():
+                loaders[data_type] = _module_loader(module_name, data_type)
+            EventExporter._loaders = loaders
+        return EventExporter._loaders
+
+    @classmethod
+    def data_types(cls):
+        """Retrieves the data types with an event exporter, without importing any of them."""
+        return frozenset(cls._registry) | frozenset(cls._get_loaders())
+
+    @classmethod
+    def get_class(cls, data_type):
+        """Retrieves the EventExporter class of the given data type, importing it if needed.
+
+        Returns:
+            The EventExporter class or None if the data type has no exporter.
+        """
+        exporter_class = cls._registry.get(data_type)
+        if exporter_class is None:
+            loader = cls._get_loaders().get(data_type)
+            if loader:
+                exporter_class = loader()
+                cls._registry[data_type] = exporter_class
+        return exporter_class
+
+    @classmethod
+    def from_data_type(cls, data_type, document, **kwargs):
         """Factory for creating a EventExporter class based on data_type."""
-        try:
-            return cls._registry[data_type](document)
-        except KeyError:
-            return DefaultEventExporter(document)
+        exporter_class = cls.get_class(data_type)
+        if exporter_class is None:
+            return DefaultEventExporter(document, **kwargs)
+        return exporter_class(document, **kwargs)
+
+
+def _module_loader(module_name, data_type):
+    """Creates a function importing the given module and returning its exporter of the data type."""
+    def _load():
+        importlib.import_module(module_name)
+        return EventExporter._registry[data_type]
+    return _load
 
 
 class DefaultEventExporter(EventExporter):
@@ -103,3 +234,7 @@ class DefaultEventExporter(EventExporter):
     def export_event(self, event):
         # TODO: Do something with events without an explicit exporter.
         pass
+
+    def get_shard_key(self, event):
+        # Nothing gets exported, so don't waste time hashing the event.
+        return 0
@@ -1,7 +1,22 @@
 # -*- coding: utf-8 -*-
 
-from case_plaso.event_exporters import android_calls
-from case_plaso.event_exporters import android_sms
-from case_plaso.event_exporters import filestat
-from case_plaso.event_exporters import ntfs
-from case_plaso.event_exporters import skype
\ No newline at end of file
+# Modules of the built-in event exporters, by the data type they export.
+# A module is only imported once an event of one of its data types shows up.
+MODULES = {
+    'android:event:call': 'case_plaso.event_exporters.android_calls',
+    'android:messaging:sms': 'case_plaso.event_exporters.android_sms',
+    'fs:stat': 'case_plaso.event_exporters.filestat',
+    'fs:stat:ntfs': 'case_plaso.event_exporters.ntfs',
+    'skype:event:account': 'case_plaso.event_exporters.skype',
+    'skype:event:call': 'case_plaso.event_exporters.skype',
+    'skype:event:chat': 'case_plaso.event_exporters.skype',
+    'skype:event:transferfile': 'case_plaso.event_exporters.skype',
+    'skype:event:sms': 'case_plaso.event_exporters.skype',
+}
+
+# Entry point group through which other packages provide event exporters for
+# further data types. The name of each entry point is the data type and it must
+# refer to the EventExporter class, e.g. in setup.py:
+#     entry_points={'case_plaso.event_exporters': [
+#         'chrome:history:page_visited = my_package.chrome:ChromeHistoryExporter']}
+ENTRY_POINT_GROUP = 'case_plaso.event_exporters'
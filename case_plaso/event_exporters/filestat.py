@@ -1,9 +1,10 @@
 
+import functools
 import os
 
 from dfvfs.lib import definitions as dfvfs_definitions
 
-from case_plaso import lib, mappings, file_relationships
+from case_plaso import lib, mappings, file_relationships, nodes, path_specs
 from case_plaso.event_exporter import EventExporter
 
 
@@ -23,35 +24,112 @@ class FileStatExporter(EventExporter):
         dfvfs_definitions.TYPE_INDICATOR_LVM,
         dfvfs_definitions.TYPE_INDICATOR_TSK_PARTITION]
 
-    def __init__(self, document):
-        super(FileStatExporter, self).__init__(document)
-        self._path_spec_traces = {}
-        self._content_data_pbs = {}
-        self._processed_hashes = set()
+    _STATE_ATTRIBUTES = EventExporter._STATE_ATTRIBUTES + (
+        '_path_spec_nodes', '_path_spec_traces', '_content_data_pbs', '_hashes',
+        '_content_data_hashes', '_source_directories')
+
+    _TIMED_METHODS = ('_resolve_path_spec', '_construct_relationship')
+
+    _construct_relationship = staticmethod(file_relationships.construct)
+
+    def __init__(self, document, **kwargs):
+        super(FileStatExporter, self).__init__(document, **kwargs)
+        # The caches below are keyed on the path spec's node in this index. The traces
+        # and File property bundles of the path specs are kept as nodes.TraceRecords.
+        self._path_spec_nodes = self._create_cache('_path_spec_nodes')
+        self._path_spec_index = path_specs.PathSpecIndex(self._path_spec_nodes)
+        self._path_spec_traces = self._create_cache('_path_spec_traces')
+        self._content_data_pbs = self._create_cache('_content_data_pbs')
+        # Hash nodes are shared by all files with the same content.
+        self._hashes = self._create_cache('_hashes')
+        # Hash attributes (name, value) already linked from each file's ContentData.
+        self._content_data_hashes = self._create_cache('_content_data_hashes')
+        # Whether the event source of each not yet exported path spec is a directory.
+        self._source_directories = self._create_cache('_source_directories')
+        # (shard, node) of the path specs already handed to the worker of each shard.
+        # (Only used by the process reading the events for multiple workers. These
+        # are mostly the few image, partition and file system level path specs.)
+        self._shared_path_specs = set()
 
-    # TODO: Clean up this function.
     def export_path_spec(self, path_spec):
         """Exports the given DFVFS path spec into the graph.
 
         Returns: tuple containing URIRefs for Trace and File property bundle.
         """
-        comparable = path_spec.comparable
-        if comparable in self._path_spec_traces:
-            return self._path_spec_traces[comparable]
+        _, record = self._resolve_path_spec(path_spec)
+        return record.rehydrate(self.document)
+
+    def index_path_spec(self, path_spec, is_directory):
+        """Records the path spec of an event source, without exporting it.
+
+        The path spec is exported (along with whether it is a directory) once an
+        exported event refers to it. If it already was, only isDirectory is added.
+        """
+        node = self._path_spec_index.lookup(path_spec)
+        record = self._path_spec_traces.get(node)
+        if record is not None:
+            _, file_pb = record.rehydrate(self.document)
+            file_pb.add('isDirectory', is_directory)
+        else:
+            self._source_directories[node] = is_directory
+
+    def _resolve_path_spec(self, path_spec):
+        """Looks up the given DFVFS path spec in the index, exporting the nodes of
+        its chain that haven't been exported yet.
+
+        Returns: tuple containing the path spec's node in the index and its TraceRecord.
+        """
+        # NOTE: Each cache is looked up once per node, so its hit and miss counts
+        # (see cache.CountingDict) reflect how often exporting was avoided.
+        node = self._path_spec_index.lookup(path_spec)
+        record = self._path_spec_traces.get(node)
+        if record is None:
+            # Only the nodes below the closest exported node of the chain are missing.
+            # (Which may have been exported by another process, see export_shared().)
+            chain = self._path_spec_index.lookup_chain(path_spec)
+            start = len(chain) - 1
+            parent_record = None
+            while start > 0:
+                parent_record = self._path_spec_traces.get(chain[start - 1][0])
+                if parent_record is not None:
+                    break
+                start -= 1
+            # Parents come first in the chain, so they are exported before their children.
+            for chain_node, chain_path_spec in chain[start:]:
+                trace, file_pb = self._export_path_spec_node(
+                    chain_node, chain_path_spec, parent_record)
+                record = nodes.TraceRecord(trace, file_pb)
+                self._path_spec_traces[chain_node] = parent_record = record
+                # The entry is no longer needed once the path spec is exported.
+                is_directory = self._source_directories.pop(chain_node, None)
+                if is_directory is not None:
+                    file_pb.add('isDirectory', is_directory)
+        return node, record
+
+    # TODO: Clean up this function.
+    def _export_path_spec_node(self, node, path_spec, parent_record):
+        """Exports a single node of a DFVFS path spec chain, after its parent.
 
+        Args:
+            node: The path spec's node in the index.
+            path_spec: DFVFS path spec to export.
+            parent_record: TraceRecord of the exported parent path spec (or None).
+
+        Returns: tuple containing URIRefs for Trace and File property bundle.
+        """
         # If we have an Image file type flatten it into the parent.
         if path_spec.type_indicator in dfvfs_definitions.STORAGE_MEDIA_IMAGE_TYPE_INDICATORS:
             assert path_spec.HasParent()
-            parent_trace, parent_file_pb = self.export_path_spec(path_spec.parent)
-            parent_trace.create_property_bundle(
-                'Image',
+            parent_trace, parent_file_pb = parent_record.rehydrate(self.document)
+            self.identifiers.create_property_bundle(
+                self.document, parent_trace, 'Image',
                 imageType=mappings.ImageType[path_spec.type_indicator])
-            self._path_spec_traces[comparable] = (parent_trace, parent_file_pb)
             return parent_trace, parent_file_pb
 
-        trace = self.document.create_trace()
-        file_pb = trace.create_property_bundle('File')
-        self._path_spec_traces[comparable] = (trace, file_pb)
+        # NOTE: Building the comparable walks the whole chain, but this only happens
+        # once per exported path spec. Content derived identifiers are based on it.
+        trace = self.identifiers.create_trace(self.document, 'file', path_spec.comparable)
+        file_pb = self.identifiers.create_property_bundle(self.document, trace, 'File')
 
         file_pb.add(
             'fileSystemType', mappings.FileSystemType.get(path_spec.type_indicator, None))
@@ -65,13 +143,15 @@ class FileStatExporter(EventExporter):
             if extension:
                 file_pb.add('extension', extension)
 
-        # If path spec has a parent, create the parent then create a relationship
-        # object pointing to its parent.
+        # If path spec has a parent, create a relationship object pointing to its parent.
         # TODO: CASE should rethink the approach of putting this information in Relationships.
         if path_spec.HasParent():
-            parent_trace, _ = self.export_path_spec(path_spec.parent)
-            relationship = self.document.create_uco_object(
+            parent_trace, _ = parent_record.rehydrate(self.document)
+            # Identified by the traces it relates, which are identified by their path specs.
+            relationship = self.identifiers.create_uco_object(
+                self.document,
                 'Relationship',
+                (trace._node, parent_trace._node),
                 source=trace,
                 target=parent_trace,
                 kindOfRelationship=mappings.kindOfRelationship.get(
@@ -79,21 +159,81 @@ class FileStatExporter(EventExporter):
                 isDirectional=True)
 
             if location and path_spec.type_indicator not in self._IGNORE_PATH_TYPE_INDICATORS:
-                relationship.create_property_bundle('PathRelation', path=location)
+                self.identifiers.create_property_bundle(
+                    self.document, relationship, 'PathRelation', path=location)
 
             # Add an extra property bundle to relationship if available.
-            file_relationships.construct(path_spec.type_indicator, relationship, path_spec)
+            self._construct_relationship(
+                path_spec.type_indicator,
+                functools.partial(self.identifiers.create_property_bundle, self.document, relationship),
+                path_spec)
 
         # We then want to REPEAT the same information in the trace, because reasons.
         # However, I guess we don't have to do it for all types, but I'm not sure which ones
         # to not do it for, so I'm going to do it for all of them.
         # TODO: We should not be repeating the information like this. We should rethink this.
-        file_relationships.construct(path_spec.type_indicator, trace, path_spec)
+        self._construct_relationship(
+            path_spec.type_indicator,
+            functools.partial(self.identifiers.create_property_bundle, self.document, trace),
+            path_spec)
 
         return trace, file_pb
 
+    def get_shard_key(self, event):
+        # All events for the same file must go to the same worker, so they share
+        # the same trace.
+        return self._path_spec_index.shard_key(event.pathspec)
+
+    def get_state(self):
+        state = super(FileStatExporter, self).get_state()
+        # The interned nodes are in _path_spec_nodes, like the other caches.
+        state['_path_spec_index'] = self._path_spec_index.get_state()
+        return state
+
+    def set_state(self, state):
+        state = dict(state)
+        path_spec_index_state = state.pop('_path_spec_index')
+        super(FileStatExporter, self).set_state(state)
+        self._path_spec_index.set_state(path_spec_index_state)
+
+    def export_shared(self, event, shard):
+        # The chain above the file (e.g. its image, partition and file system) is
+        # shared with the files of other shards, so it is exported here and the
+        # worker only gets the trace of the file's parent. The file itself is
+        # exported by the worker, unless it was exported with all event sources.
+        node = self._path_spec_index.lookup(event.pathspec)
+        parent_record = None
+        if event.pathspec.parent is not None:
+            # The chain was just looked up, so this doesn't walk it again.
+            parent = self._path_spec_index.lookup(event.pathspec.parent)
+            if (shard, parent) not in self._shared_path_specs:
+                _, parent_record = self._resolve_path_spec(event.pathspec.parent)
+                self._shared_path_specs.add((shard, parent))
+        record = None
+        if (shard, node) not in self._shared_path_specs:
+            record = self._path_spec_traces.get(node)
+            if record is not None:
+                self._shared_path_specs.add((shard, node))
+        # Event sources are indexed by this process, so tell the worker whether the
+        # file is a directory. (Only its shard refers to it.)
+        is_directory = self._source_directories.pop(node, None)
+        if parent_record is None and record is None and is_directory is None:
+            return None
+        return parent_record, record, is_directory
+
+    def import_shared(self, event, state):
+        parent_record, record, is_directory = state
+        if parent_record is not None:
+            self._path_spec_traces[self._path_spec_index.lookup(event.pathspec.parent)] = (
+                parent_record)
+        if record is not None:
+            self._path_spec_traces[self._path_spec_index.lookup(event.pathspec)] = record
+        if is_directory is not None:
+            self.index_path_spec(event.pathspec, is_directory)
+
     def export_event(self, event):
-        trace, file_pb = self.export_path_spec(event.pathspec)
+        node, record = self._resolve_path_spec(event.pathspec)
+        trace, file_pb = record.rehydrate(self.document)
         # NOTE: Re-adding the same property is fine. Duplicate triples will be removed.
         file_pb.add(
             'fileSystemType', mappings.FileSystemType.get(event.file_system_type, None))
@@ -110,26 +250,44 @@ class FileStatExporter(EventExporter):
         # Add file system specific property bundles.
         # TODO: Is there anyway to get more information?
         elif event.timestamp_desc == 'bkup_time':
-            trace.create_property_bundle(
-                'HFSFileSystem',
+            self.identifiers.create_property_bundle(
+                self.document, trace, 'HFSFileSystem',
                 hfsBackupTime=lib.convert_timestamp(event.timestamp))
         elif event.timestamp_desc == 'dtime':
-            trace.create_property_bundle(
-                'ExtInode',
+            self.identifiers.create_property_bundle(
+                self.document, trace, 'ExtInode',
                 extDeletionTime=lib.convert_timestamp(event.timestamp))
 
         # Add hash data into content_data property bundle.
         # NOTE: This is were we could technically add the dataPayload of the
         # file as well... although that would make the file HUGE!
         # TODO: Don't add ContentData if hash is missing.
-        if event.pathspec not in self._content_data_pbs:
-            self._content_data_pbs[event.pathspec] = trace.create_property_bundle('ContentData')
-        content_data = self._content_data_pbs[event.pathspec]
+        content_data = self._content_data_pbs.get(node)
+        if content_data is None:
+            content_data = self.identifiers.create_property_bundle(
+                self.document, trace, 'ContentData')
+            self._content_data_pbs[node] = nodes.term(content_data)
+        content_data = nodes.reference(self.document, content_data)
+        linked = None
         for name, value in event.GetAttributes():
-            if name in mappings.HashMethod and (content_data, name, value) not in self._processed_hashes:
-                # Keep track of processed hashes, so we don't add the same hash twice.
+            if name in mappings.HashMethod:
+                if linked is None:
+                    linked = self._content_data_hashes.get(node, ())
+                # Every event of a file carries its hashes, so only link them once.
                 # TODO: Refactor this out when github.com/log2timeline/plaso/issues/910 is solved.
-                self._processed_hashes.add((content_data, name, value))
-                hash = self.document.create_hash(
-                    hashMethod=mappings.HashMethod[name], hashValue=value)
-                content_data.add('hash', hash)
+                if (name, value) not in linked:
+                    content_data.add('hash', self.export_hash(name, value))
+                    linked += ((name, value),)
+                    self._content_data_hashes[node] = linked
+
+    def export_hash(self, name, value):
+        """Exports the Hash node for the given plaso hash attribute, once per method and value.
+
+        Returns: the Hash node.
+        """
+        key = (name, value)
+        hash = self._hashes.get(key)
+        if hash is None:
+            hash = self.identifiers.create_hash(self.document, mappings.HashMethod[name], value)
+            self._hashes[key] = nodes.term(hash)
+        return nodes.reference(self.document, hash)
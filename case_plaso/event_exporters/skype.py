@@ -1,32 +1,39 @@
 
 from case import CASE
 
-from case_plaso import lib, PLASO
+from case_plaso import lib, nodes, PLASO
 from case_plaso.event_exporter import EventExporter
 
 
 class SkypeExporter(EventExporter):
 
-    def __init__(self, document):
-        super(SkypeExporter, self).__init__(document)
-        # Setup knowledge base.
-        for topic in ('skype_accounts', 'skype_message_threads'):
+    def __init__(self, document, **kwargs):
+        super(SkypeExporter, self).__init__(document, **kwargs)
+        # Setup knowledge base. (The topics grow with the accounts and threads, so
+        # they are caches like the exporter's own.)
+        for topic in ('skype_accounts', 'skype_display_names', 'skype_message_threads'):
             if topic not in self.knowledge_base:
-                self.knowledge_base[topic] = {}
+                self.knowledge_base[topic] = self.cache_factory.create_dict(self.document, topic)
 
     def export_account(self, username, display_name=None):
         skype_accounts = self.knowledge_base['skype_accounts']
-        account, pb = skype_accounts.get(username, (None, None))
-        if not account:
-            account = self.document.create_trace()
-            account.create_property_bundle('Account', accountIssuer='Skype')
-            pb = account.create_property_bundle(
-                'DigitalAccount',
-                accountLogin=username)
-            skype_accounts[username] = (account, pb)
+        record = skype_accounts.get(username)
+        if record:
+            account, pb = record.rehydrate(self.document)
+        else:
+            account = self.identifiers.create_trace(self.document, 'skype_account', username)
+            self.identifiers.create_property_bundle(
+                self.document, account, 'Account', accountIssuer='Skype')
+            pb = self.identifiers.create_property_bundle(
+                self.document, account, 'DigitalAccount', accountLogin=username)
+            skype_accounts[username] = nodes.TraceRecord(account, pb)
 
         # Add displayname if it has not already been added.
-        if display_name and (pb, 'displayName', display_name) not in self.document:
+        # NOTE: This is tracked here instead of querying the document, because
+        # the document's graph may be a write-only stream.
+        display_names = self.knowledge_base['skype_display_names']
+        if display_name and (username, display_name) not in display_names:
+            display_names[(username, display_name)] = True
             pb.add('displayName', display_name)
 
         return account
@@ -102,11 +109,13 @@ class SkypeChatExporter(SkypeExporter):
 
     def export_message_thread(self, title):
         message_threads = self.knowledge_base['skype_message_threads']
-        trace, pb = message_threads.get(title, (None, None))
-        if not trace:
-            trace = self.document.create_trace()
-            pb = trace.create_property_bundle('MessageThread', displayName=title)
-            message_threads[title] = trace, pb
+        record = message_threads.get(title)
+        if record:
+            return record.rehydrate(self.document)
+        trace = self.identifiers.create_trace(self.document, 'skype_message_thread', title)
+        pb = self.identifiers.create_property_bundle(
+            self.document, trace, 'MessageThread', displayName=title)
+        message_threads[title] = nodes.TraceRecord(trace, pb)
         return trace, pb
 
     def export_event(self, event):
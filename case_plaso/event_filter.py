@@ -0,0 +1,143 @@
+"""Filtering of the events read from a plaso storage file by their data type."""
+
+import binascii
+import collections
+import re
+
+from plaso.storage import identifiers as storage_identifiers
+
+from case_plaso.event_exporter import EventExporter
+
+
+# plaso serializes events with json.dumps() using the default separators.
+# (Byte string data types are serialized as quoted-printable "bytes" objects.)
+_DATA_TYPE_KEY = b'"data_type": '
+_DATA_TYPE_PATTERN = re.compile(
+    br'"data_type": (?:"((?:[^"\\]|\\.)*)"|'
+    br'\{"__type__": "bytes", "stream": "((?:[^"\\]|\\.)*)"\})')
+
+# Private ZIPStorageFile attributes read_events() builds on to skip deserializing events.
+_STORAGE_FILE_ATTRIBUTES = (
+    '_GetEvent', '_GetEventSerializedData', '_DeserializeAttributeContainer',
+    'NEXT_AVAILABLE_ENTRY')
+
+
+def peek_data_type(event_data):
+    """Extracts the data type from a serialized event without deserializing it.
+
+    Args:
+        event_data: JSON serialized event, as stored in a plaso storage file.
+
+    Returns:
+        The data type or None if it can't be determined unambiguously.
+    """
+    # A nested dictionary could contain a "data_type" key of its own, in which
+    # case we can't tell which one belongs to the event.
+    if event_data.count(_DATA_TYPE_KEY) != 1:
+        return None
+    match = _DATA_TYPE_PATTERN.search(event_data)
+    if not match:
+        return None
+    data_type, stream = match.groups()
+    if stream is not None:
+        data_type = binascii.a2b_qp(stream)
+    if b'\\' in data_type:
+        return None
+    return data_type.decode('utf-8')
+
+
+class DataTypeFilter(object):
+    """Selects the events with an event exporter and an allowed data type.
+
+    Events of any other data type would only be thrown away by the
+    DefaultEventExporter, so they are skipped while being read from the storage
+    file instead.
+    """
+
+    def __init__(self, allowed=None, denied=None):
+        """Initializes DataTypeFilter.
+
+        Args:
+            allowed: Data types to export. (Defaults to all data types with an exporter.)
+            denied: Data types to never export.
+        """
+        data_types = set(EventExporter.data_types())
+        if allowed is not None:
+            data_types &= set(allowed)
+        if denied:
+            data_types -= set(denied)
+        self.data_types = frozenset(data_types)
+        # Number of skipped events per data type.
+        self.skipped = collections.Counter()
+
+    @classmethod
+    def from_expression(cls, expression):
+        """Creates a DataTypeFilter from a comma separated list of data types.
+
+        Data types prefixed with '!' are denied, the others are allowed.
+        (e.g. 'skype:event:chat,skype:event:sms' or '!fs:stat:ntfs')
+        """
+        allowed = []
+        denied = []
+        for data_type in expression.split(','):
+            data_type = data_type.strip()
+            if data_type.startswith('!'):
+                denied.append(data_type[1:])
+            elif data_type:
+                allowed.append(data_type)
+        return cls(allowed=allowed or None, denied=denied)
+
+    def __contains__(self, data_type):
+        return data_type in self.data_types
+
+    def filter_events(self, events):
+        """Yields the given events whose data type passes the filter."""
+        for event in events:
+            if event.data_type in self.data_types:
+                yield event
+            else:
+                self.skipped[event.data_type] += 1
+
+    def read_events(self, storage_reader):
+        """Reads the events passing the filter from a plaso storage file.
+
+        The data type of each serialized event is peeked at before it gets
+        deserialized, so skipped events never get turned into EventObjects.
+        (Unless the storage file lacks the private methods this relies on, in
+        which case the events are filtered after being deserialized.)
+
+        Args:
+            storage_reader: ZIPStorageFileReader to read the events from.
+
+        Returns:
+            Generator of plaso EventObjects, sorted by timestamp.
+        """
+        storage_file = getattr(storage_reader, '_storage_file', None)
+        if not all(hasattr(storage_file, name) for name in _STORAGE_FILE_ATTRIBUTES):
+            return self.filter_events(storage_reader.GetEvents())
+
+        def _GetEvent(stream_number, entry_index=storage_file.NEXT_AVAILABLE_ENTRY):
+            while True:
+                event_data, entry_index = storage_file._GetEventSerializedData(
+                    stream_number, entry_index=entry_index)
+                if not event_data:
+                    return None
+
+                data_type = peek_data_type(event_data)
+                if data_type is None or data_type in self.data_types:
+                    event = storage_file._DeserializeAttributeContainer(event_data, u'event')
+                    if not event:
+                        return None
+                    data_type = event.data_type
+                    if data_type in self.data_types:
+                        event.SetIdentifier(storage_identifiers.SerializedStreamIdentifier(
+                            stream_number, entry_index))
+                        return event
+
+                self.skipped[data_type] += 1
+                entry_index = storage_file.NEXT_AVAILABLE_ENTRY
+
+        # NOTE: This replaces ZIPStorageFile._GetEvent(), which the sorted merge of
+        # the event streams in GetEvents() uses to read each event.
+        storage_file._GetEvent = _GetEvent
+        return storage_reader.GetEvents()
@@ -0,0 +1,139 @@
+"""Schemes for choosing the identifiers of exported traces and objects."""
+
+import uuid
+
+from case import CASE
+
+from case_plaso import PLASO, nodes
+
+
+# All content derived identifiers are generated within this namespace.
+_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, str(PLASO))
+
+
+def _encode(value):
+    """Encodes a piece of identifying content into bytes."""
+    if isinstance(value, bytes):
+        return value
+    return u'{}'.format(value).encode('utf-8')
+
+
+class RandomIdentifiers(object):
+    """Default scheme, which leaves the CASE API to generate a random identifier for every node."""
+
+    def get_uri(self, kind, *content):
+        """Generates the identifier for a node.
+
+        Args:
+            kind: Name describing what kind of node is being identified. (e.g. 'file')
+            *content: The identifying content of the node.
+
+        Returns:
+            The identifier or None if the CASE API should generate one.
+        """
+        return None
+
+    def create_trace(self, document, kind, *content):
+        """Creates a Trace identified by the given kind and content."""
+        uri = self.get_uri(kind, *content)
+        if uri is None:
+            return document.create_trace()
+        return document.create_trace(uri=uri)
+
+    def create_CoreObject(self, document, _type, content, **kwargs):
+        """Creates a CoreObject identified by the given type and content.
+
+        Args:
+            document: CASE document to create the object in.
+            _type: The type of CoreObject.
+            content: Tuple containing the identifying content of the object.
+            **kwargs: Properties to add to the object.
+        """
+        uri = self.get_uri(_type, *content)
+        if uri is None:
+            return document.create_CoreObject(_type, **kwargs)
+        return document.create_CoreObject(_type, uri=uri, **kwargs)
+
+    def create_uco_object(self, document, _type, content, **kwargs):
+        """Creates a UcoObject (e.g. a Relationship) identified by the given type and content.
+
+        Args:
+            document: CASE document to create the object in.
+            _type: The type of UcoObject.
+            content: Tuple containing the identifying content of the object.
+            **kwargs: Properties to add to the object.
+        """
+        uri = self.get_uri(_type, *content)
+        if uri is None:
+            return document.create_uco_object(_type, **kwargs)
+        return document.create_uco_object(_type, uri=uri, **kwargs)
+
+    def create_property_bundle(self, document, node, _type=None, **kwargs):
+        """Creates a property bundle on the given node.
+
+        Args:
+            document: CASE document the node was exported to.
+            node: CASE API node (or NodeRef) to place the property bundle on.
+            _type: The type of property bundle.
+            **kwargs: Properties to add to the property bundle.
+        """
+        # Property bundles are blank nodes, which are as random as the other identifiers.
+        return node.create_property_bundle(_type, **kwargs)
+
+    def create_hash(self, document, hash_method, hash_value):
+        """Creates a Hash node identified by its method and value."""
+        uri = self.get_uri('hash', hash_method, hash_value)
+        if uri is None:
+            return document.create_hash(hashMethod=hash_method, hashValue=hash_value)
+        return document.create_node(
+            CASE.Hash, uri=uri, hashMethod=hash_method, hashValue=hash_value)
+
+
+class ContentIdentifiers(RandomIdentifiers):
+    """Derives stable identifiers from the identifying content of a node.
+
+    Independent exports (separate runs, workers or storage files) will produce the
+    same identifier for the same file, contact or account, as well as for their
+    property bundles and the relationships between files, allowing their outputs
+    to be merged by simple concatenation.
+
+    The CASE API gives every object it creates a createdTime of the current time,
+    so the same object would be given a different createdTime by each export.
+    Objects are therefore created as plain nodes of the same type, without one.
+    """
+
+    def get_uri(self, kind, *content):
+        name = b'\x00'.join([_encode(kind)] + [_encode(value) for value in content])
+        return str(uuid.uuid5(_NAMESPACE, name))
+
+    def _create_object(self, document, rdf_type, uri, **kwargs):
+        """Creates an object of the given type without a createdTime.
+
+        Returns:
+            NodeRef to the object, which can have property bundles created on it
+            like the CASE API objects.
+        """
+        return nodes.reference(
+            document, document.create_node(rdf_type, uri=uri, **kwargs))
+
+    def create_trace(self, document, kind, *content):
+        return self._create_object(document, CASE.Trace, self.get_uri(kind, *content))
+
+    def create_CoreObject(self, document, _type, content, **kwargs):
+        return self._create_object(document, _type, self.get_uri(_type, *content), **kwargs)
+
+    def create_uco_object(self, document, _type, content, **kwargs):
+        return self._create_object(document, _type, self.get_uri(_type, *content), **kwargs)
+
+    def create_property_bundle(self, document, node, _type=None, **kwargs):
+        """Creates a property bundle identified by its node, type and initial properties.
+
+        Unlike a blank node, the property bundle gets the same identifier in every
+        export, so concatenated outputs don't repeat it.
+        """
+        content = [node._node, _type]
+        for name, value in sorted(kwargs.items()):
+            content.extend((name, value))
+        pb = document.create_node(_type, uri=self.get_uri('property_bundle', *content), **kwargs)
+        node.add('propertyBundle', pb)
+        return pb
@@ -1,23 +1,192 @@
+import datetime
+import hashlib
+import itertools
+import struct
 
 import rdflib
 from plaso.lib import timelib
 import pytz
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
-def convert_timestamp(timestamp):
-    """Converts a plaso timestamp into a valid rdflib Literal."""
+
+# Maximum number of timestamp literals to keep interned.
+# (Events are sorted by time, so repeated timestamps tend to be close together.)
+_TIMESTAMP_CACHE_SIZE = 65536
+_timestamp_literals = {}
+
+# (Namespace attribute access creates a new URIRef each time.)
+_XSD_DATETIME = rdflib.XSD.dateTime
+
+
+
+def _to_timestamp(datetime_object):
+    delta = datetime_object - datetime.datetime(1970, 1, 1)
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+# Range of plaso timestamps that can be represented as a datetime.
+_MIN_TIMESTAMP = _to_timestamp(datetime.datetime.min)
+_MAX_TIMESTAMP = _to_timestamp(datetime.datetime.max)
+
+
+def _to_datetimes(timestamps):
+    """Converts plaso timestamps into UTC datetime objects.
+
+    Matches timelib.Timestamp.CopyToDatetime(), including returning the epoch for
+    out of range timestamps, but converts the whole list in one vectorized
+    operation when numpy is available.
+
+    Args:
+        timestamps: List of plaso timestamps (microseconds since epoch).
+    """
+    if numpy is None:
+        return [timelib.Timestamp.CopyToDatetime(timestamp, timezone=pytz.UTC)
+                for timestamp in timestamps]
+
+    array = numpy.array(timestamps, dtype='int64')
+    array[(array < _MIN_TIMESTAMP) | (array > _MAX_TIMESTAMP)] = 0
+    return [datetime_object.replace(tzinfo=pytz.UTC)
+            for datetime_object in array.astype('datetime64[us]').astype(object)]
+
+
+def convert_timestamps(timestamps):
+    """Converts a block of plaso timestamps into valid rdflib Literals.
+
+    Timestamps not seen before are converted together and the resulting Literals
+    are interned, so repeated timestamps (e.g. the MACB times of a file) share
+    the same Literal instead of constructing a new one each time.
+
+    Only the conversion into datetimes is vectorized. Each Literal still builds
+    its lexical form from its datetime, which is most of the remaining time.
+    Building the lexical forms with numpy.datetime_as_string() instead doesn't
+    help, because rdflib parses a lexical form back into a datetime, which is
+    several times slower.
+
+    Args:
+        timestamps: List of plaso timestamps.
+
+    Returns:
+        List of rdflib Literals in the same order as timestamps.
+    """
     # TODO: Extract timezone from knowledge base in plaso storage file. Assuming UTC for now.
     # TODO: Create binding for XSD.dateTimeStamp. It's unavailable in rdflib.
     #  - Binding should allow direct conversion from Iso format.
-    timestamp = timelib.Timestamp.CopyToDatetime(timestamp, timezone=pytz.UTC)
-    return rdflib.Literal(timestamp, datatype=rdflib.XSD.dateTime)
+    missing = list(set(timestamp for timestamp in timestamps
+                       if timestamp not in _timestamp_literals))
+    if missing:
+        if len(_timestamp_literals) + len(missing) > _TIMESTAMP_CACHE_SIZE:
+            _timestamp_literals.clear()
+        for timestamp, datetime_object in zip(missing, _to_datetimes(missing)):
+            _timestamp_literals[timestamp] = rdflib.Literal(
+                datetime_object, datatype=_XSD_DATETIME)
+    return [_timestamp_literals[timestamp] for timestamp in timestamps]
+
+
+def iter_blocks(iterable, size):
+    """Yields lists of (up to) size items from the iterable."""
+    iterator = iter(iterable)
+    while True:
+        block = list(itertools.islice(iterator, size))
+        if not block:
+            return
+        yield block
+
+
+def convert_timestamp(timestamp):
+    """Converts a plaso timestamp into a valid rdflib Literal."""
+    literal = _timestamp_literals.get(timestamp, None)
+    if literal is None:
+        literal = convert_timestamps([timestamp])[0]
+    return literal
+
+
+# Event attributes that don't describe the event data itself.
+# TODO: We should not be excluding pathspec and other source attributes when
+# we produce parser specific actions.
+EXCLUDED_ATTRIBUTES = frozenset([
+    'display_name', 'filename', 'inode', 'pathspec', 'store_index', 'parser',
+    'store_number', 'tag', 'timestamp', 'timestamp_desc', 'uuid'])
+
+# Number of bytes kept from the SHA-256 digest. (Enough to never collide on any
+# realistic timeline, while keeping the cache keys small.)
+_FINGERPRINT_SIZE = 16
+
+# Types whose repr() is the same in every process and run.
+_STABLE_REPR_TYPES = frozenset([
+    bool, bytes, float, int, type(None), type(u''), type(10 ** 20)])
+
+
+def _stable_values(values):
+    """Replaces the values in the given list that have no stable repr() with their fingerprint."""
+    for index, value in enumerate(values):
+        if type(value) not in _STABLE_REPR_TYPES:
+            if isinstance(value, dict):
+                # NOTE: If we have a recursive dictionary, we have bigger problems.
+                value = ('dict', fingerprint_values(sorted(value.items())))
+            elif isinstance(value, (list, tuple)):
+                value = ('list', fingerprint_values(value))
+            else:
+                value = (type(value).__name__, repr(value))
+            values[index] = value
+    return values
+
+
+def fingerprint_values(values):
+    """Produces a stable digest of the given sequence of values.
+
+    Unlike hash(), the digest is the same in every process and run, so it can be
+    shared with worker processes and stored in checkpoints.
+    """
+    values = _stable_values(list(values))
+    return hashlib.sha256(repr(values)).digest()[:_FINGERPRINT_SIZE]
+
+
+def fingerprint_to_int(fingerprint):
+    """Converts a fingerprint into a (non-negative) integer. (e.g. for sharding)"""
+    return struct.unpack('<Q', fingerprint[:8])[0]
 
 
 def hash_dict(dictionary):
-    # NOTE: If we have a recursive dictionary, we have bigger problems.
-    return hash(frozenset(
-        [(key, hash_dict(value) if isinstance(value, dict) else value)
-         for key, value in dictionary.items()]))
+    """Produces a stable digest of the given dictionary."""
+    return fingerprint_values(sorted(dictionary.items()))
+
+
+class EventDataFingerprinter(object):
+    """Produces stable digests of the event data of plaso events.
+
+    The attributes to include are worked out once per attribute layout instead of
+    filtering EXCLUDED_ATTRIBUTES for every event. (Events of a single data type
+    nearly always share the same layout, so there is usually only one.)
+    """
+
+    def __init__(self):
+        self._projections = {}
+
+    def fingerprint(self, event):
+        """Fingerprints the event such that two events would match if all their data
+        minus timestamp information and uuid's are the same."""
+        # NOTE: plaso attribute containers keep their attributes in __dict__,
+        # which is what GetAttributes() iterates over.
+        attributes = event.__dict__
+        layout = tuple(attributes)
+        projection = self._projections.get(layout, None)
+        if projection is None:
+            projection = tuple(sorted(
+                name for name in layout
+                if not name.startswith('_') and name not in EXCLUDED_ATTRIBUTES))
+            self._projections[layout] = projection
+        # Like GetAttributes(), attributes set to None are left out, so they match
+        # events which don't have them at all.
+        names = tuple(name for name in projection if attributes[name] is not None)
+        values = _stable_values([attributes[name] for name in names])
+        return hashlib.sha256(repr((names, values))).digest()[:_FINGERPRINT_SIZE]
+
+
+_event_data_fingerprinter = EventDataFingerprinter()
 
 
 def hash_event_data(event):
@@ -25,15 +194,4 @@ def hash_event_data(event):
     Hashes event such that two events would match if all their data minus
     timestamp information and uuid's are the same.
     """
-    # TODO: We should not be excluding pathspec and other source attributes when
-    # we produce parser specific actions.
-    excluded_attributes = {
-        'display_name', 'filename', 'inode', 'pathspec', 'store_index', 'parser',
-        'store_number', 'tag', 'timestamp', 'timestamp_desc', 'uuid'}
-
-    event_dict = {}
-    for name, value in event.GetAttributes():
-        if name not in excluded_attributes:
-            event_dict[name] = value
-
-    return hash_dict(event_dict)
+    return _event_data_fingerprinter.fingerprint(event)
@@ -0,0 +1,133 @@
+"""Lightweight references to nodes which have already been exported into a document."""
+
+import case
+import rdflib
+
+
+class NodeRef(case.Node):
+    """Reference to an already exported node, identified only by its rdflib term.
+
+    Can be used anywhere a CASE API node is expected (adding properties, linking
+    it from other nodes, creating property bundles on it) without re-creating the
+    node in the graph.
+
+    NOTE: The CASE API recognizes nodes by isinstance() checks on case.Node,
+    which has no __slots__, so a NodeRef still carries an attribute dictionary
+    (though not the URI string of the CASE API nodes).
+    """
+
+    def __init__(self, document, term):
+        """Initializes NodeRef.
+
+        Args:
+            document: CASE document the node was exported to.
+            term: rdflib URIRef or BNode of the node.
+        """
+        # NOTE: Not calling the parent constructor, because that would add the node
+        # to the graph again.
+        self._document = document
+        self._graph = document.graph
+        self._node = term
+
+    def __eq__(self, other):
+        return isinstance(other, NodeRef) and self._node == other._node
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._node)
+
+    def create_property_bundle(self, type=None, **kwargs):
+        """Creates a property bundle on the referenced node."""
+        pb = self._document.create_node(type, bnode=True, **kwargs)
+        self.add('propertyBundle', pb)
+        return pb
+
+
+def reference(document, node):
+    """Creates a NodeRef to the given CASE API node or rdflib term.
+
+    Caches keep the rdflib terms of the nodes they hold (see term()) and use
+    this to add triples to them again.
+    """
+    if isinstance(node, NodeRef):
+        return node
+    if isinstance(node, (rdflib.URIRef, rdflib.BNode)):
+        return NodeRef(document, node)
+    return NodeRef(document, node._node)
+
+
+def term(node):
+    """Retrieves the rdflib term of the given CASE API node (or NodeRef), for keeping in a cache.
+
+    Unlike the term, the node objects carry an attribute dictionary, and CASE
+    API nodes their URI as a string as well.
+    """
+    return node._node
+
+
+class TraceRecord(object):
+    """Compact record of an exported trace and one of its property bundles.
+
+    Only their rdflib terms are kept. rehydrate() creates NodeRefs for them when
+    triples need to be added to either of them again.
+    """
+
+    __slots__ = ('trace', 'property_bundle')
+
+    def __init__(self, trace, property_bundle):
+        """Initializes TraceRecord.
+
+        Args:
+            trace: CASE API node (or NodeRef) of the trace.
+            property_bundle: CASE API node (or NodeRef) of the property bundle.
+        """
+        self.trace = trace._node
+        self.property_bundle = property_bundle._node
+
+    def __getstate__(self):
+        return self.trace, self.property_bundle
+
+    def __setstate__(self, state):
+        self.trace, self.property_bundle = state
+
+    def rehydrate(self, document):
+        """Retrieves NodeRefs to the trace and property bundle in the given document."""
+        return NodeRef(document, self.trace), NodeRef(document, self.property_bundle)
+
+
+def dehydrate(value):
+    """Replaces the CASE API nodes within the given value with their rdflib terms.
+
+    Args:
+        value: A CASE API node or a (possibly nested) dict, list, set or tuple
+            containing them.
+
+    Returns:
+        A copy of value which can be pickled independently of the document.
+    """
+    if isinstance(value, case.Node):
+        return value._node
+    if isinstance(value, dict):
+        return dict((dehydrate(key), dehydrate(item)) for key, item in value.items())
+    if isinstance(value, (list, set, frozenset, tuple)):
+        return type(value)(dehydrate(item) for item in value)
+    return value
+
+
+def rehydrate(document, value):
+    """Replaces the rdflib node terms within a dehydrated value with NodeRefs.
+
+    Args:
+        document: CASE document the nodes were exported to.
+        value: A value previously produced by dehydrate().
+    """
+    if isinstance(value, (rdflib.URIRef, rdflib.BNode)):
+        return NodeRef(document, value)
+    if isinstance(value, dict):
+        return dict((rehydrate(document, key), rehydrate(document, item))
+                    for key, item in value.items())
+    if isinstance(value, (list, set, frozenset, tuple)):
+        return type(value)(rehydrate(document, item) for item in value)
+    return value
@@ -0,0 +1,221 @@
+"""Helpers for exporting events in multiple worker processes and merging their results."""
+
+import cPickle as pickle
+import multiprocessing
+import Queue
+import traceback
+
+import rdflib
+
+from case_plaso import streaming
+
+
+class TripleSpool(object):
+    """Stand-in for an rdflib.Graph which pickles added triples to a file in chunks.
+
+    Used by worker processes to hand their partial graph back to the parent
+    process without needing to re-parse a serialized format.
+    """
+
+    CHUNK_SIZE = 10000
+
+    def __init__(self, destination):
+        """Initializes TripleSpool.
+
+        Args:
+            destination: File path to spool the triples to.
+        """
+        self.namespace_manager = rdflib.namespace.NamespaceManager(rdflib.Graph())
+        self.triple_count = 0
+        self._chunk = []
+        self._file = open(destination, 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, triple):
+        self._chunk.append(triple)
+        self.triple_count += 1
+        if len(self._chunk) >= self.CHUNK_SIZE:
+            self._write_chunk()
+
+    def addN(self, quads):
+        for subject, predicate, object_, _ in quads:
+            self.add((subject, predicate, object_))
+
+    def _write_chunk(self):
+        pickle.dump(self._chunk, self._file, pickle.HIGHEST_PROTOCOL)
+        self._chunk = []
+
+    def close(self):
+        if not self._file.closed:
+            if self._chunk:
+                self._write_chunk()
+            self._file.close()
+
+    @staticmethod
+    def read(path):
+        """Yields the triples spooled to the given file."""
+        with open(path, 'rb') as file_object:
+            while True:
+                try:
+                    chunk = pickle.load(file_object)
+                except EOFError:
+                    return
+                for triple in chunk:
+                    yield triple
+
+
+def create_partial_graph(destination, streamed):
+    """Creates the graph a worker process should export its partial results into.
+
+    Args:
+        destination: File path to write the partial results to.
+        streamed: Whether the partial results will be merged into a StreamingGraph.
+    """
+    if streamed:
+        # Streamed output can simply be concatenated.
+        return streaming.StreamingGraph(destination, format='nt')
+    return TripleSpool(destination)
+
+
+def merge_partial_graph(path, graph):
+    """Merges the partial results created by create_partial_graph() into the given graph."""
+    if isinstance(graph, streaming.StreamingGraph):
+        graph.add_ntriples_file(path)
+    else:
+        graph.addN((subject, predicate, object_, graph)
+                   for subject, predicate, object_ in TripleSpool.read(path))
+
+
+def _iter_queue(queue):
+    """Yields the items of the blocks put on the given queue, until None is put on it."""
+    for block in iter(queue.get, None):
+        for item in block:
+            yield item
+
+
+def _run_worker(target, shard, task, queue, results):
+    """Worker process function running the target on the items handed to its shard."""
+    try:
+        result = target(task, _iter_queue(queue))
+    except Exception:
+        results.put((shard, False, traceback.format_exc()))
+    else:
+        results.put((shard, True, result))
+
+
+class ShardWorkers(object):
+    """Worker processes each exporting a single shard of items (e.g. events).
+
+    Only the parent process reads the items. It hands each item to the worker of
+    its shard, in blocks, through a bounded queue per worker, so a slow worker
+    holds the parent back instead of piling up items in memory.
+    """
+
+    # Number of seconds to wait on a full queue before checking the workers again.
+    _POLL_INTERVAL = 1.0
+
+    def __init__(self, target, tasks, queue_size=4, block_size=1024):
+        """Initializes ShardWorkers and starts the worker processes.
+
+        Args:
+            target: Module level function called in each worker process with its
+                task and an iterable of the items handed to its shard. Its return
+                value (which must be picklable) is returned by join().
+            tasks: List of the tasks of each shard.
+            queue_size: Number of blocks of items that may be queued for each worker.
+            block_size: Number of items handed to a worker at a time.
+        """
+        self.num_shards = len(tasks)
+        self.block_size = block_size
+        self._results = multiprocessing.Queue()
+        self._received = {}
+        self._blocks = [[] for _ in tasks]
+        self._queues = []
+        self._processes = []
+        for shard, task in enumerate(tasks):
+            queue = multiprocessing.Queue(queue_size)
+            process = multiprocessing.Process(
+                target=_run_worker, args=(target, shard, task, queue, self._results),
+                name='shard-{}'.format(shard))
+            process.daemon = True
+            process.start()
+            self._queues.append(queue)
+            self._processes.append(process)
+
+    def _receive(self, block=False):
+        """Receives the results of finished workers.
+
+        Raises:
+            RuntimeError: If a worker failed.
+        """
+        while True:
+            try:
+                shard, succeeded, result = self._results.get(block, self._POLL_INTERVAL)
+            except Queue.Empty:
+                break
+            if not succeeded:
+                raise RuntimeError('Worker process of shard {} failed:\n{}'.format(shard, result))
+            self._received[shard] = result
+            block = False
+
+    def _check(self):
+        """Raises a RuntimeError if a worker failed or died."""
+        self._receive()
+        for shard, process in enumerate(self._processes):
+            if process.exitcode is not None and shard not in self._received:
+                # Results are put on the queue before exiting, so look once more.
+                self._receive(block=True)
+                if shard not in self._received:
+                    raise RuntimeError('Worker process of shard {} exited with code {}.'.format(
+                        shard, process.exitcode))
+
+    def _put(self, shard, block):
+        while True:
+            try:
+                self._queues[shard].put(block, True, self._POLL_INTERVAL)
+                return
+            except Queue.Full:
+                self._check()
+
+    def put(self, shard, item):
+        """Hands the given item to the worker of the given shard."""
+        block = self._blocks[shard]
+        block.append(item)
+        if len(block) >= self.block_size:
+            self._put(shard, block)
+            self._blocks[shard] = []
+
+    def join(self):
+        """Waits for the workers to process all items.
+
+        Returns:
+            List of the results of the workers, in the order of the shards.
+
+        Raises:
+            RuntimeError: If a worker failed.
+        """
+        for shard, block in enumerate(self._blocks):
+            if block:
+                self._put(shard, block)
+            self._put(shard, None)
+        self._blocks = [[] for _ in self._blocks]
+        while len(self._received) < self.num_shards:
+            self._receive(block=True)
+            self._check()
+        for process in self._processes:
+            process.join()
+        return [self._received[shard] for shard in range(self.num_shards)]
+
+    def terminate(self):
+        """Stops any workers still running and waits for them to exit, so they no
+        longer use any (temporary) files."""
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            process.join()
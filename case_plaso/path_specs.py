@@ -0,0 +1,163 @@
+"""Index of the dfvfs path specs seen during an export."""
+
+import operator
+
+from case_plaso import lib
+
+
+# Attribute names and getter of the identifying attribute values per path spec class.
+_ATTRIBUTE_GETTERS = {}
+
+
+def _attributes(path_spec):
+    """Retrieves the attribute values identifying a path spec within its parent."""
+    attributes = path_spec.__dict__
+    getter = _ATTRIBUTE_GETTERS.get(type(path_spec))
+    if getter is None:
+        # dfvfs path specs set all of their attributes (even if None) when initialized.
+        names = sorted(name for name in attributes if name != 'parent')
+        if names:
+            getter = (frozenset(attributes), operator.itemgetter(*names))
+        else:
+            getter = (frozenset(attributes), lambda attributes: ())
+        _ATTRIBUTE_GETTERS[type(path_spec)] = getter
+    if attributes.viewkeys() != getter[0]:
+        # Not laid out like the first path spec of its class, so include the names.
+        return ('',) + tuple(sorted(
+            (name, value) for name, value in attributes.items() if name != 'parent'))
+    return getter[1](attributes)
+
+
+class PathSpecIndex(object):
+    """Interns each node of the dfvfs path spec chains as a small integer.
+
+    dfvfs rebuilds the comparable string of the whole parent chain every time
+    path_spec.comparable is accessed, so keying on it costs time and memory in
+    proportion to the chain's depth for every event. Instead, each node is keyed
+    on the node of its parent, its type indicator and its own attributes, so
+    looking up a file only hashes a few short tuples once the volume level nodes
+    (image, partition, volume shadow, file system) are known.
+
+    The interned nodes are kept in a dictionary-like cache, which may be created
+    by a cache factory, so they can spill over to disk and are committed along
+    with the exporter's other caches for a checkpoint. Besides that, the index
+    only holds the number of interned nodes.
+
+    The nodes of the most recently looked up path spec objects are remembered,
+    so the several lookups made for an event's path spec, and lookups of path
+    specs sharing parent objects, don't walk the chain again. (Path specs read
+    from a storage file have a chain of their own, so it is walked once per event.)
+
+    Chains are walked iteratively, so there is no limit on their depth.
+    """
+
+    # Parent of the nodes without a parent path spec.
+    ROOT = -1
+
+    # Number of recently looked up path spec objects to remember the nodes of.
+    RECENT_SIZE = 4096
+
+    def __init__(self, nodes=None):
+        """Initializes PathSpecIndex.
+
+        Args:
+            nodes: Dictionary-like cache to keep the interned nodes in.
+                (Defaults to a dictionary.)
+        """
+        # (node, shard key) of each (parent node, path spec class, attributes) key.
+        self._nodes = {} if nodes is None else nodes
+        self._size = 0
+        # Path spec, node and shard key by id of the recently looked up path specs.
+        # (The path specs are kept, so their ids aren't reused while they're in here.)
+        self._recent = {}
+
+    def __len__(self):
+        return self._size
+
+    def _intern(self, parent, parent_shard_key, path_spec):
+        key = (parent, type(path_spec), _attributes(path_spec))
+        entry = self._nodes.get(key)
+        if entry is None:
+            shard_key = lib.fingerprint_to_int(lib.fingerprint_values(
+                [parent_shard_key, path_spec.type_indicator, key[2]])) & 0xffffffff
+            entry = (self._size, shard_key)
+            self._nodes[key] = entry
+            self._size += 1
+        return entry
+
+    def _chain(self, path_spec):
+        """Lists the path specs of the given path spec's chain, from the root down."""
+        path_specs = []
+        while path_spec is not None:
+            path_specs.append(path_spec)
+            path_spec = path_spec.parent
+        path_specs.reverse()
+        return path_specs
+
+    def _lookup(self, path_spec):
+        """Interns the nodes of the given path spec's chain.
+
+        Returns:
+            Tuple containing the node and shard key of the given path spec.
+        """
+        entry = self._recent.get(id(path_spec))
+        if entry is not None:
+            return entry[1:]
+        # Only the path specs below the closest recently looked up one are interned.
+        node, shard_key = self.ROOT, 0
+        path_specs = []
+        while path_spec is not None:
+            entry = self._recent.get(id(path_spec))
+            if entry is not None:
+                node, shard_key = entry[1:]
+                break
+            path_specs.append(path_spec)
+            path_spec = path_spec.parent
+        if len(self._recent) + len(path_specs) > self.RECENT_SIZE:
+            self._recent = {}
+        for path_spec in reversed(path_specs):
+            node, shard_key = self._intern(node, shard_key, path_spec)
+            self._recent[id(path_spec)] = (path_spec, node, shard_key)
+        return node, shard_key
+
+    def lookup(self, path_spec):
+        """Interns the nodes of the given path spec's chain.
+
+        Args:
+            path_spec: dfvfs PathSpec.
+
+        Returns:
+            The node of the given path spec.
+        """
+        return self._lookup(path_spec)[0]
+
+    def lookup_chain(self, path_spec):
+        """Interns the nodes of the given path spec's chain.
+
+        Args:
+            path_spec: dfvfs PathSpec.
+
+        Returns:
+            List of (node, path spec) tuples, from the root of the chain down to
+            the given path spec.
+        """
+        # Looking up the path spec remembers the nodes of its whole chain.
+        self.lookup(path_spec)
+        return [(self.lookup(chain_path_spec), chain_path_spec)
+                for chain_path_spec in self._chain(path_spec)]
+
+    def shard_key(self, path_spec):
+        """Retrieves an integer derived from the given path spec's chain.
+
+        Unlike the node of the path spec, the key is the same in every process and run.
+        """
+        return self._lookup(path_spec)[1]
+
+    def get_state(self):
+        """Retrieves the state of the index, other than its nodes, for a checkpoint."""
+        return self._size
+
+    def set_state(self, state):
+        """Restores the state produced by get_state(), after the nodes were restored."""
+        self._size = state
+        self._recent = {}
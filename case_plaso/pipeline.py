@@ -0,0 +1,256 @@
+"""Stages running alongside the export in their own threads, connected by bounded queues.
+
+Reading events from a plaso storage file spends much of its time decompressing
+and reading the ZIP archive, and writing streamed output spends much of its
+time in file writes, both of which release the GIL. Running them in their own
+threads lets them overlap with building the triples, while the bounded queues
+keep a slow stage from piling up events or triples in memory.
+"""
+
+import itertools
+import Queue
+import sys
+import threading
+import time
+
+from case_plaso import progress
+
+
+# Seconds between checks whether a stage blocked on a queue has been stopped.
+_POLL_INTERVAL = 0.1
+
+
+class _Failure(object):
+    """Queue item carrying an exception raised in a stage's thread."""
+
+    def __init__(self, exc_info):
+        self.exc_info = exc_info
+
+    def reraise(self):
+        raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+
+
+# Queue item marking the end of the items.
+_END = object()
+
+
+class ReaderStage(object):
+    """Iterates over the items of an iterable, which are read ahead in a thread.
+
+    The items are handed over in blocks, so the queue isn't locked once per item.
+    Exceptions raised while reading are raised again by the consuming thread.
+    """
+
+    def __init__(self, iterable, queue_size=4, block_size=1024, name='reader'):
+        """Initializes ReaderStage and starts its thread.
+
+        Args:
+            iterable: Iterable of the items to read. (Only iterated by the thread.)
+            queue_size: Number of blocks that may be read ahead of the consumer.
+            block_size: Number of items per block.
+            name: Name of the stage.
+        """
+        self.name = name
+        # Number of items read, seconds spent reading them and seconds spent
+        # waiting for the consumer to make room in the queue.
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        # Seconds the consumer spent waiting for blocks to be read.
+        self.starved_seconds = 0.0
+        self._queue = Queue.Queue(queue_size)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(iter(iterable), block_size), name='case_plaso ' + name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _put(self, item):
+        start_time = time.time()
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=_POLL_INTERVAL)
+                break
+            except Queue.Full:
+                pass
+        self.blocked_seconds += time.time() - start_time
+
+    def _run(self, iterator, block_size):
+        try:
+            while not self._stopped.is_set():
+                start_time = time.time()
+                block = list(itertools.islice(iterator, block_size))
+                self.busy_seconds += time.time() - start_time
+                if not block:
+                    break
+                self.items += len(block)
+                self._put(block)
+            self._put(_END)
+        except BaseException:
+            self._put(_Failure(sys.exc_info()))
+
+    def __iter__(self):
+        while True:
+            start_time = time.time()
+            while True:
+                # NOTE: Waiting without a timeout can't be interrupted by Ctrl+C in Python 2.
+                try:
+                    block = self._queue.get(timeout=_POLL_INTERVAL)
+                    break
+                except Queue.Empty:
+                    pass
+            self.starved_seconds += time.time() - start_time
+            if block is _END:
+                return
+            if isinstance(block, _Failure):
+                block.reraise()
+            for item in block:
+                yield item
+
+    def close(self):
+        """Stops and waits for the thread, discarding anything read ahead."""
+        self._stopped.set()
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=_POLL_INTERVAL)
+            except Queue.Empty:
+                pass
+        self._thread.join()
+
+    def record_statistics(self, statistics, consumer='export'):
+        """Records the metrics of the stage (and the waits of its consumer) in the given Statistics."""
+        statistics.record_stage(
+            self.name, items=self.items, busy_seconds=self.busy_seconds,
+            blocked_seconds=self.blocked_seconds)
+        statistics.record_stage(consumer, waiting_seconds=self.starved_seconds)
+
+
+class WriterStage(object):
+    """Stand-in for an rdflib.Graph which hands the added triples in batches to a
+    thread adding them to the wrapped graph (e.g. a StreamingGraph).
+
+    flush() waits for the thread to write everything handed to it, so checkpoints
+    see the complete output. Anything else done with the graph is passed on to
+    the wrapped graph, after waiting for the thread. Exceptions raised by the
+    wrapped graph are raised again by the next add() or flush().
+    """
+
+    def __init__(self, graph, queue_size=4, batch_size=10000, name='writer'):
+        """Initializes WriterStage and starts its thread.
+
+        Args:
+            graph: rdflib Graph (or graph-like sink) to pass the triples on to.
+            queue_size: Number of batches that may be waiting to be written.
+            batch_size: Number of triples per batch.
+            name: Name of the stage.
+        """
+        self.graph = graph
+        self.name = name
+        self.batch_size = batch_size
+        # Number of triples written, seconds spent writing them and seconds spent
+        # waiting for batches.
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.waiting_seconds = 0.0
+        # Seconds the producer spent waiting for room in the queue.
+        self.blocked_seconds = 0.0
+        self._batch = []
+        # Number of triples handed to the thread. (Only updated by the producer.)
+        self._handed_off = 0
+        self._failure = None
+        self._queue = Queue.Queue(queue_size)
+        self._thread = threading.Thread(target=self._run, name='case_plaso ' + name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __getattr__(self, name):
+        self._drain()
+        return getattr(self.graph, name)
+
+    @property
+    def triple_count(self):
+        """Number of triples added, including the ones not written yet."""
+        return (progress.count_triples(self.graph) + self._handed_off - self.items +
+                len(self._batch))
+
+    def _run(self):
+        graph = self.graph
+        while True:
+            start_time = time.time()
+            batch = self._queue.get()
+            self.waiting_seconds += time.time() - start_time
+            try:
+                if batch is _END:
+                    return
+                if self._failure is None:
+                    start_time = time.time()
+                    try:
+                        graph.addN((subject, predicate, object_, graph)
+                                   for subject, predicate, object_ in batch)
+                    except BaseException:
+                        # Keep taking batches, so the producer never blocks on the queue.
+                        self._failure = _Failure(sys.exc_info())
+                    self.busy_seconds += time.time() - start_time
+                self.items += len(batch)
+            finally:
+                self._queue.task_done()
+
+    def _hand_off(self):
+        if self._failure:
+            self._failure.reraise()
+        if self._batch:
+            batch, self._batch = self._batch, []
+            self._handed_off += len(batch)
+            start_time = time.time()
+            while True:
+                try:
+                    self._queue.put(batch, timeout=_POLL_INTERVAL)
+                    break
+                except Queue.Full:
+                    pass
+            self.blocked_seconds += time.time() - start_time
+
+    def _drain(self):
+        """Waits for the thread to write everything added so far."""
+        self._hand_off()
+        self._queue.join()
+        if self._failure:
+            self._failure.reraise()
+
+    def add(self, triple):
+        """Adds the given (subject, predicate, object) triple to the pending batch."""
+        self._batch.append(triple)
+        if len(self._batch) >= self.batch_size:
+            self._hand_off()
+
+    def addN(self, quads):
+        """Adds the given quads to the pending batch, placing them in the wrapped graph."""
+        self._batch.extend(
+            (subject, predicate, object_) for subject, predicate, object_, _ in quads)
+        if len(self._batch) >= self.batch_size:
+            self._hand_off()
+
+    def flush(self):
+        """Waits for the pending triples to be written and flushes the wrapped graph."""
+        self._drain()
+        flush = getattr(self.graph, 'flush', None)
+        if flush:
+            flush()
+
+    def close(self):
+        """Waits for the pending triples to be written, stops the thread and closes
+        the wrapped graph."""
+        try:
+            self._drain()
+        finally:
+            if self._thread.is_alive():
+                self._queue.put(_END)
+                self._thread.join()
+        self.graph.close()
+
+    def record_statistics(self, statistics, producer='export'):
+        """Records the metrics of the stage (and the waits of its producer) in the given Statistics."""
+        statistics.record_stage(
+            self.name, items=self.items, busy_seconds=self.busy_seconds,
+            waiting_seconds=self.waiting_seconds)
+        statistics.record_stage(producer, blocked_seconds=self.blocked_seconds)
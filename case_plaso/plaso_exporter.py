@@ -1,14 +1,19 @@
 
+import contextlib
+import os
+import shutil
+import tempfile
+
+import case
 from dfvfs.lib import definitions as dfvfs_definitions
 from plaso.engine.knowledge_base import KnowledgeBase
 from plaso.storage import zip_file
 
-from case_plaso import PLASO, lib
+from case_plaso import PLASO, cache as cache_lib, identifiers as identifiers_lib, lib, nodes
+from case_plaso import buffering, event_filter, parallel, pipeline
+from case_plaso import stats as stats_lib, streaming
 from case_plaso.event_exporter import EventExporter
 
-# Import event exporters to get them registered.
-from case_plaso import event_exporters as _
-
 
 class PlasoExporter(object):
     """Exports plaso data into a RDF graph using the CASE ontology."""
@@ -25,22 +30,60 @@ class PlasoExporter(object):
         'preferred_encoding',
         'preferred_year']
 
-    def __init__(self, document):
+    # Number of events read from the storage file at a time.
+    _BLOCK_SIZE = 1024
+
+    def __init__(self, document, identifiers=None, cache_factory=None, data_type_filter=None,
+                 statistics=None, progress=None, read_ahead=0, include_all_sources=False):
         """Initializes PlasoExporter.
 
         Args:
             document: CASE document to export plaso objects to.
+            identifiers: Scheme used to identify shared traces and objects.
+                (Defaults to random identifiers.)
+            cache_factory: Factory used by the event exporters to create their
+                deduplication caches. (Defaults to keeping everything in memory.)
+            data_type_filter: DataTypeFilter selecting the events to read from
+                storage files. (Defaults to all events with a registered exporter.)
+            statistics: Optional Statistics to record the export's counters and timers in.
+            progress: Optional ProgressReporter to keep updated on the number of
+                processed events.
+            read_ahead: Number of blocks of events to read from storage files ahead
+                of the export, in a thread of their own. (0 reads them in between
+                exporting the blocks.)
+            include_all_sources: Whether to export every event source of storage
+                files up front. (By default, an event source is only exported along
+                with the first exported event referring to its path spec.)
         """
         self.document = document
+        self.identifiers = identifiers or identifiers_lib.RandomIdentifiers()
+        self.cache_factory = cache_factory or cache_lib.MemoryCacheFactory()
+        self.data_type_filter = data_type_filter or event_filter.DataTypeFilter()
+        self.statistics = statistics or stats_lib.NullStatistics()
+        self.progress = progress
+        self.read_ahead = read_ahead
+        self.include_all_sources = include_all_sources
+        if isinstance(document.graph, buffering.TripleBuffer):
+            self._triple_buffer = document.graph
+        else:
+            self._triple_buffer = None
+        self._convert_timestamps = self.statistics.timed(
+            'lib.convert_timestamps', lib.convert_timestamps)
         # Add 'plaso' prefix used by custom property bundles to internal graph.
         self.document.graph.namespace_manager.bind('plaso', PLASO)
+        self.knowledge_base = {}
         self._event_exporters = {}
+        # Number of events read from previously exported storage files.
+        self._events_read = 0
 
     def get_event_exporter(self, data_type):
         """Retrieves event exporter for given event data_type."""
         if data_type not in self._event_exporters:
-            self._event_exporters[data_type] = EventExporter.from_data_type(
-                data_type, self.document)
+            event_exporter = EventExporter.from_data_type(
+                data_type, self.document, knowledge_base=self.knowledge_base,
+                identifiers=self.identifiers, cache_factory=self.cache_factory)
+            self.statistics.instrument_exporter(data_type, event_exporter)
+            self._event_exporters[data_type] = event_exporter
         return self._event_exporters[data_type]
 
     def export_path_spec(self, path_spec):
@@ -67,6 +110,14 @@ class PlasoExporter(object):
             # TODO: The rest are things like pipes, links, and sockets.
             pass
 
+    def index_event_source(self, event_source):
+        """Records the given event source, so it is exported along with the first
+        exported event referring to its path spec."""
+        if event_source.file_entry_type == dfvfs_definitions.FILE_ENTRY_TYPE_DIRECTORY:
+            self.get_event_exporter('fs:stat').index_path_spec(event_source.path_spec, True)
+        elif event_source.file_entry_type == dfvfs_definitions.FILE_ENTRY_TYPE_FILE:
+            self.get_event_exporter('fs:stat').index_path_spec(event_source.path_spec, False)
+
     def export_event(self, event):
         """Exports the given plaso EventObject into the graph."""
         # TODO: Extract parser chain information and other metadata (e.g. sqlite query used)
@@ -74,13 +125,30 @@ class PlasoExporter(object):
         event_exporter.export_event(event)
 
     def export_session(self, session):
-        """Exports the given plaso storage Session into the graph."""
-        instrument = self.document.create_CoreObject(
-            'Tool',
-            name=session.product_name,
-            version=session.product_version,
-            toolType='parser?',
-            creator='Joachim Metz')
+        """Exports the given plaso storage Session into the graph.
+
+        A session which was already exported (e.g. from another storage file) is
+        skipped. The tool and performer are exported once and shared by all sessions.
+        """
+        sessions = self.knowledge_base.setdefault('plaso_sessions', set())
+        identifier = getattr(session, 'identifier', None)
+        if identifier is not None:
+            if identifier in sessions:
+                return
+            sessions.add(identifier)
+
+        tools = self.knowledge_base.setdefault('plaso_tools', {})
+        instrument = tools.get((session.product_name, session.product_version))
+        if instrument is None:
+            instrument = self.identifiers.create_CoreObject(
+                self.document,
+                'Tool',
+                (session.product_name, session.product_version),
+                name=session.product_name,
+                version=session.product_version,
+                toolType='parser?',
+                creator='Joachim Metz')
+            tools[(session.product_name, session.product_version)] = instrument
         config = instrument.create_property_bundle('ToolConfiguration')
         for attribute in self._CONFIGURATION_ATTRIBUTES:
             if hasattr(session, attribute):
@@ -95,11 +163,15 @@ class PlasoExporter(object):
 
         # TODO: How do we know who performed the Plaso action? That information
         # is not in the plaso storage file...
-        performer = self.document.create_CoreObject('Identity')
-        performer.create_property_bundle(
-            'SimpleName',
-            givenName='John',
-            familyName='Doe')
+        performer = self.knowledge_base.get('plaso_performer')
+        if performer is None:
+            performer = self.identifiers.create_CoreObject(
+                self.document, 'Identity', ('John', 'Doe'))
+            self.identifiers.create_property_bundle(
+                self.document, performer, 'SimpleName',
+                givenName='John',
+                familyName='Doe')
+            self.knowledge_base['plaso_performer'] = performer
 
         action = self.document.create_CoreObject(
             'ForensicAction',
@@ -112,18 +184,336 @@ class PlasoExporter(object):
             result=None,   # TODO: We can't fill this in because we don't know what session created what event objects...
             location=None)  # TODO: How am I supposed to be able to get this information?
 
-    def export_storage_file(self, storage_file):
-        """Extracts and exports plaso event data and sources into the graph."""
+    def get_state(self):
+        """Retrieves the state of the knowledge base and event exporters for a checkpoint.
+
+        The contents of the disk caches are committed to their database instead of
+        being copied into the state, so the state stays small.
+        """
+        state = {
+            'data_types': self.data_type_filter.data_types,
+            'knowledge_base': dict(
+                (topic, nodes.dehydrate(value)) for topic, value in self.knowledge_base.items()
+                if not isinstance(value, cache_lib.DiskCache)),
+            'event_exporters': dict(
+                (data_type, event_exporter.get_state())
+                for data_type, event_exporter in self._event_exporters.items())}
+        self.cache_factory.commit()
+        return state
+
+    def set_state(self, state):
+        """Restores the state produced by get_state().
+
+        Raises:
+            RuntimeError: If the state was produced while exporting different data types.
+        """
+        # Checkpoint positions only count the events that passed the filter.
+        if state['data_types'] != self.data_type_filter.data_types:
+            raise RuntimeError('Cannot resume an export of different data types.')
+        self.knowledge_base.update(nodes.rehydrate(self.document, state['knowledge_base']))
+        for data_type, event_exporter_state in state['event_exporters'].items():
+            self.get_event_exporter(data_type).set_state(event_exporter_state)
+
+    def export_events(self, events, shard=0, num_shards=1, start=0, checkpointer=None):
+        """Exports the given plaso EventObjects into the graph.
+
+        Args:
+            events: Iterable of plaso EventObjects.
+            shard: Index of the shard of events to export.
+            num_shards: Number of shards the events are split into.
+            start: Number of events to skip, because they were already exported.
+            checkpointer: Optional Checkpointer to periodically record progress to.
+        """
+        data_types = EventExporter.data_types()
+        events_read = 0
+        for block in lib.iter_blocks(enumerate(events), self._BLOCK_SIZE):
+            # Convert the timestamps of the whole block at once, so the exporters
+            # only have to look up the resulting literals.
+            self._convert_timestamps([
+                event.timestamp for position, event in block
+                if position >= start and event.data_type in data_types])
+
+            for position, event in block:
+                if position < start:
+                    continue
+                if checkpointer and position % checkpointer.interval == 0:
+                    # The checkpoint must include every triple exported so far.
+                    if self._triple_buffer:
+                        self._triple_buffer.flush()
+                    checkpointer.save(position, self.get_state())
+                event_exporter = self.get_event_exporter(event.data_type)
+                if num_shards == 1 or event_exporter.get_shard_key(event) % num_shards == shard:
+                    event_exporter.export_event(event)
+                if self._triple_buffer and (position + 1) % self._triple_buffer.flush_events == 0:
+                    self._triple_buffer.flush()
+
+            events_read = block[-1][0] + 1
+            if self.progress:
+                # Skipped events were read as well.
+                self.progress.update(
+                    self._events_read + events_read +
+                    sum(self.data_type_filter.skipped.values()))
+
+        self._events_read += events_read
+        if self._triple_buffer:
+            self._triple_buffer.flush()
+
+    @contextlib.contextmanager
+    def _read_events(self, storage_reader):
+        """Context manager providing the events to export from the storage reader."""
+        events = self.data_type_filter.read_events(storage_reader)
+        if not self.read_ahead:
+            yield events
+            return
+        # Read and decompress the events while the previous blocks are being exported.
+        reader = pipeline.ReaderStage(
+            events, queue_size=self.read_ahead, block_size=self._BLOCK_SIZE)
+        try:
+            yield reader
+        finally:
+            reader.close()
+            reader.record_statistics(self.statistics)
+
+    @contextlib.contextmanager
+    def _phase(self, name):
+        """Context manager marking a phase of the export for statistics and progress reports."""
+        if self.progress:
+            self.progress.start_phase(name)
+        with self.statistics.phase(name):
+            yield
+
+    def export_storage_file(self, storage_file, workers=1, checkpointer=None, checkpoint=None):
+        """Extracts and exports plaso event data and sources into the graph.
+
+        Args:
+            storage_file: Path to the plaso storage file.
+            workers: Number of worker processes to export the events with.
+                (Requires content derived identifiers, see export_storage_files().)
+            checkpointer: Optional Checkpointer to periodically record progress to.
+                (Not supported with multiple workers. Requires a DiskCacheFactory,
+                whose database holds the contents of the caches.)
+            checkpoint: Checkpoint, loaded by the checkpointer, to resume the export from.
+        """
+        if checkpointer and workers > 1:
+            raise ValueError('Checkpoints are not supported with multiple workers.')
+        if checkpointer and not isinstance(self.cache_factory, cache_lib.DiskCacheFactory):
+            # Otherwise every checkpoint would have to copy all of the cache entries.
+            raise ValueError('Checkpoints require a DiskCacheFactory.')
+        if workers > 1:
+            self.export_storage_files([storage_file], workers=workers)
+            return
+
+        if self.progress:
+            self.progress.events_total = self._count_events([storage_file])
+
         with zip_file.ZIPStorageFileReader(storage_file) as storage_reader:
-            knowledge_base = KnowledgeBase()
-            storage_reader.ReadPreprocessingInformation(knowledge_base)
-            # TODO: Export knowledge base.
+            if checkpoint:
+                # Sessions and sources are exported before the first checkpoint is taken.
+                self.set_state(checkpoint['exporter_state'])
+                start = checkpoint['position']
+            else:
+                self._export_sessions_and_sources(storage_reader)
+                start = 0
+
+            # NOTE: plaso can't seek within the events, so resuming still has to
+            # read through the events that were already exported.
+            with self._phase('events'), self._read_events(storage_reader) as events:
+                self.export_events(events, start=start, checkpointer=checkpointer)
+
+        self.statistics.record_skipped(self.data_type_filter.skipped)
+        self.statistics.record_caches(self._event_exporters.values())
 
+    def export_storage_files(self, storage_files, workers=1):
+        """Extracts and exports the event data and sources of multiple plaso storage
+        files into the graph.
+
+        All storage files share the same event exporters, so their sessions, tool
+        and the traces of path specs found in more than one of them are exported
+        once. (With multiple workers, events of the same file in different storage
+        files are exported by the same worker.)
+
+        Args:
+            storage_files: Paths to the plaso storage files.
+            workers: Number of worker processes to export the events with.
+
+        Raises:
+            ValueError: If multiple workers are used with random identifiers.
+        """
+        # Nodes shared by events of different shards (e.g. contacts and hashes) are
+        # exported by every worker, which only refer to the same node if their
+        # identifiers are derived from content.
+        if workers > 1 and not isinstance(self.identifiers, identifiers_lib.ContentIdentifiers):
+            raise ValueError('Multiple workers require content derived identifiers.')
+
+        if self.progress:
+            self.progress.events_total = self._count_events(storage_files)
+
+        shard_workers = None
+        temp_directory = tempfile.mkdtemp(prefix='case_plaso_') if workers > 1 else None
+        try:
+            if temp_directory:
+                shard_workers = self._start_shard_workers(workers, temp_directory)
+            for storage_file in storage_files:
+                with zip_file.ZIPStorageFileReader(storage_file) as storage_reader:
+                    self._export_sessions_and_sources(storage_reader)
+                    with self._phase('events'), self._read_events(storage_reader) as events:
+                        if shard_workers:
+                            self._dispatch_events(events, shard_workers)
+                        else:
+                            self.export_events(events)
+            if shard_workers:
+                with self._phase('merge'):
+                    self._merge_shards(shard_workers)
+        finally:
+            if shard_workers:
+                shard_workers.terminate()
+            if temp_directory:
+                shutil.rmtree(temp_directory)
+
+        self.statistics.record_skipped(self.data_type_filter.skipped)
+        self.statistics.record_caches(self._event_exporters.values())
+
+    def _count_events(self, storage_files):
+        """Retrieves the number of events in the given storage files, or None if unknown."""
+        total = 0
+        for storage_file in storage_files:
+            with zip_file.ZIPStorageFileReader(storage_file) as storage_reader:
+                total += sum(
+                    session.parsers_counter['total']
+                    for session in storage_reader._storage_file.GetSessions())
+        return total or None
+
+    def _export_sessions_and_sources(self, storage_reader):
+        """Exports the sessions and event sources of a storage file.
+
+        Unless all event sources are included, they are only indexed, so the ones
+        referred to by exported events are exported along with them.
+
+        Args:
+            storage_reader: plaso storage reader of the storage file.
+        """
+        knowledge_base = KnowledgeBase()
+        storage_reader.ReadPreprocessingInformation(knowledge_base)
+        # TODO: Export knowledge base.
+
+        with self._phase('sessions'):
             for session in storage_reader._storage_file.GetSessions():
                 self.export_session(session)
 
+        with self._phase('event_sources'):
             for source in storage_reader.GetEventSources():
-                self.export_event_source(source)
+                if self.include_all_sources:
+                    self.export_event_source(source)
+                else:
+                    self.index_event_source(source)
+
+    def _start_shard_workers(self, workers, temp_directory):
+        """Starts the worker processes each exporting a shard of events into a partial
+        graph in the given directory.
+
+        Returns:
+            parallel.ShardWorkers handing the events to the workers.
+        """
+        graph = self.document.graph
+        flush_events = None
+        if self._triple_buffer:
+            graph = self._triple_buffer.graph
+            flush_events = self._triple_buffer.flush_events
+        streamed = isinstance(graph, streaming.StreamingGraph)
+        # Each worker gets its own disk caches with an equal share of the memory budget.
+        # (Their databases are in the temporary directory as well, so they are removed
+        # along with it even if the worker is terminated.)
+        cache_memory = getattr(self.cache_factory, 'memory_size', None)
+        if cache_memory:
+            cache_memory //= workers
+        tasks = [
+            (os.path.join(temp_directory, str(shard)), streamed, self.identifiers, cache_memory,
+             os.path.join(temp_directory, '{}.cache'.format(shard)),
+             isinstance(self.statistics, stats_lib.Statistics), flush_events)
+            for shard in range(workers)]
+        return parallel.ShardWorkers(
+            _export_shard, tasks, queue_size=max(self.read_ahead, 2), block_size=self._BLOCK_SIZE)
+
+    def _dispatch_events(self, events, shard_workers):
+        """Hands the given events to the workers exporting their shards.
+
+        The nodes an event shares with the events of other shards (e.g. the volume
+        of a file) are exported by this process, so the workers don't each export
+        them again. (See EventExporter.export_shared())
+        """
+        events_read = 0
+        for events_read, event in enumerate(events, 1):
+            event_exporter = self.get_event_exporter(event.data_type)
+            shard = event_exporter.get_shard_key(event) % shard_workers.num_shards
+            shard_workers.put(shard, (event, event_exporter.export_shared(event, shard)))
+            if self.progress and events_read % self._BLOCK_SIZE == 0:
+                # Skipped events were read as well.
+                self.progress.update(
+                    self._events_read + events_read +
+                    sum(self.data_type_filter.skipped.values()))
+        self._events_read += events_read
+        if self._triple_buffer:
+            self._triple_buffer.flush()
+
+    def _merge_shards(self, shard_workers):
+        """Waits for the workers and merges their partial graphs into our graph."""
+        graph = self.document.graph
+        if self._triple_buffer:
+            # Partial graphs are merged into the buffered graph directly.
+            self._triple_buffer.flush()
+            graph = self._triple_buffer.graph
+        for path, statistics in shard_workers.join():
+            parallel.merge_partial_graph(path, graph)
+            os.remove(path)
+            if statistics:
+                self.statistics.merge(statistics)
+        if self.progress:
+            self.progress.update(self._events_read + sum(self.data_type_filter.skipped.values()))
+
+    def _import_shared(self, items):
+        """Adopts the shared state of the events handed to a worker process.
+
+        Args:
+            items: Iterable of (event, shared state) tuples.
+
+        Yields:
+            The events.
+        """
+        for event, state in items:
+            if state is not None:
+                self.get_event_exporter(event.data_type).import_shared(event, state)
+            yield event
+
+
+def _export_shard(task, items):
+    """Worker process function for exporting a single shard of events.
+
+    Args:
+        task: Tuple describing the shard, produced by PlasoExporter._start_shard_workers().
+        items: Iterable of (event, shared state) tuples handed to the shard.
 
-            for event in storage_reader.GetEvents():
-                self.export_event(event)
+    Returns:
+        Tuple containing the path of the file containing the partial results and
+        the worker's Statistics (or None).
+    """
+    (destination, streamed, identifiers, cache_memory, cache_path, record_statistics,
+     flush_events) = task
+    if cache_memory:
+        cache_factory = cache_lib.DiskCacheFactory(cache_memory, path=cache_path)
+    else:
+        cache_factory = cache_lib.MemoryCacheFactory(counted=record_statistics)
+    statistics = stats_lib.Statistics() if record_statistics else None
+    try:
+        with parallel.create_partial_graph(destination, streamed) as partial_graph:
+            graph = partial_graph
+            if flush_events:
+                graph = buffering.TripleBuffer(partial_graph, flush_events=flush_events)
+            exporter = PlasoExporter(
+                case.Document(graph), identifiers=identifiers,
+                cache_factory=cache_factory, statistics=statistics)
+            exporter.export_events(exporter._import_shared(items))
+            if statistics:
+                statistics.record_caches(exporter._event_exporters.values())
+    finally:
+        cache_factory.close(remove=True)
+    return destination, statistics
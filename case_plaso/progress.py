@@ -0,0 +1,203 @@
+"""Periodic reporting of the progress of an export."""
+
+import datetime
+import io
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+import rdflib
+
+
+def count_triples(graph):
+    """Retrieves the number of triples added to the given graph (or graph-like sink)."""
+    triple_count = getattr(graph, 'triple_count', None)
+    if triple_count is not None:
+        return triple_count
+    return len(graph)
+
+
+def resident_memory():
+    """Retrieves the resident memory of the current process in bytes."""
+    try:
+        with open('/proc/self/statm') as file_object:
+            return int(file_object.read().split()[1]) * resource.getpagesize()
+    except (IOError, IndexError, ValueError):
+        # Not on Linux, so fall back to the peak resident memory.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def available_memory():
+    """Retrieves the memory available for new processes in bytes, or None if unknown."""
+    try:
+        with open('/proc/meminfo') as file_object:
+            for line in file_object:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, IndexError, ValueError):
+        pass
+    return None
+
+
+def estimate_serialization_time(graph, format, sample_size=2000):
+    """Estimates how long serializing the given graph will take.
+
+    Times the serialization of a sample of the graph's triples and extrapolates.
+
+    Args:
+        graph: rdflib Graph (or BatchedGraph) to be serialized.
+        format: The serialization format.
+        sample_size: Maximum number of triples to serialize for the estimate.
+
+    Returns:
+        The estimated number of seconds.
+    """
+    sample = rdflib.Graph()
+    for prefix, namespace in graph.namespaces():
+        sample.bind(prefix, namespace)
+    for triple in graph.triples((None, None, None)):
+        if len(sample) >= sample_size:
+            break
+        sample.add(triple)
+    if not len(sample):
+        return 0.0
+    start_time = time.time()
+    sample.serialize(destination=io.BytesIO(), format=format)
+    return (time.time() - start_time) * count_triples(graph) / len(sample)
+
+
+def _format_duration(seconds):
+    return str(datetime.timedelta(seconds=int(seconds)))
+
+
+class ProgressReporter(object):
+    """Reports the progress of an export from a background thread.
+
+    Every interval a line is written to stderr and, optionally, a JSON document
+    is (atomically) written to a progress file, so a job scheduler can tell
+    stalled or runaway exports apart from slow ones.
+    """
+
+    def __init__(self, graph, interval=10.0, path=None, stream=sys.stderr):
+        """Initializes ProgressReporter.
+
+        Args:
+            graph: Graph (or graph-like sink) the triples are exported into.
+            interval: Number of seconds between reports.
+            path: Optional file path to write the JSON progress document to.
+            stream: Stream to write the progress lines to.
+        """
+        self.graph = graph
+        self.interval = interval
+        self.path = path
+        self.stream = stream
+        self.phase = None
+        self.events_total = None
+        self.events_processed = 0
+        self._start_time = time.time()
+        self._phase_start_time = self._start_time
+        self._phase_estimate = None
+        self._last_report = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """Starts reporting in a background thread."""
+        self._thread = threading.Thread(target=self._run, name='progress')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stops reporting, after writing a final report."""
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.report()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def start_phase(self, phase, estimate=None):
+        """Starts reporting on a new phase of the export.
+
+        Args:
+            phase: Name of the phase. (e.g. 'events' or 'serialize')
+            estimate: Estimated number of seconds the phase will take, for phases
+                which can't report the number of processed events.
+        """
+        self.phase = phase
+        self._phase_start_time = time.time()
+        self._phase_estimate = estimate
+
+    def update(self, events_processed):
+        """Sets the number of events read from the storage file so far."""
+        self.events_processed = events_processed
+
+    def get_progress(self):
+        """Produces a dictionary describing the current progress."""
+        now = time.time()
+        events_processed = self.events_processed
+        triples = count_triples(self.graph)
+
+        # Rates are measured over the last interval, ETAs over the whole phase.
+        last_time, last_events, last_triples = self._last_report or (self._start_time, 0, 0)
+        elapsed = max(now - last_time, 1e-6)
+        progress = {
+            'phase': self.phase,
+            'time': now,
+            'elapsed_seconds': now - self._start_time,
+            'events_processed': events_processed,
+            'events_total': self.events_total,
+            'events_per_second': (events_processed - last_events) / elapsed,
+            'triples': triples,
+            'triples_per_second': (triples - last_triples) / elapsed,
+            'resident_memory': resident_memory(),
+            'eta_seconds': None,
+        }
+        phase_elapsed = now - self._phase_start_time
+        if self._phase_estimate is not None:
+            progress['eta_seconds'] = max(0.0, self._phase_estimate - phase_elapsed)
+        elif self.events_total and events_processed:
+            rate = events_processed / max(phase_elapsed, 1e-6)
+            progress['eta_seconds'] = max(0, self.events_total - events_processed) / rate
+        self._last_report = (now, events_processed, triples)
+        return progress
+
+    def report(self):
+        """Writes out the current progress."""
+        progress = self.get_progress()
+
+        if progress['events_total']:
+            events = '{}/{} events ({:.1%})'.format(
+                progress['events_processed'], progress['events_total'],
+                float(progress['events_processed']) / progress['events_total'])
+        else:
+            events = '{} events'.format(progress['events_processed'])
+        line = '[{}] {}, {:.0f} events/s, {} triples, {:.0f} triples/s, {:.0f} MB resident'.format(
+            progress['phase'], events, progress['events_per_second'], progress['triples'],
+            progress['triples_per_second'], progress['resident_memory'] / 1024.0 / 1024.0)
+        if progress['eta_seconds'] is not None:
+            line += ', ETA {}'.format(_format_duration(progress['eta_seconds']))
+        self.stream.write(line + '\n')
+        self.stream.flush()
+
+        if self.path:
+            # Replace the file in one go, so readers never see a partial document.
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as file_object:
+                json.dump(progress, file_object, sort_keys=True)
+            os.rename(temp_path, self.path)
+
@@ -0,0 +1,105 @@
+"""Serializing an exported graph into several formats at once, in parallel."""
+
+import multiprocessing
+import os
+import sys
+
+from case_plaso import progress, sharding
+
+
+def parse_formats(expression, output_file):
+    """Parses a comma separated list of serialization formats and their destinations.
+
+    Each format may be given its own destination as FORMAT=PATH (e.g.
+    'json-ld,turtle=case.ttl,xml'). The first format without a destination is
+    written to the output file, the others next to it, with the extension of
+    their format.
+
+    Args:
+        expression: Comma separated list of formats.
+        output_file: Path of the output file.
+
+    Returns:
+        List of (format, destination) tuples.
+
+    Raises:
+        ValueError: If no format is given or two formats have the same destination.
+    """
+    items = [item.strip().partition('=') for item in expression.split(',')]
+    # The output file is left alone if a format names it as its destination.
+    output_file_free = os.path.abspath(output_file) not in [
+        os.path.abspath(destination) for _, _, destination in items if destination]
+    destinations = []
+    for format, _, destination in items:
+        if not format:
+            raise ValueError('Missing format in: {}'.format(expression))
+        if not destination:
+            if output_file_free:
+                destination = output_file
+                output_file_free = False
+            else:
+                destination = os.path.splitext(output_file)[0] + sharding.FORMAT_EXTENSIONS.get(
+                    format, '.' + format)
+        for other_format, other_destination in destinations:
+            if os.path.abspath(destination) == os.path.abspath(other_destination):
+                raise ValueError('Formats {} and {} have the same destination {}.'.format(
+                    other_format, format, destination))
+        destinations.append((format, destination))
+    return destinations
+
+
+# Document serialized by the worker processes. (Inherited from the parent when forked.)
+_document = None
+
+
+def _serialize(task):
+    """Serializes the document into a single format. (Executed in a worker process.)"""
+    format, destination = task
+    _document.serialize(format=format, destination=destination)
+    return destination
+
+
+def serialize(document, destinations, workers=1):
+    """Serializes the given document into each of the given formats.
+
+    With multiple workers, each format is serialized by a forked worker process.
+    The workers start out sharing the parent's graph, but merely reading it
+    updates the reference counts of its objects, so each worker ends up with a
+    copy of about as much memory as the parent uses. The number of workers is
+    therefore capped by the available memory.
+
+    Args:
+        document: CASE document to serialize.
+        destinations: List of (format, destination) tuples.
+        workers: Maximum number of worker processes. (Only used where processes
+            are forked.)
+
+    Returns:
+        The number of worker processes used, 1 if serialized in this process.
+    """
+    global _document
+    if sys.platform == 'win32':
+        workers = 1
+    workers = min(workers, len(destinations))
+    if workers > 1:
+        available = progress.available_memory()
+        if available is not None:
+            workers = min(workers, available // max(1, progress.resident_memory()))
+    if workers <= 1:
+        for format, destination in destinations:
+            document.serialize(format=format, destination=destination)
+        return 1
+
+    # NOTE: The document has to be set before the pool forks its processes.
+    _document = document
+    try:
+        pool = multiprocessing.Pool(workers)
+        try:
+            pool.map(_serialize, destinations, chunksize=1)
+            pool.close()
+            pool.join()
+        finally:
+            pool.terminate()
+    finally:
+        _document = None
+    return workers
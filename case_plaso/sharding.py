@@ -0,0 +1,208 @@
+"""Writing a graph out as multiple compressed shards, serialized in parallel."""
+
+import bz2
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import rdflib
+
+from case_plaso import parallel, progress
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+
+# Functions opening a file for writing a compressed stream.
+COMPRESSIONS = {
+    'none': lambda path: open(path, 'wb'),
+    'gzip': lambda path: gzip.open(path, 'wb'),
+    'bz2': lambda path: bz2.BZ2File(path, 'wb'),
+}
+if lzma:
+    COMPRESSIONS['xz'] = lambda path: lzma.LZMAFile(path, 'wb')
+
+COMPRESSION_EXTENSIONS = {'none': '', 'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz'}
+
+FORMAT_EXTENSIONS = {
+    'json-ld': '.jsonld',
+    'turtle': '.ttl',
+    'nt': '.nt',
+    'nquads': '.nq',
+    'xml': '.rdf',
+    'pretty-xml': '.rdf',
+}
+
+SHARD_BY = ('subject', 'triples')
+
+MANIFEST_NAME = 'manifest.json'
+
+# Authority of the skolem IRIs replacing blank nodes when sharding by triples.
+# NOTE: Passed explicitly, because rdflib 4.2's default authority is misspelled.
+SKOLEM_AUTHORITY = 'https://rdflib.github.io'
+
+
+def _subject_groups(graph):
+    """Yields the triples of the graph grouped by subject.
+
+    Blank nodes (e.g. property bundles) are kept in the group of the first subject
+    referring to them, so each shard can be loaded on its own.
+    """
+    emitted = set()
+    subjects = set(graph.subjects())
+    roots = [subject for subject in subjects if not isinstance(subject, rdflib.BNode)]
+    # Blank nodes nothing refers to are only reached on their own.
+    roots.extend(subject for subject in subjects if isinstance(subject, rdflib.BNode))
+    for root in roots:
+        if root in emitted:
+            continue
+        emitted.add(root)
+        group = []
+        pending = [root]
+        while pending:
+            subject = pending.pop()
+            for triple in graph.triples((subject, None, None)):
+                group.append(triple)
+                object_ = triple[2]
+                if isinstance(object_, rdflib.BNode) and object_ not in emitted:
+                    emitted.add(object_)
+                    pending.append(object_)
+        yield group
+
+
+def _skolemize(term):
+    """Replaces a blank node with its skolem IRI. (Other terms are left alone.)"""
+    if isinstance(term, rdflib.BNode):
+        return term.skolemize(authority=SKOLEM_AUTHORITY)
+    return term
+
+
+def _triple_groups(graph):
+    """Yields each triple of the graph as a group of its own.
+
+    The triples of a blank node (e.g. a property bundle) may end up in different
+    shards, where they would be read as different blank nodes. So blank nodes are
+    replaced by skolem IRIs (.../.well-known/genid/rdflib/ID), which stay the
+    same node across shards.
+    """
+    for subject, predicate, object_ in graph.triples((None, None, None)):
+        yield [(_skolemize(subject), predicate, _skolemize(object_))]
+
+
+def _write_shard(task):
+    """Serializes and compresses a single shard. (Executed in a worker process.)
+
+    Returns:
+        Dictionary describing the shard for the manifest.
+    """
+    spool_path, path, format, compression, namespaces = task
+    graph = rdflib.Graph()
+    for prefix, namespace in namespaces:
+        graph.bind(prefix, namespace)
+    graph.addN((subject, predicate, object_, graph)
+               for subject, predicate, object_ in parallel.TripleSpool.read(spool_path))
+    os.remove(spool_path)
+
+    file_object = COMPRESSIONS[compression](path)
+    try:
+        graph.serialize(destination=file_object, format=format)
+    finally:
+        file_object.close()
+
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file_object:
+        for chunk in iter(lambda: file_object.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return {
+        'path': os.path.basename(path),
+        'triples': len(graph),
+        'bytes': os.path.getsize(path),
+        'sha256': sha256.hexdigest(),
+    }
+
+
+def write_shards(graph, directory, format, shards, shard_by='subject', compression='gzip',
+                 workers=1):
+    """Writes the given graph out as multiple compressed files and a manifest.
+
+    The triples are split into shards of about equal size, which are serialized
+    and compressed by a pool of worker processes. A manifest.json listing the
+    shards with their triple counts and SHA-256 checksums is written last.
+
+    Args:
+        graph: rdflib Graph (or graph wrapper) to write out.
+        directory: Directory to write the shards and manifest to. (Created if missing.)
+        format: The serialization format of each shard.
+        shards: Number of shards to split the graph into.
+        shard_by: 'subject' to keep all triples of a subject (and the blank nodes
+            it refers to) in the same shard or 'triples' to split by triple
+            count alone, replacing blank nodes with skolem IRIs.
+        compression: Name of the compression to apply to each shard. (See COMPRESSIONS)
+        workers: Number of worker processes serializing the shards.
+
+    Returns:
+        Dictionary containing the manifest.
+
+    Raises:
+        ValueError: If the compression or shard_by is not supported.
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError('Unsupported compression: {}'.format(compression))
+    if shard_by not in SHARD_BY:
+        raise ValueError('Unsupported shard_by: {}'.format(shard_by))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    namespaces = list(graph.namespaces())
+    shard_size = max(1, -(-progress.count_triples(graph) // shards))
+    groups = _subject_groups(graph) if shard_by == 'subject' else _triple_groups(graph)
+    extension = FORMAT_EXTENSIONS.get(format, '.' + format) + COMPRESSION_EXTENSIONS[compression]
+
+    # Split the triples into spool files, which the workers pick up as soon as they are complete.
+    temp_directory = tempfile.mkdtemp(prefix='.shards-', dir=directory)
+    pool = multiprocessing.Pool(workers)
+    try:
+        results = []
+        spool = None
+        for group in groups:
+            if spool is None or spool.triple_count >= shard_size:
+                if spool:
+                    spool.close()
+                    results.append(pool.apply_async(_write_shard, (task,)))
+                index = len(results)
+                spool_path = os.path.join(temp_directory, str(index))
+                spool = parallel.TripleSpool(spool_path)
+                task = (
+                    spool_path, os.path.join(directory, 'shard-{:05d}{}'.format(index, extension)),
+                    format, compression, namespaces)
+            for triple in group:
+                spool.add(triple)
+        if spool:
+            spool.close()
+            results.append(pool.apply_async(_write_shard, (task,)))
+        pool.close()
+        entries = [result.get() for result in results]
+        pool.join()
+    finally:
+        pool.terminate()
+        shutil.rmtree(temp_directory)
+
+    manifest = {
+        'format': format,
+        'compression': compression,
+        'shard_by': shard_by,
+        'triples': sum(entry['triples'] for entry in entries),
+        'shards': entries,
+    }
+    with open(os.path.join(directory, MANIFEST_NAME), 'w') as file_object:
+        json.dump(manifest, file_object, indent=2, sort_keys=True)
+    return manifest
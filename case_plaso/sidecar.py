@@ -0,0 +1,226 @@
+"""Sidecar index of the timestamps and hashes in an exported graph.
+
+Answering "which traces fall within this time window" or "which files have this
+hash" from the exported graph means loading all of it into a triple store. The
+sidecar index is a small sqlite3 database, written while exporting, which
+answers both directly.
+
+The trace_timestamps and file_hashes views can also be queried with the sqlite3
+command line tool, e.g.:
+    SELECT DISTINCT trace FROM trace_timestamps
+    WHERE timestamp BETWEEN strftime('%s', '2017-01-01') * 1000000
+                        AND strftime('%s', '2017-01-02') * 1000000;
+"""
+
+import calendar
+import os
+import sqlite3
+
+import rdflib
+from case import CASE
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS timestamps (timestamp INTEGER, property TEXT, node TEXT);
+CREATE TABLE IF NOT EXISTS property_bundles (trace TEXT, property_bundle TEXT);
+CREATE TABLE IF NOT EXISTS hash_links (property_bundle TEXT, hash TEXT);
+CREATE TABLE IF NOT EXISTS hash_methods (hash TEXT, method TEXT);
+CREATE TABLE IF NOT EXISTS hash_values (hash TEXT, value TEXT);
+
+-- Timestamps placed on property bundles belong to the trace holding the bundle.
+CREATE VIEW IF NOT EXISTS trace_timestamps AS
+    SELECT timestamps.timestamp, timestamps.property,
+           COALESCE(property_bundles.trace, timestamps.node) AS trace
+    FROM timestamps
+    LEFT JOIN property_bundles ON property_bundles.property_bundle = timestamps.node;
+
+CREATE VIEW IF NOT EXISTS file_hashes AS
+    SELECT hash_methods.method, hash_values.value, property_bundles.trace
+    FROM hash_values
+    JOIN hash_methods ON hash_methods.hash = hash_values.hash
+    JOIN hash_links ON hash_links.hash = hash_values.hash
+    JOIN property_bundles ON property_bundles.property_bundle = hash_links.property_bundle;
+"""
+
+# Created once the export has finished, since maintaining them while inserting is slower.
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS timestamps_timestamp ON timestamps (timestamp);
+CREATE INDEX IF NOT EXISTS property_bundles_property_bundle ON property_bundles (property_bundle);
+CREATE INDEX IF NOT EXISTS hash_links_hash ON hash_links (hash);
+CREATE INDEX IF NOT EXISTS hash_methods_hash ON hash_methods (hash);
+CREATE INDEX IF NOT EXISTS hash_values_value ON hash_values (value COLLATE NOCASE);
+"""
+
+# Tables of the rows produced by each predicate, which are (subject, object) pairs.
+_LINK_TABLES = {
+    CASE.propertyBundle: 'property_bundles',
+    CASE.hash: 'hash_links',
+    CASE.hashMethod: 'hash_methods',
+    CASE.hashValue: 'hash_values',
+}
+
+_DATE_TIME = rdflib.XSD.dateTime
+
+_INSERTS = dict(
+    [(table, 'INSERT INTO {} VALUES (?, ?)'.format(table)) for table in _LINK_TABLES.values()] +
+    [('timestamps', 'INSERT INTO timestamps VALUES (?, ?, ?)')])
+
+
+def _node(term):
+    """Converts an rdflib term into the text stored in the index."""
+    if isinstance(term, rdflib.BNode):
+        # Keeps blank nodes apart from IRIs. (They are only used to join on.)
+        return u'_:' + term
+    return unicode(term)
+
+
+def _to_timestamp(datetime_object):
+    """Converts a timezone aware datetime into a plaso timestamp."""
+    return (calendar.timegm(datetime_object.utctimetuple()) * 1000000 +
+            datetime_object.microsecond)
+
+
+class SidecarIndex(object):
+    """sqlite3 database indexing the timestamps and hashes of the exported traces.
+
+    Rows are written in batches and committed by commit(), so an interrupted
+    export leaves the index as it was at its last commit.
+    """
+
+    BATCH_SIZE = 10000
+
+    def __init__(self, path, resume=False):
+        """Initializes SidecarIndex.
+
+        Args:
+            path: Path of the sqlite3 database to write. (Replaced, unless resuming.)
+            resume: Whether to keep the rows of an interrupted export.
+        """
+        if not resume and os.path.exists(path):
+            os.remove(path)
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(_SCHEMA)
+        self._rows = dict((table, []) for table in _INSERTS)
+        self._row_count = 0
+
+    def add(self, table, row):
+        """Adds a row to the given table."""
+        self._rows[table].append(row)
+        self._row_count += 1
+        if self._row_count >= self.BATCH_SIZE:
+            self._write_rows()
+
+    def _write_rows(self):
+        for table, rows in self._rows.items():
+            if rows:
+                self._connection.executemany(_INSERTS[table], rows)
+                self._rows[table] = []
+        self._row_count = 0
+
+    def commit(self):
+        """Writes and commits the pending rows."""
+        self._write_rows()
+        self._connection.commit()
+
+    def close(self):
+        """Commits the pending rows and indexes the tables for querying."""
+        self.commit()
+        self._connection.executescript(_INDEXES)
+        self._connection.commit()
+        self._connection.close()
+
+    def find_timestamps(self, start, end):
+        """Finds the traces with a timestamp within the given range.
+
+        Args:
+            start: First plaso timestamp (microseconds since epoch) of the range.
+            end: Last plaso timestamp of the range.
+
+        Returns:
+            List of (timestamp, property IRI, trace IRI) tuples, ordered by timestamp.
+        """
+        return self._connection.execute(
+            'SELECT DISTINCT timestamp, property, trace FROM trace_timestamps '
+            'WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp, property, trace',
+            (start, end)).fetchall()
+
+    def find_hashes(self, value):
+        """Finds the file traces with content having the given hash value.
+
+        Args:
+            value: Hexadecimal hash value, e.g. a SHA-256 or MD5 digest.
+
+        Returns:
+            List of (hash method, trace IRI) tuples.
+        """
+        return self._connection.execute(
+            'SELECT DISTINCT method, trace FROM file_hashes '
+            'WHERE value = ? COLLATE NOCASE ORDER BY method, trace', (value,)).fetchall()
+
+
+class IndexingGraph(object):
+    """Wraps an rdflib Graph (or graph-like sink), adding the triples relevant to
+    a SidecarIndex to it as they pass through.
+
+    The timestamps written by the exporters are indexed with the node they are
+    placed on, along with the links needed to resolve that node to its trace and
+    hash values to the traces of files. The CASE API also stamps each object
+    with the (timezone naive) time it was created, which is left out, since it
+    is the time of the export rather than of an event.
+
+    Anything else done with the graph is passed on to the wrapped graph. flush()
+    also commits the index, so a checkpoint covers the rows written so far.
+    """
+
+    def __init__(self, graph, index):
+        """Initializes IndexingGraph.
+
+        Args:
+            graph: rdflib Graph (or graph-like sink) to pass the triples on to.
+            index: SidecarIndex to add the rows to.
+        """
+        self.graph = graph
+        self.index = index
+
+    def __getattr__(self, name):
+        return getattr(self.graph, name)
+
+    @property
+    def triple_count(self):
+        """Number of triples added to the wrapped graph."""
+        triple_count = getattr(self.graph, 'triple_count', None)
+        if triple_count is not None:
+            return triple_count
+        return len(self.graph)
+
+    def _index(self, subject, predicate, object_):
+        table = _LINK_TABLES.get(predicate)
+        if table:
+            self.index.add(table, (_node(subject), _node(object_)))
+        elif isinstance(object_, rdflib.Literal) and object_.datatype == _DATE_TIME:
+            value = object_.value
+            if getattr(value, 'tzinfo', None):
+                self.index.add('timestamps', (_to_timestamp(value), _node(predicate), _node(subject)))
+
+    def add(self, triple):
+        self.graph.add(triple)
+        self._index(*triple)
+
+    def addN(self, quads):
+        graph = self.graph
+        index = self._index
+
+        def _quads():
+            for subject, predicate, object_, _ in quads:
+                index(subject, predicate, object_)
+                yield subject, predicate, object_, graph
+
+        graph.addN(_quads())
+
+    def flush(self):
+        """Flushes the wrapped graph (if it buffers) and commits the index."""
+        flush = getattr(self.graph, 'flush', None)
+        if flush:
+            flush()
+        self.index.commit()
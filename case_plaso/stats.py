@@ -0,0 +1,172 @@
+"""Counters and timers describing where the time of an export is spent."""
+
+import collections
+import contextlib
+import time
+
+
+class NullStatistics(object):
+    """Default statistics, which records nothing and adds no overhead to the export."""
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Context manager timing a phase of the export. (e.g. 'sessions')"""
+        yield
+
+    def timed(self, name, function):
+        """Wraps the given function so its calls are counted and timed under the given name."""
+        return function
+
+    def instrument_exporter(self, data_type, event_exporter):
+        """Instruments the event exporter created for the given data type."""
+
+    def record_skipped(self, skipped):
+        """Records the number of events skipped per data type by a DataTypeFilter."""
+
+    def record_caches(self, event_exporters):
+        """Records the hits and misses of the deduplication caches of the given event exporters."""
+
+    def record_stage(self, name, **metrics):
+        """Adds to the metrics (e.g. items, busy_seconds) of a pipeline stage."""
+
+    def merge(self, other):
+        """Adds the statistics recorded by another process."""
+
+
+class Statistics(NullStatistics):
+    """Records counters and timers of an export.
+
+    Event exporters are instrumented by wrapping their methods when they are
+    created, so the export itself doesn't need to check whether statistics are
+    being recorded.
+    """
+
+    def __init__(self):
+        # Seconds spent in each phase of the export.
+        self.phases = collections.OrderedDict()
+        # Number of exported events and seconds spent exporting them per data type.
+        self.exported = collections.Counter()
+        self.export_seconds = collections.Counter()
+        # Name of the event exporter class handling each data type.
+        self.exporters = {}
+        # Number of calls and seconds spent in timed functions.
+        self.calls = collections.Counter()
+        self.seconds = collections.Counter()
+        # Number of events skipped by the DataTypeFilter per data type.
+        self.skipped = collections.Counter()
+        # Number of hits and misses per cache name.
+        self.cache_hits = collections.Counter()
+        self.cache_misses = collections.Counter()
+        # Metrics of each pipeline stage. (See pipeline.py)
+        self.stages = collections.defaultdict(collections.Counter)
+        self.triples = 0
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.time() - start_time
+
+    def timed(self, name, function):
+        # Recursive calls are counted, but their time is already part of the outermost call.
+        depth = [0]
+
+        def _timed(*args, **kwargs):
+            self.calls[name] += 1
+            if depth[0]:
+                return function(*args, **kwargs)
+            depth[0] += 1
+            start_time = time.time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.seconds[name] += time.time() - start_time
+                depth[0] -= 1
+
+        return _timed
+
+    def instrument_exporter(self, data_type, event_exporter):
+        class_name = type(event_exporter).__name__
+        self.exporters[data_type] = class_name
+        for method_name in event_exporter._TIMED_METHODS:
+            setattr(event_exporter, method_name, self.timed(
+                '{}.{}'.format(class_name, method_name), getattr(event_exporter, method_name)))
+
+        export_event = event_exporter.export_event
+
+        def _export_event(event):
+            start_time = time.time()
+            try:
+                return export_event(event)
+            finally:
+                self.export_seconds[data_type] += time.time() - start_time
+                self.exported[data_type] += 1
+
+        event_exporter.export_event = _export_event
+
+    def record_skipped(self, skipped):
+        self.skipped.update(skipped)
+
+    def record_caches(self, event_exporters):
+        for event_exporter in event_exporters:
+            for attribute in event_exporter._STATE_ATTRIBUTES:
+                cache = getattr(event_exporter, attribute)
+                if hasattr(cache, 'hits'):
+                    name = '{}.{}'.format(type(event_exporter).__name__, attribute)
+                    self.cache_hits[name] += cache.hits
+                    self.cache_misses[name] += cache.misses
+
+    def record_stage(self, name, **metrics):
+        self.stages[name].update(metrics)
+
+    def merge(self, other):
+        for name, seconds in other.phases.items():
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+        for attribute in ('exported', 'export_seconds', 'calls', 'seconds', 'skipped',
+                          'cache_hits', 'cache_misses'):
+            getattr(self, attribute).update(getattr(other, attribute))
+        self.exporters.update(other.exporters)
+        for name, metrics in other.stages.items():
+            self.stages[name].update(metrics)
+        self.triples += other.triples
+
+    def to_dict(self):
+        """Converts the statistics into a dictionary which can be written out as JSON."""
+        data_types = {}
+        for data_type in set(self.exported) | set(self.skipped):
+            data_types[data_type] = {
+                'exporter': self.exporters.get(data_type),
+                'seen': self.exported[data_type] + self.skipped[data_type],
+                'exported': self.exported[data_type],
+                'skipped': self.skipped[data_type],
+                'seconds': self.export_seconds[data_type],
+            }
+
+        exporters = {}
+        for data_type, class_name in self.exporters.items():
+            exporter = exporters.setdefault(class_name, {'events': 0, 'seconds': 0.0})
+            exporter['events'] += self.exported[data_type]
+            exporter['seconds'] += self.export_seconds[data_type]
+
+        caches = {}
+        for name in set(self.cache_hits) | set(self.cache_misses):
+            lookups = self.cache_hits[name] + self.cache_misses[name]
+            caches[name] = {
+                'hits': self.cache_hits[name],
+                'misses': self.cache_misses[name],
+                'hit_rate': float(self.cache_hits[name]) / lookups if lookups else None,
+            }
+
+        return {
+            'phases': dict(self.phases),
+            'data_types': data_types,
+            'exporters': exporters,
+            'functions': dict(
+                (name, {'calls': self.calls[name], 'seconds': self.seconds[name]})
+                for name in self.calls),
+            'caches': caches,
+            'stages': dict((name, dict(metrics)) for name, metrics in self.stages.items()),
+            'triples': self.triples,
+        }
@@ -0,0 +1,214 @@
+"""Persistent rdflib stores for exporting graphs which don't fit in memory."""
+
+import collections
+
+import rdflib
+
+try:
+    import rdflib_sqlalchemy
+    import rdflib_sqlalchemy.store
+except ImportError:
+    rdflib_sqlalchemy = None
+else:
+    # Makes the 'SQLAlchemy' store available to rdflib.
+    rdflib_sqlalchemy.registerplugins()
+
+try:
+    import sqlalchemy
+except ImportError:
+    sqlalchemy = None
+
+
+# Prefix turning an INSERT into one ignoring rows already stored, per SQLAlchemy dialect.
+_INSERT_OR_IGNORE_PREFIXES = {
+    'sqlite': 'OR IGNORE',
+    'mysql': 'IGNORE',
+}
+
+# Version prefix of the rdflib-sqlalchemy releases whose (private) statement
+# building the batches are inserted with. (See requirements.txt.)
+_SQLALCHEMY_STORE_VERSION = '0.3.'
+
+# Number of subjects to look up stored literal triples of per query.
+_LOOKUP_SIZE = 500
+
+
+def open_store(specification, graph_name, batch_size=10000):
+    """Opens (or creates) a graph in a persistent rdflib store.
+
+    Args:
+        specification: String in the form 'STORE:CONFIGURATION', naming the rdflib
+            store plugin and the configuration to open it with.
+            (e.g. 'Sleepycat:/data/export.db' or 'SQLAlchemy:sqlite:////data/export.sqlite')
+        graph_name: rdflib URIRef identifying the graph within the store.
+        batch_size: Number of triples to add to the store per transaction.
+
+    Returns:
+        BatchedGraph wrapping the opened graph.
+
+    Raises:
+        ValueError: If the specification is malformed or the store can't be opened.
+    """
+    store, separator, configuration = specification.partition(':')
+    if not separator or not store or not configuration:
+        raise ValueError('Store must be given as STORE:CONFIGURATION, got: {}'.format(specification))
+    graph = rdflib.Graph(store=store, identifier=graph_name)
+    if graph.open(configuration, create=True) == rdflib.store.NO_STORE:
+        raise ValueError('Unable to open {} store: {}'.format(store, configuration))
+    return BatchedGraph(graph, batch_size=batch_size)
+
+
+class BatchedGraph(object):
+    """Wraps an rdflib Graph, adding triples to its store in batches.
+
+    Each batch is added in bulk and committed, so stores with transactions don't
+    pay for one transaction per triple. Everything else is
+    passed on to the wrapped graph, after adding the pending batch.
+
+    The exporters freely re-add triples. Duplicates within a batch and the last
+    few batches are dropped. The SQLAlchemy store rejects triples which are
+    already stored (except literal ones, which are looked up first), so on
+    SQLite and MySQL its batches are inserted with INSERT OR IGNORE, using the
+    statements built by rdflib-sqlalchemy 0.3. Otherwise, as with other stores,
+    the triples already stored are left out of the batch and the rest are added
+    with the store's addN(), in a single transaction.
+
+    triple_count counts the triples actually added to the store.
+    """
+
+    # Number of previous batches to drop duplicate triples of.
+    RECENT_BATCHES = 4
+
+    def __init__(self, graph, batch_size=10000):
+        """Initializes BatchedGraph.
+
+        Args:
+            graph: rdflib Graph to add the triples to.
+            batch_size: Number of triples to add to the store at a time.
+        """
+        self.graph = graph
+        self.batch_size = batch_size
+        self.triple_count = 0
+        self._batch = set()
+        self._recent_batches = collections.deque(maxlen=self.RECENT_BATCHES)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getattr__(self, name):
+        # Anything reading the graph (e.g. serialize()) must see all the triples.
+        self.flush()
+        return getattr(self.graph, name)
+
+    def add(self, triple):
+        """Adds the given (subject, predicate, object) triple to the pending batch."""
+        self._batch.add(tuple(triple))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def addN(self, quads):
+        """Adds the given quads to the pending batch, placing them in the wrapped graph."""
+        for subject, predicate, object_, _ in quads:
+            self.add((subject, predicate, object_))
+
+    def flush(self):
+        """Adds the pending batch to the store and commits it."""
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, set()
+        triples = [
+            triple for triple in batch
+            if not any(triple in recent_batch for recent_batch in self._recent_batches)]
+        if triples:
+            self.triple_count += self._add_triples(triples)
+        self.graph.commit()
+        self._recent_batches.append(batch)
+
+    def _add_triples(self, triples):
+        """Adds the given triples to the store.
+
+        Returns:
+            The number of triples which were not stored yet.
+        """
+        if self._inserts_or_ignores():
+            return self._insert_statements(triples)
+        added = [triple for triple in triples if triple not in self.graph]
+        self.graph.addN(triple + (self.graph,) for triple in added)
+        return len(added)
+
+    def _inserts_or_ignores(self):
+        """Whether batches can be inserted with INSERT OR IGNORE statements."""
+        store = self.graph.store
+        # NOTE: The SQLAlchemy store is fed the statements its own addN() executes,
+        # which are built by a private method, so this is limited to the known releases.
+        return (
+            rdflib_sqlalchemy is not None and
+            isinstance(store, rdflib_sqlalchemy.store.SQLAlchemy) and
+            getattr(rdflib_sqlalchemy, '__version__', '').startswith(_SQLALCHEMY_STORE_VERSION) and
+            hasattr(store, '_get_build_command') and
+            store.engine.dialect.name in _INSERT_OR_IGNORE_PREFIXES)
+
+    def _insert_statements(self, triples):
+        """Inserts the given triples into the SQLAlchemy store in a single transaction,
+        ignoring the triples which are already stored.
+
+        Returns:
+            The number of inserted triples.
+        """
+        store = self.graph.store
+        prefix = _INSERT_OR_IGNORE_PREFIXES[store.engine.dialect.name]
+        commands = {}
+        for triple in triples:
+            command_type, statement, params = store._get_build_command(triple, self.graph)
+            statement = statement.prefix_with(prefix)
+            commands.setdefault(command_type, (statement, []))[1].append(params)
+
+        added = 0
+        with store.engine.begin() as connection:
+            literal_table = store.tables['literal_statements']
+            for command_type, (statement, params) in commands.items():
+                if statement.table is literal_table:
+                    # The unique key of the literal table includes the literal's
+                    # language, which is usually NULL, and NULLs never conflict. So
+                    # stored literal triples are not rejected and are looked up instead.
+                    stored = _stored_literals(connection, literal_table, params)
+                    params = [
+                        item for item in params
+                        if _literal_key(item['subject'], item['predicate'], item['object'],
+                                        item['objLanguage']) not in stored]
+                    if not params:
+                        continue
+                added += connection.execute(statement, params).rowcount
+        return added
+
+    def close(self):
+        """Commits the pending batch and closes the store."""
+        self.flush()
+        self.graph.close()
+
+
+def _literal_key(subject, predicate, object_, language):
+    return unicode(subject), unicode(predicate), unicode(object_), language
+
+
+def _stored_literals(connection, table, params):
+    """Looks up which of the literal triples of the given insert parameters are stored.
+
+    Returns:
+        Set of the keys (see _literal_key()) of the stored triples.
+    """
+    columns = table.c
+    stored = set()
+    subjects = sorted(set(unicode(item['subject']) for item in params))
+    # Stay well below the limit on the number of SQL variables (999 in SQLite).
+    for index in range(0, len(subjects), _LOOKUP_SIZE):
+        query = sqlalchemy.select([
+            columns.subject, columns.predicate, columns.object, columns.objLanguage]).where(
+                sqlalchemy.and_(
+                    columns.context == params[0]['context'],
+                    columns.subject.in_(subjects[index:index + _LOOKUP_SIZE])))
+        stored.update(_literal_key(*row) for row in connection.execute(query))
+    return stored
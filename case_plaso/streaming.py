@@ -0,0 +1,392 @@
+"""Graph sinks that write triples out as they are added instead of holding them in memory."""
+
+import collections
+import io
+import json
+import os
+import urllib
+
+import case
+import rdflib
+from rdflib.plugins.serializers import nt
+
+from case_plaso import PLASO
+
+
+def _open_destination(destination, offset):
+    """Opens the destination file for writing, or for appending at the given offset."""
+    if offset is None:
+        return io.open(destination, 'wb')
+    file_object = io.open(destination, 'r+b')
+    file_object.truncate(offset)
+    file_object.seek(offset)
+    return file_object
+
+
+def _ntriples_term(term):
+    """Serializes the given rdflib term for N-Triples.
+
+    Literal.n3() produces Turtle, which writes literals containing line breaks
+    as triple quoted strings spanning several lines, so literals are escaped
+    the way rdflib's N-Triples serializer does instead.
+    """
+    if isinstance(term, rdflib.Literal):
+        return nt._quoteLiteral(term)
+    return term.n3()
+
+
+def ntriples_line(subject, predicate, object_):
+    """Serializes the given triple as a single N-Triples line (e.g. for a TripleFilter)."""
+    return u'{} {} {} .\n'.format(
+        subject.n3(), predicate.n3(), _ntriples_term(object_)).encode('utf-8')
+
+
+def storage_file_graph_name(storage_file):
+    """Generates the graph name used for the triples exported from the given storage file."""
+    return rdflib.URIRef('file://' + urllib.pathname2url(os.path.abspath(storage_file)))
+
+
+class StreamingGraph(object):
+    """Stand-in for an rdflib.Graph which writes every added triple straight to a file.
+
+    Only the line based N-Triples and N-Quads formats are supported, which allows
+    each triple to be written the moment an exporter creates it. Nothing is kept
+    in memory, so duplicate triples are written out as-is, unless a TripleFilter
+    is given to suppress them.
+    """
+
+    FORMATS = ('nt', 'nquads')
+
+    def __init__(self, destination, format='nt', graph_name=None, offset=None,
+                 triple_filter=None):
+        """Initializes StreamingGraph.
+
+        Args:
+            destination: File path to write the triples to.
+            format: The serialization format, either 'nt' or 'nquads'.
+            graph_name: rdflib URIRef naming the graph each quad is placed in.
+                (Only used by the 'nquads' format.)
+            offset: If provided, the existing destination is truncated to this
+                many bytes and appended to, instead of being overwritten.
+            triple_filter: Optional deduplication.TripleFilter dropping triples
+                which were already written. (Closed along with the graph.)
+        """
+        if format not in self.FORMATS:
+            raise ValueError('Unsupported streaming format: {}'.format(format))
+        if format == 'nquads' and graph_name is None:
+            raise ValueError('A graph name is required for the nquads format.')
+        self.format = format
+        self.graph_name = graph_name
+        # The CASE API and PlasoExporter bind prefixes on the graph. They are not
+        # used by the line based formats, but we need somewhere to put them.
+        self.namespace_manager = rdflib.namespace.NamespaceManager(rdflib.Graph())
+        self.triple_count = 0
+        self.triple_filter = triple_filter
+        self._file = _open_destination(destination, offset)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _format(self, subject, predicate, object_):
+        if self.format == 'nquads':
+            return u'{} {} {} {} .\n'.format(
+                subject.n3(), predicate.n3(), _ntriples_term(object_),
+                self.graph_name.n3()).encode('utf-8')
+        return ntriples_line(subject, predicate, object_)
+
+    def add(self, triple):
+        """Writes the given (subject, predicate, object) triple."""
+        subject, predicate, object_ = triple
+        line = self._format(subject, predicate, object_)
+        if self.triple_filter and not self.triple_filter.add(line):
+            return
+        self._file.write(line)
+        self.triple_count += 1
+
+    def addN(self, quads):
+        """Writes the given (subject, predicate, object, context) quads in one go.
+
+        The context is ignored in favor of the configured graph name.
+        """
+        lines = [self._format(subject, predicate, object_)
+                 for subject, predicate, object_, _ in quads]
+        if self.triple_filter:
+            lines = [line for line in lines if self.triple_filter.add(line)]
+        self._file.write(b''.join(lines))
+        self.triple_count += len(lines)
+
+    def add_ntriples_file(self, path):
+        """Writes the triples from an N-Triples file produced by another StreamingGraph."""
+        graph_name = self.graph_name.n3().encode('utf-8') if self.format == 'nquads' else None
+        with io.open(path, 'rb') as file_object:
+            for line in file_object:
+                if graph_name:
+                    # Every line is a whole triple ending with ' .\n', so we can slip
+                    # the graph name in front.
+                    line = line[:-3] + b' ' + graph_name + b' .\n'
+                if self.triple_filter and not self.triple_filter.add(line):
+                    continue
+                self._file.write(line)
+                self.triple_count += 1
+
+    def flush(self):
+        """Flushes the triples written so far to disk."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        if self.triple_filter:
+            self.triple_filter.commit()
+
+    def tell(self):
+        """Returns the number of bytes written to the destination."""
+        return self._file.tell()
+
+    def close(self):
+        """Flushes and closes the destination file."""
+        if not self._file.closed:
+            self._file.close()
+            if self.triple_filter:
+                self.triple_filter.close()
+
+
+class JsonLdStreamingGraph(object):
+    """Stand-in for an rdflib.Graph which writes the added triples out as JSON-LD in batches.
+
+    rdflib's JSON-LD serializer builds the nested structure of the whole graph
+    before writing anything. Instead, the triples of each batch are grouped by
+    subject and written as node objects of a single top level "@graph", using a
+    fixed context. A node whose triples span batches is written as multiple node
+    objects with the same "@id", which JSON-LD processors merge back together.
+    """
+
+    FORMATS = ('json-ld',)
+
+    PREFIXES = collections.OrderedDict([
+        ('case', unicode(case.CASE)),
+        ('plaso', unicode(PLASO)),
+        ('rdf', unicode(rdflib.RDF)),
+        ('rdfs', unicode(rdflib.RDFS)),
+        ('xsd', unicode(rdflib.XSD)),
+    ])
+
+    # Terms of the CASE namespace are written without a prefix.
+    CONTEXT = dict(PREFIXES, **{'@vocab': unicode(case.CASE)})
+
+    def __init__(self, destination, format='json-ld', graph_name=None, offset=None,
+                 batch_size=10000, triple_filter=None):
+        """Initializes JsonLdStreamingGraph.
+
+        Args:
+            destination: File path to write the JSON-LD document to.
+            format: The serialization format. (Only 'json-ld' is supported.)
+            graph_name: Unused. (The document has a single default graph.)
+            offset: If provided, the existing destination is truncated to this
+                many bytes and appended to, instead of being overwritten.
+            batch_size: Number of triples to collect before writing them out.
+            triple_filter: Optional deduplication.TripleFilter dropping triples
+                which were already written. (Closed along with the graph.)
+        """
+        if format not in self.FORMATS:
+            raise ValueError('Unsupported streaming format: {}'.format(format))
+        self.format = format
+        self.namespace_manager = rdflib.namespace.NamespaceManager(rdflib.Graph())
+        self.triple_count = 0
+        self.batch_size = batch_size
+        self.triple_filter = triple_filter
+        self._batch = collections.OrderedDict()
+        self._batch_triples = 0
+        header = b'{{"@context": {}, "@graph": [\n'.format(
+            json.dumps(self.CONTEXT, sort_keys=True))
+        self._file = _open_destination(destination, offset)
+        if offset is None:
+            self._file.write(header)
+        # Node objects after the first one must be preceded by a comma.
+        self._empty = self._file.tell() <= len(header)
+
+    def _compact(self, uri):
+        """Shortens the given URI with the prefixes of the context."""
+        if uri.startswith(self.CONTEXT['@vocab']):
+            return uri[len(self.CONTEXT['@vocab']):]
+        for prefix, namespace in self.PREFIXES.items():
+            if uri.startswith(namespace):
+                return u'{}:{}'.format(prefix, uri[len(namespace):])
+        return unicode(uri)
+
+    def _node_id(self, term):
+        if isinstance(term, rdflib.BNode):
+            return u'_:' + term
+        return unicode(term)
+
+    def _value(self, term):
+        if isinstance(term, rdflib.Literal):
+            if term.language:
+                return {'@value': unicode(term), '@language': term.language}
+            if term.datatype:
+                return {'@value': unicode(term), '@type': self._compact(term.datatype)}
+            return unicode(term)
+        return {'@id': self._node_id(term)}
+
+    def _node_object(self, subject, predicate_objects):
+        node = collections.OrderedDict([('@id', self._node_id(subject))])
+        for predicate, object_ in predicate_objects:
+            if predicate == rdflib.RDF.type:
+                key, value = '@type', self._compact(object_)
+            else:
+                key, value = self._compact(predicate), self._value(object_)
+            node.setdefault(key, []).append(value)
+        for key, values in node.items():
+            if key != '@id' and len(values) == 1:
+                node[key] = values[0]
+        return node
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, triple):
+        """Adds the given (subject, predicate, object) triple to the pending batch."""
+        subject, predicate, object_ = triple
+        if self.triple_filter and not self.triple_filter.add(
+                ntriples_line(subject, predicate, object_)):
+            return
+        self._batch.setdefault(subject, []).append((predicate, object_))
+        self._batch_triples += 1
+        self.triple_count += 1
+        if self._batch_triples >= self.batch_size:
+            self._write_batch()
+
+    def addN(self, quads):
+        """Adds the given quads to the pending batch. The context is ignored."""
+        for subject, predicate, object_, _ in quads:
+            self.add((subject, predicate, object_))
+
+    def _write_batch(self):
+        """Writes the pending batch out as node objects."""
+        if not self._batch:
+            return
+        chunks = []
+        for subject, predicate_objects in self._batch.items():
+            if not self._empty or chunks:
+                chunks.append(b',\n')
+            chunks.append(json.dumps(self._node_object(subject, predicate_objects)))
+        self._file.write(b''.join(chunks))
+        self._empty = False
+        self._batch = collections.OrderedDict()
+        self._batch_triples = 0
+
+    def flush(self):
+        """Writes out the pending batch and flushes everything written so far to disk."""
+        self._write_batch()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        if self.triple_filter:
+            self.triple_filter.commit()
+
+    def tell(self):
+        """Returns the number of bytes written to the destination."""
+        return self._file.tell()
+
+    def close(self):
+        """Writes out the pending batch, completes the document and closes the file."""
+        if not self._file.closed:
+            self._write_batch()
+            self._file.write(b'\n]}\n')
+            self._file.close()
+            if self.triple_filter:
+                self.triple_filter.close()
+
+
+# All formats which can be streamed.
+FORMATS = StreamingGraph.FORMATS + JsonLdStreamingGraph.FORMATS
+
+
+def create_streaming_graph(destination, format='nt', graph_name=None, offset=None,
+                           triple_filter=None):
+    """Creates the streaming graph writing the given format.
+
+    Args:
+        destination: File path to write the triples to.
+        format: The serialization format. (One of FORMATS)
+        graph_name: rdflib URIRef naming the graph each quad is placed in.
+            (Only used by the 'nquads' format.)
+        offset: If provided, the existing destination is truncated to this many
+            bytes and appended to, instead of being overwritten.
+        triple_filter: Optional deduplication.TripleFilter dropping triples which
+            were already written.
+
+    Returns:
+        StreamingGraph or JsonLdStreamingGraph.
+    """
+    if format in JsonLdStreamingGraph.FORMATS:
+        return JsonLdStreamingGraph(
+            destination, graph_name=graph_name, offset=offset, triple_filter=triple_filter)
+    return StreamingGraph(
+        destination, format=format, graph_name=graph_name, offset=offset,
+        triple_filter=triple_filter)
+
+
+class MultiStreamingGraph(object):
+    """Stand-in for an rdflib.Graph which adds every triple to several streaming
+    graphs, e.g. to write more than one format in a single export.
+
+    Duplicate triples are dropped once, by a single TripleFilter in front of all
+    graphs, rather than by a filter (and its memory and database) per graph.
+    """
+
+    def __init__(self, graphs, triple_filter=None):
+        """Initializes MultiStreamingGraph.
+
+        Args:
+            graphs: The streaming graphs to write the triples to. (Without a
+                triple filter of their own.)
+            triple_filter: Optional deduplication.TripleFilter dropping triples
+                which were already written. (Closed along with the graphs.)
+        """
+        self.graphs = graphs
+        self.triple_filter = triple_filter
+        # Prefixes are bound once, on behalf of all graphs.
+        self.namespace_manager = graphs[0].namespace_manager
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def triple_count(self):
+        """Number of triples written by the first graph."""
+        return self.graphs[0].triple_count
+
+    def add(self, triple):
+        if self.triple_filter and not self.triple_filter.add(ntriples_line(*triple)):
+            return
+        for graph in self.graphs:
+            graph.add(triple)
+
+    def addN(self, quads):
+        if self.triple_filter:
+            quads = [quad for quad in quads
+                     if self.triple_filter.add(ntriples_line(*quad[:3]))]
+        else:
+            quads = list(quads)
+        for graph in self.graphs:
+            graph.addN(quads)
+
+    def flush(self):
+        for graph in self.graphs:
+            graph.flush()
+        if self.triple_filter:
+            self.triple_filter.commit()
+
+    def close(self):
+        for graph in self.graphs:
+            graph.close()
+        if self.triple_filter:
+            self.triple_filter.close()
+            # The graphs may be closed again, but the filter's database is gone.
+            self.triple_filter = None
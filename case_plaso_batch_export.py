@@ -0,0 +1,138 @@
+"""
+Outputs event data contained in multiple plaso storage files, either into one
+CASE document per storage file or merged into a single CASE document.
+"""
+
+import argparse
+import collections
+import os
+
+# NOTE: case, rdflib and the case_plaso modules (which import plaso and dfvfs) are
+# imported in main() once the arguments have been parsed, so --help and argument
+# errors don't have to wait for them.
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        'Plaso-CASE batch',
+        description='Extracts plaso events from multiple plaso storage files and '
+                    'outputs CASE documents.')
+    parser.add_argument(
+        'storage_files',
+        nargs='+',
+        help='Plaso storage files. (The resulting files from running log2timeline.)')
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument(
+        '--output-directory',
+        metavar='DIRECTORY',
+        help='Export each storage file into a file of its own in this directory, named '
+             'after the storage file. The storage files are exported in parallel by '
+             'the --workers.')
+    output.add_argument(
+        '--merge',
+        metavar='FILE',
+        help='Export all storage files into a single file, in which their sessions, tool '
+             'and files are exported once. The events are exported in parallel by the '
+             '--workers.')
+    parser.add_argument(
+        '--format',
+        default='json-ld',
+        help='The serialization format: json-ld, turtle, nt, nquads, xml or any other '
+             'rdflib serializer plugin. (default: %(default)s)')
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Write triples to the output files as they are exported instead of '
+             'building the whole graphs in memory first. '
+             '(Requires --format nt, nquads or json-ld)')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Number of worker processes to export with. (default: %(default)s)')
+    parser.add_argument(
+        '--include-all-sources',
+        action='store_true',
+        help='Export every event source (file or directory) of the storage files, instead '
+             'of only the ones referred to by exported events.')
+    parser.add_argument(
+        '--data-types',
+        metavar='EXPRESSION',
+        help='Comma separated list of event data types to export. Data types prefixed '
+             'with "!" are excluded instead. (default: all data types with an exporter)')
+    options = parser.parse_args()
+
+    import case
+    import rdflib
+    from case_plaso import batch, event_filter, identifiers, plaso_exporter, streaming
+
+    formats = set(plugin.name for plugin in rdflib.plugin.plugins(kind=rdflib.serializer.Serializer)
+                  if '/' not in plugin.name)
+    if options.format not in formats | set(streaming.FORMATS):
+        parser.error('--format must be one of: {}'.format(
+            ', '.join(sorted(formats | set(streaming.FORMATS)))))
+    if options.stream and options.format not in streaming.FORMATS:
+        parser.error('--stream requires --format {}'.format(
+            ' or '.join(streaming.FORMATS)))
+    if options.output_directory:
+        try:
+            batch.output_file_names(options.storage_files, options.format)
+        except ValueError as exception:
+            parser.error(str(exception))
+
+    for storage_file in options.storage_files:
+        if not os.path.exists(storage_file):
+            raise IOError('Missing plaso storage file: {}'.format(storage_file))
+
+    if options.data_types:
+        data_type_filter = event_filter.DataTypeFilter.from_expression(options.data_types)
+    else:
+        data_type_filter = event_filter.DataTypeFilter()
+
+    if options.output_directory:
+        skipped = collections.Counter()
+        for storage_file, output_file, triple_count, storage_file_skipped in (
+                batch.export_storage_files(
+                    options.storage_files, options.output_directory, format=options.format,
+                    stream=options.stream, workers=options.workers,
+                    data_type_filter=data_type_filter,
+                    include_all_sources=options.include_all_sources)):
+            print 'Wrote {} triples from {} to {}.'.format(triple_count, storage_file, output_file)
+            skipped.update(storage_file_skipped)
+    else:
+        graph = None
+        if options.stream:
+            # There is no single storage file to name the graph after, so name it
+            # after the merged output file.
+            graph = streaming.create_streaming_graph(
+                options.merge, format=options.format,
+                graph_name=streaming.storage_file_graph_name(options.merge))
+            document = case.Document(graph)
+        else:
+            document = case.Document()
+        exporter = plaso_exporter.PlasoExporter(
+            document, identifiers=identifiers.ContentIdentifiers(),
+            data_type_filter=data_type_filter,
+            include_all_sources=options.include_all_sources)
+        print 'Exporting {} storage files...'.format(len(options.storage_files))
+        try:
+            exporter.export_storage_files(options.storage_files, workers=options.workers)
+        finally:
+            if graph:
+                graph.close()
+        if graph:
+            print 'Wrote {} triples.'.format(graph.triple_count)
+        else:
+            print 'Serializing graph...'
+            document.serialize(format=options.format, destination=options.merge)
+            print 'Wrote {} triples.'.format(len(document.graph))
+        skipped = data_type_filter.skipped
+
+    if skipped:
+        print 'Skipped {} events of unexported data types:'.format(sum(skipped.values()))
+        for data_type, count in skipped.most_common():
+            print '  {}: {}'.format(data_type, count)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,11 +4,15 @@ document following the CASE ontology.
 """
 
 import argparse
-import rdflib
+import json
 import os
 
-import case
-from case_plaso import plaso_exporter
+# NOTE: case, rdflib and the case_plaso modules (which import plaso and dfvfs) are
+# imported in main() once the arguments have been parsed, so --help and argument
+# errors don't have to wait for them.
+
+# Megabytes of cache entries kept in memory with --checkpoint, unless --cache-memory is given.
+CHECKPOINT_CACHE_MEMORY = 1024
 
 
 def main():
@@ -23,24 +27,373 @@ def main():
     parser.add_argument(
         'output_file',
         help='File path to export the resulting serialized file.')
-    # TODO: Add specific choices
     parser.add_argument(
         '--format',
-        choices=sorted([p.name for p in rdflib.plugin.plugins(kind=rdflib.serializer.Serializer)
-                 if '/' not in p.name]),
         default='json-ld',
-        help='The serialization format. (default: %(default)s)')
+        help='The serialization format: json-ld, turtle, nt, nquads, xml or any other '
+             'rdflib serializer plugin. Give a comma separated list to write several '
+             'formats from a single export, each as FORMAT or FORMAT=PATH. The first '
+             'format without a PATH is written to the output_file, the others next to it '
+             'with the extension of their format. (default: %(default)s)')
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Write triples to the output file as they are exported instead of '
+             'building the whole graph in memory first. '
+             '(Requires --format nt, nquads or json-ld)')
+    parser.add_argument(
+        '--deduplicate',
+        action='store_true',
+        help='Drop duplicate triples from the --stream output, using a Bloom filter and '
+             'an SQLite database of the written triples instead of holding them in memory.')
+    parser.add_argument(
+        '--deduplicate-memory',
+        type=int,
+        default=64,
+        metavar='MB',
+        help='Megabytes of memory used by --deduplicate: a quarter for the most recently '
+             'written triples, the rest for its Bloom filter, which needs about 10 bits '
+             'per distinct triple. (default: %(default)s)')
+    parser.add_argument(
+        '--store',
+        metavar='STORE:CONFIGURATION',
+        help='Build the graph in a persistent rdflib store instead of in memory, e.g. '
+             '"Sleepycat:/data/export.db" or "SQLAlchemy:sqlite:////data/export.sqlite". '
+             'The store can be reopened later to query or serialize the graph.')
+    parser.add_argument(
+        '--store-batch-size',
+        type=int,
+        default=10000,
+        help='Number of triples to add to the --store per transaction. (default: %(default)s)')
+    parser.add_argument(
+        '--shards',
+        type=int,
+        metavar='N',
+        help='Split the output into this many compressed files, serialized by the '
+             '--serialize-workers, and write them with a manifest.json to the output_file '
+             'directory.')
+    parser.add_argument(
+        '--shard-by',
+        choices=('subject', 'triples'),
+        default='subject',
+        help='Keep the triples of each subject (and its blank nodes) in the same shard, or '
+             'split by triple count alone, replacing blank nodes with skolem IRIs. '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '--compression',
+        choices=('bz2', 'gzip', 'none', 'xz'),
+        default='gzip',
+        help='Compression of each of the --shards. (default: %(default)s)')
+    parser.add_argument(
+        '--buffer-events',
+        type=int,
+        default=0,
+        metavar='N',
+        help='Collect the triples of this many events and add them to the graph in bulk. '
+             'Use 0 to add every triple immediately. (default: %(default)s)')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Number of worker processes to export events with. (Requires --deterministic-ids '
+             'if more than 1) (default: %(default)s)')
+    parser.add_argument(
+        '--serialize-workers',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Number of forked worker processes serializing the formats of a multi-format '
+             '--format in parallel. Each may use about as much memory as the export itself, '
+             'so fewer are used if that much memory isn\'t available. With --shards, the '
+             'number of worker processes serializing the shards, which only read the triples '
+             'of their shards. (default: %(default)s)')
+    parser.add_argument(
+        '--pipeline',
+        action='store_true',
+        help='Read the events and write the --stream output in threads of their own, so '
+             'the storage file and output I/O overlap with exporting the events.')
+    parser.add_argument(
+        '--pipeline-queue-size',
+        type=int,
+        default=4,
+        metavar='N',
+        help='Number of blocks of events and batches of triples that may be queued '
+             'between the --pipeline stages. (default: %(default)s)')
+    parser.add_argument(
+        '--deterministic-ids',
+        action='store_true',
+        help='Derive the identifiers of files, contacts, accounts and tools from their '
+             'content, so outputs of separate exports can be merged by concatenation. '
+             'These objects are written without the createdTime of the export.')
+    parser.add_argument(
+        '--checkpoint',
+        metavar='FILE',
+        help='Periodically record the progress of the export to this file. (Requires --stream)')
+    parser.add_argument(
+        '--checkpoint-interval',
+        type=int,
+        default=100000,
+        help='Number of events to export between checkpoints. (default: %(default)s)')
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continue an interrupted export from its last checkpoint, appending to '
+             'the partially written output file. (Requires --checkpoint)')
+    parser.add_argument(
+        '--cache-memory',
+        type=int,
+        metavar='MB',
+        help='Keep only this many megabytes of deduplication cache entries in memory and '
+             'move the rest into an SQLite database. (default: keep everything in memory, '
+             'or {} MB with --checkpoint, which commits the database instead of copying the '
+             'caches into each checkpoint)'.format(CHECKPOINT_CACHE_MEMORY))
+    parser.add_argument(
+        '--include-all-sources',
+        action='store_true',
+        help='Export every event source (file or directory) of the storage file, instead '
+             'of only the ones referred to by exported events.')
+    parser.add_argument(
+        '--data-types',
+        metavar='EXPRESSION',
+        help='Comma separated list of event data types to export. Data types prefixed '
+             'with "!" are excluded instead. (default: all data types with an exporter)')
+    parser.add_argument(
+        '--index',
+        metavar='FILE',
+        help='Also write an SQLite database indexing the timestamps of the traces and the '
+             'hashes of the files, for looking them up without loading the graph.')
+    parser.add_argument(
+        '--stats',
+        metavar='FILE',
+        help='Write counters and timers of the export (per data type, exporter, cache '
+             'and phase) as JSON to this file.')
+    parser.add_argument(
+        '--progress-interval',
+        type=float,
+        default=30,
+        metavar='SECONDS',
+        help='Number of seconds between progress reports on stderr. Use 0 to disable '
+             'progress reports. (default: %(default)s)')
+    parser.add_argument(
+        '--progress-file',
+        metavar='FILE',
+        help='Also write each progress report as a JSON document to this file.')
     options = parser.parse_args()
 
+    import case
+    import rdflib
+    from case_plaso import buffering, cache
+    from case_plaso import checkpoint as checkpoint_lib, deduplication
+    from case_plaso import event_filter, identifiers, pipeline, plaso_exporter, progress
+    from case_plaso import serialization, sharding, stats
+    from case_plaso import sidecar, stores, streaming
+
+    formats = set(plugin.name for plugin in rdflib.plugin.plugins(kind=rdflib.serializer.Serializer)
+                  if '/' not in plugin.name)
+    try:
+        destinations = serialization.parse_formats(options.format, options.output_file)
+    except ValueError as exception:
+        parser.error(str(exception))
+    for format, _ in destinations:
+        if format not in formats | set(streaming.FORMATS):
+            parser.error('--format must be one of: {}'.format(
+                ', '.join(sorted(formats | set(streaming.FORMATS)))))
+        if options.stream and format not in streaming.FORMATS:
+            parser.error('--stream requires --format {}'.format(
+                ' or '.join(streaming.FORMATS)))
+    if len(destinations) > 1 and options.shards:
+        parser.error('--shards requires a single --format')
+    if len(destinations) > 1 and options.checkpoint:
+        parser.error('--checkpoint requires a single --format')
+    if options.deduplicate and not options.stream:
+        parser.error('--deduplicate requires --stream')
+    if options.pipeline and options.pipeline_queue_size < 1:
+        parser.error('--pipeline-queue-size must be at least 1')
+    if options.store and options.stream:
+        parser.error('--store cannot be combined with --stream')
+    if options.shards is not None and options.shards < 1:
+        parser.error('--shards must be at least 1')
+    if options.shards and options.stream:
+        parser.error('--shards cannot be combined with --stream')
+    if options.shards and options.compression not in sharding.COMPRESSIONS:
+        parser.error('--compression {} requires the lzma module'.format(options.compression))
+    if options.checkpoint and not options.stream:
+        parser.error('--checkpoint requires --stream')
+    if options.checkpoint and options.workers > 1:
+        parser.error('--checkpoint is not supported with multiple --workers')
+    if options.workers > 1 and not options.deterministic_ids:
+        # Nodes shared by the events of different workers would get an identifier per worker.
+        parser.error('multiple --workers require --deterministic-ids')
+    if options.resume and not options.checkpoint:
+        parser.error('--resume requires --checkpoint')
+
     if not os.path.exists(options.storage_file):
         raise IOError('Missing plaso storage file.')
 
-    document = case.Document()
-    exporter = plaso_exporter.PlasoExporter(document)
+    if options.deterministic_ids:
+        scheme = identifiers.ContentIdentifiers()
+    else:
+        scheme = identifiers.RandomIdentifiers()
+
+    checkpointer = None
+    checkpoint = None
+    if options.checkpoint:
+        checkpointer = checkpoint_lib.Checkpointer(
+            options.checkpoint, options.storage_file, interval=options.checkpoint_interval)
+        if options.resume:
+            checkpoint = checkpointer.load()
+            if checkpoint:
+                print 'Resuming from event {}...'.format(checkpoint['position'])
+            else:
+                print 'No checkpoint found. Starting from the beginning...'
+
+    if options.cache_memory or options.checkpoint:
+        # Keep the database alongside the checkpoint, since it holds part of its state.
+        cache_factory = cache.DiskCacheFactory(
+            (options.cache_memory or CHECKPOINT_CACHE_MEMORY) * 1024 * 1024,
+            path=options.checkpoint + '.cache' if options.checkpoint else None,
+            resume=checkpoint is not None)
+    else:
+        cache_factory = cache.MemoryCacheFactory(counted=bool(options.stats))
+
+    statistics = stats.Statistics() if options.stats else None
+
+    writer = None
+
+    if options.stream:
+        triple_filter = None
+        if options.deduplicate:
+            # Keep the database alongside the checkpoint, since it holds part of its state.
+            triple_filter = deduplication.TripleFilter(
+                memory_size=options.deduplicate_memory * 1024 * 1024,
+                path=options.checkpoint + '.dedup' if options.checkpoint else None,
+                written=checkpoint['triple_count'] if checkpoint else None)
+        graphs = []
+        for format, destination in destinations:
+            # Name the graph after the storage file, so N-Quads from different
+            # storage files can be told apart.
+            graphs.append(streaming.create_streaming_graph(
+                destination, format=format,
+                graph_name=streaming.storage_file_graph_name(options.storage_file),
+                offset=checkpoint['output_offset'] if checkpoint else None,
+                triple_filter=triple_filter if len(destinations) == 1 else None))
+        if len(graphs) > 1:
+            # Duplicates are dropped once, before the triples are handed to each format.
+            graph = streaming.MultiStreamingGraph(graphs, triple_filter=triple_filter)
+        else:
+            graph = graphs[0]
+        if checkpoint:
+            graph.triple_count = checkpoint['triple_count']
+        if options.pipeline:
+            graph = writer = pipeline.WriterStage(graph, queue_size=options.pipeline_queue_size)
+    elif options.store:
+        try:
+            graph = stores.open_store(
+                options.store, streaming.storage_file_graph_name(options.storage_file),
+                batch_size=options.store_batch_size)
+        except ValueError as exception:
+            parser.error(str(exception))
+    else:
+        # Let the CASE API set up its default in-memory graph.
+        graph = case.Document().graph
+
+    index = None
+    if options.index:
+        index = sidecar.SidecarIndex(options.index, resume=checkpoint is not None)
+        graph = sidecar.IndexingGraph(graph, index)
+    if checkpointer:
+        checkpointer.attach(graph)
+
+    if options.buffer_events > 0:
+        document = case.Document(
+            buffering.TripleBuffer(graph, flush_events=options.buffer_events))
+    else:
+        document = case.Document(graph)
+
+    if options.data_types:
+        data_type_filter = event_filter.DataTypeFilter.from_expression(options.data_types)
+    else:
+        data_type_filter = event_filter.DataTypeFilter()
+
+    reporter = None
+    if options.progress_interval > 0:
+        reporter = progress.ProgressReporter(
+            document.graph, interval=options.progress_interval, path=options.progress_file)
+        reporter.start()
+
+    exporter = plaso_exporter.PlasoExporter(
+        document, identifiers=scheme, cache_factory=cache_factory,
+        data_type_filter=data_type_filter, statistics=statistics, progress=reporter,
+        read_ahead=options.pipeline_queue_size if options.pipeline else 0,
+        include_all_sources=options.include_all_sources)
     print 'Exporting storage file...'
-    exporter.export_storage_file(options.storage_file)
-    print 'Serializing graph...'
-    document.serialize(format=options.format, destination=options.output_file)
+    try:
+        exporter.export_storage_file(
+            options.storage_file, workers=options.workers,
+            checkpointer=checkpointer, checkpoint=checkpoint)
+    except BaseException:
+        # Keep the cache database around for resuming from the checkpoint.
+        cache_factory.close()
+        if reporter:
+            reporter.stop()
+        if options.store:
+            graph.close()
+        raise
+    cache_factory.close(remove=True)
+
+    if data_type_filter.skipped:
+        print 'Skipped {} events of unexported data types:'.format(
+            sum(data_type_filter.skipped.values()))
+        for data_type, count in data_type_filter.skipped.most_common():
+            print '  {}: {}'.format(data_type, count)
+
+    if options.stream:
+        graph.close()
+        triple_count = graph.triple_count
+        print 'Wrote {} triples.'.format(triple_count)
+        if writer:
+            writer.record_statistics(exporter.statistics)
+        if triple_filter:
+            print 'Dropped {} duplicate triples.'.format(triple_filter.duplicates)
+    else:
+        triple_count = progress.count_triples(document.graph)
+        print 'Serializing graph...'
+        # Stores are read by a single process.
+        serialize_workers = 1 if options.store else options.serialize_workers
+        if reporter:
+            estimates = [progress.estimate_serialization_time(document.graph, format)
+                         for format, _ in destinations]
+            reporter.start_phase(
+                'serialize',
+                estimate=max(estimates) if serialize_workers > 1 else sum(estimates))
+        with exporter.statistics.phase('serialize'):
+            if options.shards:
+                manifest = sharding.write_shards(
+                    document.graph, options.output_file, destinations[0][0], options.shards,
+                    shard_by=options.shard_by, compression=options.compression,
+                    workers=options.serialize_workers)
+                print 'Wrote {} triples in {} shards.'.format(
+                    manifest['triples'], len(manifest['shards']))
+            else:
+                serialization.serialize(document, destinations, workers=serialize_workers)
+
+    if reporter:
+        reporter.start_phase('finished')
+        reporter.stop()
+
+    if options.store:
+        graph.close()
+
+    if index:
+        index.close()
+
+    if statistics:
+        statistics.triples = triple_count
+        with open(options.stats, 'w') as file_object:
+            json.dump(statistics.to_dict(), file_object, indent=2, sort_keys=True)
+
+    if checkpointer:
+        checkpointer.remove()
 
 
 if __name__ == '__main__':
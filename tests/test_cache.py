@@ -0,0 +1,80 @@
+"""Tests for the caches used by the event exporters."""
+
+import unittest
+
+import case
+import rdflib
+
+from benchmarks import synthetic
+from case_plaso import cache, plaso_exporter
+
+
+class CountingDictTest(unittest.TestCase):
+    """Tests for CountingDict."""
+
+    def testCounts(self):
+        counting_dict = cache.CountingDict()
+        self.assertIsNone(counting_dict.get('a'))
+        counting_dict['a'] = 1
+        self.assertEqual(counting_dict.get('a'), 1)
+        self.assertIn('a', counting_dict)
+        self.assertEqual(counting_dict['a'], 1)
+        self.assertEqual((counting_dict.hits, counting_dict.misses), (3, 1))
+
+
+class DiskCacheTest(unittest.TestCase):
+    """Tests for DiskCache."""
+
+    def setUp(self):
+        self.cache_factory = cache.DiskCacheFactory(1)
+        self.disk_cache = self.cache_factory.create_dict(case.Document(rdflib.Graph()), 'test')
+
+    def tearDown(self):
+        self.cache_factory.close()
+
+    def testEvictedKeys(self):
+        # Keys whose values aren't referenced anywhere else (unlike constants), as
+        # when they are written to disk after the event they came from is gone.
+        self.disk_cache[(u'user{}'.format(268), u'{} {}'.format('Grace', 'Wilson'))] = True
+        self.disk_cache[(u'user{}'.format(1), u'{} {}'.format('Grace', 'Wilson'))] = True
+        self.cache_factory.commit()
+        username, display_name = u'user268', u'Grace Wilson'
+        self.assertIn((username, display_name), self.disk_cache)
+        self.assertIn((u'user1', display_name), self.disk_cache)
+        self.assertNotIn((u'user2', display_name), self.disk_cache)
+
+
+class ExporterCountsTest(unittest.TestCase):
+    """Tests that the event exporters look each cached entry up once per use."""
+
+    def _export(self, data_type, count):
+        document = case.Document(rdflib.Graph())
+        exporter = plaso_exporter.PlasoExporter(
+            document, cache_factory=cache.MemoryCacheFactory(counted=True))
+        generator = synthetic.EventGenerator(mix={data_type: 1}, distinct=0.2)
+        exporter.export_events(generator.generate(count))
+        return exporter.get_event_exporter(data_type)
+
+    def _assertCounts(self, counting_dict, lookups):
+        # Every entry is added after a miss.
+        self.assertEqual(counting_dict.misses, len(counting_dict))
+        self.assertEqual(counting_dict.hits + counting_dict.misses, lookups)
+
+    def testEventData(self):
+        event_exporter = self._export('android:event:call', 500)
+        self._assertCounts(event_exporter._cached_property_bundles, 500)
+        self._assertCounts(
+            event_exporter._contacts, event_exporter._cached_property_bundles.misses)
+
+    def testFileSystem(self):
+        event_exporter = self._export('fs:stat', 500)
+        self._assertCounts(event_exporter._content_data_pbs, 500)
+        # Each event looks up its file, and each file missing from the cache its
+        # parent, until one is found.
+        traces = event_exporter._path_spec_traces
+        self.assertEqual(traces.misses, len(traces))
+        self.assertLessEqual(traces.hits + traces.misses, 500 + len(traces))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""Tests for resuming interrupted exports from their checkpoints."""
+
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+import case
+import rdflib
+
+from benchmarks import synthetic
+from case_plaso import cache, checkpoint, plaso_exporter, streaming
+
+
+EXPORT_SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'case_plaso_export.py')
+
+# Random identifiers and the createdTime of the traces differ between exports.
+_RANDOM_PATTERNS = [
+    (re.compile(r'<[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}>'), '<random>'),
+    (re.compile(r'_:\w+'), '_:blank'),
+    (re.compile(r'(createdTime> )"[^"]*"'), r'\1"time"'),
+]
+
+
+def normalized_lines(path):
+    """Reads the lines of an N-Triples file, with its random parts replaced."""
+    lines = []
+    with open(path) as file_object:
+        for line in file_object:
+            for pattern, replacement in _RANDOM_PATTERNS:
+                line = pattern.sub(replacement, line)
+            lines.append(line)
+    return sorted(lines)
+
+
+class ResumeTest(unittest.TestCase):
+    """Tests for killing an export and resuming it from its checkpoint."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.storage_file = os.path.join(cls.directory, 'events.plaso')
+        synthetic.write_storage_file(cls.storage_file, 3000, distinct=0.2, seed=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def _start_export(self, output, *arguments):
+        return subprocess.Popen(
+            [sys.executable, EXPORT_SCRIPT, '--stream', '--format', 'nt', '--deterministic-ids',
+             '--checkpoint-interval', '100'] + list(arguments) + [self.storage_file, output],
+            stdout=open(os.devnull, 'w'))
+
+    def _wait_for_checkpoint(self, process, checkpointer, position):
+        """Waits until the export has recorded a checkpoint past the given position."""
+        while process.poll() is None:
+            last_checkpoint = checkpointer.load()
+            if last_checkpoint and last_checkpoint['position'] >= position:
+                return last_checkpoint
+            time.sleep(0.01)
+        self.fail('The export finished before it could be killed.')
+
+    def testKillAndResume(self):
+        expected_output = os.path.join(self.directory, 'expected.nt')
+        self.assertEqual(self._start_export(expected_output).wait(), 0)
+
+        output = os.path.join(self.directory, 'output.nt')
+        checkpoint_path = os.path.join(self.directory, 'export.checkpoint')
+        checkpointer = checkpoint.Checkpointer(checkpoint_path, self.storage_file)
+        process = self._start_export(output, '--checkpoint', checkpoint_path)
+        last_checkpoint = self._wait_for_checkpoint(process, checkpointer, 1000)
+        os.kill(process.pid, signal.SIGKILL)
+        process.wait()
+
+        # The caches are committed to their database instead of copied into the
+        # checkpoint, so it doesn't grow with the number of exported events.
+        self.assertTrue(os.path.exists(checkpoint_path + '.cache'))
+        self.assertLess(os.path.getsize(checkpoint_path), 4096)
+        self.assertGreaterEqual(os.path.getsize(output), last_checkpoint['output_offset'])
+
+        process = self._start_export(output, '--checkpoint', checkpoint_path, '--resume')
+        self.assertEqual(process.wait(), 0)
+        self.assertFalse(os.path.exists(checkpoint_path))
+        self.assertFalse(os.path.exists(checkpoint_path + '.cache'))
+        # Nothing is lost or exported twice.
+        self.assertEqual(normalized_lines(output), normalized_lines(expected_output))
+
+    def testMemoryCaches(self):
+        document = case.Document(streaming.StreamingGraph(os.path.join(self.directory, 'memory.nt')))
+        exporter = plaso_exporter.PlasoExporter(
+            document, cache_factory=cache.MemoryCacheFactory())
+        checkpointer = checkpoint.Checkpointer(
+            os.path.join(self.directory, 'memory.checkpoint'), self.storage_file)
+        with self.assertRaises(ValueError):
+            exporter.export_storage_file(self.storage_file, checkpointer=checkpointer)
+        document.graph.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
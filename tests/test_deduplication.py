@@ -0,0 +1,90 @@
+"""Tests for the suppression of duplicate triples in streamed output."""
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import rdflib
+
+from case_plaso import deduplication, streaming
+
+
+def _line(number):
+    return streaming.ntriples_line(
+        rdflib.URIRef('http://example.org/{}'.format(number)),
+        rdflib.URIRef('http://example.org/value'),
+        rdflib.Literal(number))
+
+
+class TripleFilterTest(unittest.TestCase):
+    """Tests for TripleFilter."""
+
+    def setUp(self):
+        self.triple_filter = deduplication.TripleFilter(memory_size=64 * 1024)
+
+    def tearDown(self):
+        self.triple_filter.close()
+
+    def testAdd(self):
+        self.assertTrue(self.triple_filter.add(_line(1)))
+        self.assertTrue(self.triple_filter.add(_line(2)))
+        self.assertFalse(self.triple_filter.add(_line(1)))
+        self.assertEqual(self.triple_filter.duplicates, 1)
+
+    def testRecentLinesWithinMemorySize(self):
+        for number in range(10000):
+            self.assertTrue(self.triple_filter.add(_line(number)))
+        recent_memory = sum(
+            sys.getsizeof(line) + self.triple_filter._SET_ENTRY_SIZE
+            for line in self.triple_filter._recent | self.triple_filter._previous)
+        self.assertLessEqual(recent_memory, 2 * self.triple_filter.recent_memory_size)
+        self.assertLessEqual(
+            2 * self.triple_filter.recent_memory_size + len(self.triple_filter._bloom_filter._bits),
+            64 * 1024)
+        # Lines which fell out of the recent lines are found in the database.
+        self.assertNotIn(_line(0), self.triple_filter._recent | self.triple_filter._previous)
+        self.assertFalse(self.triple_filter.add(_line(0)))
+        self.assertEqual(self.triple_filter.duplicates, 1)
+
+
+class MultiStreamingGraphTest(unittest.TestCase):
+    """Tests for MultiStreamingGraph."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testDeduplicateOnce(self):
+        triple_filter = deduplication.TripleFilter(memory_size=64 * 1024)
+        destinations = [os.path.join(self.directory, 'output.nt'),
+                        os.path.join(self.directory, 'output.nq')]
+        graph = streaming.MultiStreamingGraph(
+            [streaming.create_streaming_graph(destinations[0], format='nt'),
+             streaming.create_streaming_graph(
+                 destinations[1], format='nquads', graph_name=rdflib.URIRef('http://example.org/'))],
+            triple_filter=triple_filter)
+        subject = rdflib.URIRef('http://example.org/1')
+        predicate = rdflib.URIRef('http://example.org/value')
+        graph.add((subject, predicate, rdflib.Literal(1)))
+        graph.add((subject, predicate, rdflib.Literal(1)))
+        graph.addN([(subject, predicate, rdflib.Literal(1), None),
+                    (subject, predicate, rdflib.Literal(2), None)])
+        graph.close()
+
+        self.assertEqual(triple_filter.duplicates, 2)
+        self.assertEqual([sub_graph.triple_count for sub_graph in graph.graphs], [2, 2])
+        for destination in destinations:
+            with io.open(destination, 'rb') as file_object:
+                self.assertEqual(len(file_object.readlines()), 2)
+        # The filter is closed along with the graphs, once.
+        self.assertFalse(os.path.exists(triple_filter.path))
+        graph.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""Tests for looking up the event exporter of each data type."""
+
+import subprocess
+import sys
+import unittest
+
+import case
+import pkg_resources
+import rdflib
+
+from case_plaso import event_exporters
+from case_plaso.event_exporter import DefaultEventExporter, EventExporter
+from case_plaso.event_exporters import filestat
+
+
+# Checks which modules of the built-in event exporters a fresh interpreter imports.
+_LAZY_IMPORT_SCRIPT = '''
+import sys
+from case_plaso.event_exporter import EventExporter
+
+def imported():
+    # (Python 2 also records failed implicit relative imports, as None.)
+    return sorted(name for name, module in sys.modules.items()
+                  if module and name.startswith('case_plaso.event_exporters.'))
+
+print imported()
+print 'skype:event:call' in EventExporter.data_types()
+print imported()
+print EventExporter.get_class('skype:event:call').__name__
+print imported()
+'''
+
+
+class PluginExporter(EventExporter):
+    """Event exporter provided through the entry point group by another package."""
+
+    def export_event(self, event):
+        pass
+
+
+class EventExporterTest(unittest.TestCase):
+    """Tests for the registry of EventExporter classes."""
+
+    def setUp(self):
+        # Resets the loaders and classes found by the tests.
+        self.addCleanup(setattr, EventExporter, '_loaders', EventExporter._loaders)
+        self.addCleanup(setattr, EventExporter, '_registry', EventExporter._registry)
+        EventExporter._loaders = None
+        EventExporter._registry = dict(EventExporter._registry)
+
+    def _add_entry_points(self, *entry_points):
+        """Makes pkg_resources find the given entry points of the exporter group."""
+        iter_entry_points = pkg_resources.iter_entry_points
+        self.addCleanup(setattr, pkg_resources, 'iter_entry_points', iter_entry_points)
+
+        def _iter_entry_points(group, name=None):
+            if group == event_exporters.ENTRY_POINT_GROUP:
+                distribution = pkg_resources.Distribution(project_name='plugin')
+                return iter([pkg_resources.EntryPoint.parse(entry_point, dist=distribution)
+                             for entry_point in entry_points])
+            return iter_entry_points(group, name=name)
+
+        pkg_resources.iter_entry_points = _iter_entry_points
+
+    def testLazyImport(self):
+        output = subprocess.check_output([sys.executable, '-c', _LAZY_IMPORT_SCRIPT])
+        self.assertEqual(output.splitlines(), [
+            '[]', 'True', '[]', 'SkypeCallExporter', "['case_plaso.event_exporters.skype']"])
+
+    def testEntryPoints(self):
+        self._add_entry_points(
+            'test:event = tests.test_event_exporter:PluginExporter',
+            'fs:stat = tests.test_event_exporter:PluginExporter')
+        self.assertIn('test:event', EventExporter.data_types())
+        self.assertIs(EventExporter.get_class('test:event'), PluginExporter)
+        document = case.Document(rdflib.Graph())
+        self.assertIsInstance(EventExporter.from_data_type('test:event', document), PluginExporter)
+
+    def testBuiltInPrecedence(self):
+        self._add_entry_points('fs:stat = tests.test_event_exporter:PluginExporter')
+        loader = EventExporter._get_loaders()['fs:stat']
+        self.assertIs(loader(), filestat.FileStatExporter)
+        self.assertIs(EventExporter.get_class('fs:stat'), filestat.FileStatExporter)
+
+    def testUnknownDataType(self):
+        self.assertNotIn('unknown:event', EventExporter.data_types())
+        self.assertIsNone(EventExporter.get_class('unknown:event'))
+        document = case.Document(rdflib.Graph())
+        self.assertIs(
+            type(EventExporter.from_data_type('unknown:event', document)), DefaultEventExporter)
+
+
+if __name__ == '__main__':
+    unittest.main()
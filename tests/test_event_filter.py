@@ -0,0 +1,79 @@
+"""Tests for the filtering of plaso events by their data type."""
+
+import collections
+import json
+import unittest
+
+from plaso.containers import events
+from plaso.serializer import json_serializer
+
+from case_plaso import event_filter
+
+
+def _serialize(data_type, **attributes):
+    """Serializes an event the way plaso stores it in a storage file."""
+    event = events.EventObject()
+    event.data_type = data_type
+    event.timestamp = 0
+    for name, value in attributes.items():
+        setattr(event, name, value)
+    return json_serializer.JSONAttributeContainerSerializer.WriteSerialized(event)
+
+
+class PeekDataTypeTest(unittest.TestCase):
+    """Tests for peek_data_type()."""
+
+    def testQuoted(self):
+        self.assertEqual(
+            event_filter.peek_data_type(_serialize(u'fs:stat', filename=u'a "quoted" name')),
+            u'fs:stat')
+
+    def testBytes(self):
+        # Byte string data types are serialized as quoted-printable "bytes" objects.
+        self.assertEqual(event_filter.peek_data_type(_serialize(b'fs:stat')), u'fs:stat')
+        self.assertEqual(
+            event_filter.peek_data_type(_serialize(b'fs:st\xc3\xa4t')), u'fs:st\xe4t')
+
+    def testEscaped(self):
+        # Escaped characters would need to be JSON decoded, so they're left to
+        # the deserialization.
+        self.assertIsNone(event_filter.peek_data_type(_serialize(u'fs:"stat"')))
+        self.assertIsNone(event_filter.peek_data_type(_serialize(u'fs:st\xe4t')))
+
+    def testNested(self):
+        # Another "data_type" key makes it ambiguous which one is the event's.
+        event_data = _serialize(u'fs:stat', extra={u'data_type': u'skype:event:chat'})
+        self.assertEqual(json.loads(event_data)[u'data_type'], u'fs:stat')
+        self.assertIsNone(event_filter.peek_data_type(event_data))
+
+    def testMissing(self):
+        self.assertIsNone(event_filter.peek_data_type(b'{"timestamp": 0}'))
+        self.assertIsNone(event_filter.peek_data_type(b'{"data_type": null}'))
+
+
+class _StorageReader(object):
+    """Storage reader without the private storage file methods read_events() uses."""
+
+    def __init__(self, events_):
+        self._events = events_
+
+    def GetEvents(self):
+        return iter(self._events)
+
+
+class DataTypeFilterTest(unittest.TestCase):
+    """Tests for DataTypeFilter."""
+
+    def testReadEventsWithoutPrivateMethods(self):
+        data_type_filter = event_filter.DataTypeFilter(allowed=[u'fs:stat'])
+        Event = collections.namedtuple('Event', 'data_type')
+        storage_reader = _StorageReader(
+            [Event(u'fs:stat'), Event(u'skype:event:chat'), Event(u'fs:stat')])
+        self.assertEqual(
+            list(data_type_filter.read_events(storage_reader)),
+            [Event(u'fs:stat'), Event(u'fs:stat')])
+        self.assertEqual(data_type_filter.skipped, {u'skype:event:chat': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
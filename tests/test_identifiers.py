@@ -0,0 +1,54 @@
+"""Tests for the schemes choosing the identifiers of exported traces and objects."""
+
+import unittest
+
+import case
+import rdflib
+
+from benchmarks import synthetic
+from case_plaso import identifiers, plaso_exporter
+
+
+def _export(identifiers_scheme, count=200):
+    """Exports synthetic file system events into a new graph."""
+    document = case.Document(rdflib.Graph())
+    exporter = plaso_exporter.PlasoExporter(document, identifiers=identifiers_scheme)
+    generator = synthetic.EventGenerator(mix={'fs:stat': 1}, distinct=0.2, snapshots=2)
+    exporter.export_events(generator.generate(count))
+    return document.graph
+
+
+def _object_created_times(graph):
+    """Retrieves the createdTime given to traces and relationships by the CASE API.
+
+    (Unlike the createdTime of files, which is on their File property bundle.)
+    """
+    return [
+        created_time
+        for rdf_type in (case.CASE.Trace, case.CASE.Relationship)
+        for node in graph.subjects(rdflib.RDF.type, rdf_type)
+        for created_time in graph.objects(node, case.CASE.createdTime)]
+
+
+class ContentIdentifiersTest(unittest.TestCase):
+    """Tests for ContentIdentifiers."""
+
+    def testIndependentExports(self):
+        graph = _export(identifiers.ContentIdentifiers())
+        other_graph = _export(identifiers.ContentIdentifiers())
+        self.assertGreater(len(graph), 0)
+        self.assertEqual(set(graph), set(other_graph))
+        # Nodes with the same IRI would otherwise get the time of each export.
+        self.assertEqual(_object_created_times(graph), [])
+
+    def testRandomIdentifiers(self):
+        graph = _export(identifiers.RandomIdentifiers())
+        self.assertEqual(
+            len(_object_created_times(graph)),
+            len(set(graph.subjects(rdflib.RDF.type, case.CASE.Trace))) +
+            len(set(graph.subjects(rdflib.RDF.type, case.CASE.Relationship))))
+        self.assertNotEqual(set(graph), set(_export(identifiers.RandomIdentifiers())))
+
+
+if __name__ == '__main__':
+    unittest.main()
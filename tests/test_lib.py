@@ -0,0 +1,93 @@
+"""Tests for the helper functions shared by the exporters."""
+
+import logging
+import unittest
+
+import pytz
+import rdflib
+from plaso.containers import events
+from plaso.lib import timelib
+
+from case_plaso import lib
+
+
+def _event(**attributes):
+    """Creates a plaso event with the given attributes."""
+    event = events.EventObject()
+    event.data_type = 'test:event'
+    event.timestamp = 0
+    for name, value in attributes.items():
+        setattr(event, name, value)
+    return event
+
+
+class ConvertTimestampsTest(unittest.TestCase):
+    """Tests for convert_timestamps()."""
+
+    # Including ones without microseconds, before the epoch and out of range.
+    TIMESTAMPS = [
+        1473363934000000, 1473363934123456, 1473363934000001, 0, -86400000001,
+        2 ** 62, -2 ** 62, 1473363934000000]
+
+    def setUp(self):
+        # plaso logs an error for each out of range timestamp.
+        logging.disable(logging.ERROR)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+    def _assertConverted(self):
+        literals = lib.convert_timestamps(self.TIMESTAMPS)
+        for timestamp, literal in zip(self.TIMESTAMPS, literals):
+            # As each timestamp would be converted on its own.
+            expected_literal = rdflib.Literal(
+                timelib.Timestamp.CopyToDatetime(timestamp, timezone=pytz.UTC),
+                datatype=rdflib.XSD.dateTime)
+            self.assertEqual(literal, expected_literal)
+            self.assertEqual(unicode(literal), unicode(expected_literal))
+            self.assertIs(lib.convert_timestamp(timestamp), literal)
+        # Repeated timestamps share the same Literal.
+        self.assertIs(literals[0], literals[-1])
+
+    def testConvert(self):
+        self._assertConverted()
+
+    def testConvertWithoutNumpy(self):
+        self.addCleanup(setattr, lib, 'numpy', lib.numpy)
+        lib.numpy = None
+        lib._timestamp_literals.clear()
+        self._assertConverted()
+
+
+class EventDataFingerprinterTest(unittest.TestCase):
+    """Tests for EventDataFingerprinter."""
+
+    def setUp(self):
+        self.fingerprinter = lib.EventDataFingerprinter()
+
+    def testExcludedAttributes(self):
+        fingerprint = self.fingerprinter.fingerprint(_event(body=u'a', filename=u'a.db'))
+        other_event = _event(body=u'a', filename=u'b.db', uuid=u'1234')
+        other_event.timestamp = 10
+        self.assertEqual(self.fingerprinter.fingerprint(other_event), fingerprint)
+        self.assertNotEqual(self.fingerprinter.fingerprint(_event(body=u'b')), fingerprint)
+
+    def testNoneValues(self):
+        fingerprint = self.fingerprinter.fingerprint(_event(body=u'a'))
+        # Same layout as the first event.
+        self.assertEqual(self.fingerprinter.fingerprint(_event(body=u'a')), fingerprint)
+        # Attributes set to None are the same as missing ones.
+        self.assertEqual(self.fingerprinter.fingerprint(_event(body=u'a', title=None)), fingerprint)
+        self.assertNotEqual(
+            self.fingerprinter.fingerprint(_event(body=u'a', title=u'')), fingerprint)
+        self.assertNotEqual(self.fingerprinter.fingerprint(_event(body=None)), fingerprint)
+
+    def testStableValues(self):
+        fingerprint = self.fingerprinter.fingerprint(_event(body=u'a', extra={'b': [1, 2]}))
+        self.assertEqual(
+            lib.EventDataFingerprinter().fingerprint(_event(extra={'b': [1, 2]}, body=u'a')),
+            fingerprint)
+        self.assertNotEqual(
+            self.fingerprinter.fingerprint(_event(body=u'a', extra={'b': [2, 1]})), fingerprint)
+
+
+if __name__ == '__main__':
+    unittest.main()
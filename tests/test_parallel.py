@@ -0,0 +1,95 @@
+"""Tests for exporting events in worker processes and merging their results."""
+
+import os
+import shutil
+import signal
+import tempfile
+import unittest
+
+import case
+import rdflib
+
+from benchmarks import synthetic
+from case_plaso import cache, identifiers, plaso_exporter, streaming
+from tests.test_checkpoint import normalized_lines
+
+
+class ParallelExportTest(unittest.TestCase):
+    """Tests for PlasoExporter.export_storage_file() with multiple workers."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.storage_directory = tempfile.mkdtemp()
+        cls.storage_file = os.path.join(cls.storage_directory, 'events.plaso')
+        synthetic.write_storage_file(
+            cls.storage_file, 1000, mix={'fs:stat': 1}, distinct=0.2, snapshots=2, seed=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.storage_directory)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # Temporary files of the export (e.g. of the workers) are created in here.
+        self.temp_directory = tempfile.mkdtemp()
+        self.addCleanup(setattr, tempfile, 'tempdir', tempfile.tempdir)
+        tempfile.tempdir = self.temp_directory
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        shutil.rmtree(self.temp_directory)
+
+    def _export(self, graph, workers, **kwargs):
+        document = case.Document(graph)
+        exporter = plaso_exporter.PlasoExporter(
+            document, identifiers=identifiers.ContentIdentifiers(), **kwargs)
+        exporter.export_storage_file(self.storage_file, workers=workers)
+        return document.graph
+
+    def _lines(self, name, graph):
+        """Reads the triples of a graph, without the random nodes of the sessions."""
+        path = os.path.join(self.directory, name)
+        if not isinstance(graph, streaming.StreamingGraph):
+            graph.serialize(path, format='nt')
+        # Workers may export the same triple more than once. (And rdflib ends its
+        # output with an empty line.)
+        return set(line for line in normalized_lines(path) if line.strip())
+
+    def testMerge(self):
+        lines = self._lines('single.nt', self._export(rdflib.Graph(), 1))
+        self.assertGreater(len(lines), 1000)
+        self.assertEqual(self._lines('workers.nt', self._export(rdflib.Graph(), 3)), lines)
+        self.assertEqual(os.listdir(self.temp_directory), [])
+
+    def testMergeStreamed(self):
+        lines = self._lines('single.nt', self._export(rdflib.Graph(), 1))
+        path = os.path.join(self.directory, 'workers.nt')
+        with streaming.StreamingGraph(path) as graph:
+            self._export(graph, 3)
+        self.assertEqual(self._lines('workers.nt', graph), lines)
+        self.assertEqual(os.listdir(self.temp_directory), [])
+
+    def testKilledWorker(self):
+        export_events = plaso_exporter.PlasoExporter.export_events
+        self.addCleanup(setattr, plaso_exporter.PlasoExporter, 'export_events', export_events)
+
+        def _export_events(exporter, events, *args, **kwargs):
+            # Only the workers export the events themselves.
+            for position, event in enumerate(events):
+                exporter.get_event_exporter(event.data_type).export_event(event)
+                if position == 10:
+                    exporter.cache_factory.commit()
+                    os.kill(os.getpid(), signal.SIGKILL)
+
+        plaso_exporter.PlasoExporter.export_events = _export_events
+        cache_factory = cache.DiskCacheFactory(
+            1024 * 1024, path=os.path.join(self.directory, 'export.cache'))
+        with self.assertRaises(RuntimeError):
+            self._export(rdflib.Graph(), 2, cache_factory=cache_factory)
+        cache_factory.close()
+        # The partial graphs and the disk caches of the workers are removed.
+        self.assertEqual(os.listdir(self.temp_directory), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
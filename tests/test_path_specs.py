@@ -0,0 +1,115 @@
+"""Tests for the index of dfvfs path specs."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import case
+import rdflib
+from dfvfs.lib import definitions
+from dfvfs.path import factory
+
+from case_plaso import cache, path_specs
+
+
+def _file_path_spec(location, image='/cases/image.E01'):
+    """Creates the path spec of a file in a partition of an EWF image."""
+    path_spec = factory.Factory.NewPathSpec(definitions.TYPE_INDICATOR_OS, location=image)
+    path_spec = factory.Factory.NewPathSpec(definitions.TYPE_INDICATOR_EWF, parent=path_spec)
+    path_spec = factory.Factory.NewPathSpec(
+        definitions.TYPE_INDICATOR_TSK_PARTITION, location=u'/p1', part_index=2,
+        start_offset=2048, parent=path_spec)
+    return factory.Factory.NewPathSpec(
+        definitions.TYPE_INDICATOR_TSK, location=location, inode=15, parent=path_spec)
+
+
+class AttributesTest(unittest.TestCase):
+    """Tests for _attributes()."""
+
+    def testAttributeNames(self):
+        path_spec = _file_path_spec(u'/a')
+        self.assertEqual(path_specs._attributes(path_spec), (None, 15, u'/a'))
+        # Same number of attributes as the first path spec of the class, but other names.
+        other_path_spec = _file_path_spec(u'/a')
+        del other_path_spec.inode
+        other_path_spec.mft_attribute = 3
+        self.assertEqual(
+            path_specs._attributes(other_path_spec),
+            ('', ('data_stream', None), ('location', u'/a'), ('mft_attribute', 3)))
+
+
+class PathSpecIndexTest(unittest.TestCase):
+    """Tests for PathSpecIndex."""
+
+    def setUp(self):
+        self.index = path_specs.PathSpecIndex()
+
+    def testLookup(self):
+        node = self.index.lookup(_file_path_spec(u'/a'))
+        # Another chain of equal path specs, as read from a storage file for each event.
+        self.assertEqual(self.index.lookup(_file_path_spec(u'/a')), node)
+        self.assertNotEqual(self.index.lookup(_file_path_spec(u'/b')), node)
+        self.assertNotEqual(
+            self.index.lookup(_file_path_spec(u'/a', image='/cases/other.E01')), node)
+        self.assertEqual(len(self.index), 9)
+
+    def testLookupChain(self):
+        path_spec = _file_path_spec(u'/a')
+        chain = self.index.lookup_chain(path_spec)
+        self.assertEqual([chain_path_spec for _, chain_path_spec in chain],
+                         self.index._chain(path_spec))
+        self.assertEqual(chain[-1][0], self.index.lookup(_file_path_spec(u'/a')))
+        self.assertEqual(len(set(node for node, _ in chain)), len(chain))
+
+    def testShardKey(self):
+        shard_key = self.index.shard_key(_file_path_spec(u'/a'))
+        # The key doesn't depend on the order the nodes were interned in.
+        index = path_specs.PathSpecIndex()
+        index.lookup(_file_path_spec(u'/b', image='/cases/other.E01'))
+        self.assertEqual(index.shard_key(_file_path_spec(u'/a')), shard_key)
+        self.assertNotEqual(index.shard_key(_file_path_spec(u'/b')), shard_key)
+
+    def testRecentPathSpecs(self):
+        self.index.RECENT_SIZE = 6
+        path_spec = _file_path_spec(u'/a')
+        node = self.index.lookup(path_spec)
+        # The parents are remembered, so sibling files only intern themselves.
+        sibling = factory.Factory.NewPathSpec(
+            definitions.TYPE_INDICATOR_TSK, location=u'/b', inode=16, parent=path_spec.parent)
+        self.index.lookup(sibling)
+        self.assertIn(id(path_spec.parent), self.index._recent)
+        self.assertEqual(len(self.index._recent), 5)
+        # Remembering more path specs starts over.
+        self.index.lookup(_file_path_spec(u'/c', image='/cases/other.E01'))
+        self.assertEqual(len(self.index._recent), 4)
+        self.assertEqual(self.index.lookup(path_spec), node)
+
+    def testDiskCache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'export.cache')
+        document = case.Document(rdflib.Graph())
+
+        cache_factory = cache.DiskCacheFactory(1, path=path)
+        index = path_specs.PathSpecIndex(cache_factory.create_dict(document, 'nodes'))
+        node = index.lookup(_file_path_spec(u'/a'))
+        other_node = index.lookup(_file_path_spec(u'/b'))
+        state = index.get_state()
+        cache_factory.commit()
+        # Not committed, so it is gone after resuming.
+        index.lookup(_file_path_spec(u'/c'))
+        cache_factory.close()
+
+        cache_factory = cache.DiskCacheFactory(1, path=path, resume=True)
+        index = path_specs.PathSpecIndex(cache_factory.create_dict(document, 'nodes'))
+        index.set_state(state)
+        self.assertEqual(len(index), 5)
+        self.assertEqual(index.lookup(_file_path_spec(u'/a')), node)
+        self.assertEqual(index.lookup(_file_path_spec(u'/b')), other_node)
+        self.assertEqual(index.lookup(_file_path_spec(u'/c')), 5)
+        cache_factory.close(remove=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""Tests for writing a graph out as multiple compressed shards."""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import rdflib
+
+from case_plaso import sharding
+
+
+EXAMPLE = rdflib.Namespace('http://example.org/')
+
+
+def _graph(count=50):
+    """Creates a graph of traces, each with a property bundle blank node."""
+    graph = rdflib.Graph()
+    graph.bind('example', EXAMPLE)
+    for index in range(count):
+        trace = EXAMPLE['trace{}'.format(index)]
+        property_bundle = rdflib.BNode()
+        graph.add((trace, rdflib.RDF.type, EXAMPLE.Trace))
+        graph.add((trace, EXAMPLE.propertyBundle, property_bundle))
+        graph.add((property_bundle, EXAMPLE.fileName, rdflib.Literal(u'file{}'.format(index))))
+        graph.add((property_bundle, EXAMPLE.fileSize, rdflib.Literal(index)))
+    return graph
+
+
+class WriteShardsTest(unittest.TestCase):
+    """Tests for write_shards()."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _read_shards(self, manifest):
+        """Parses each shard on its own and checks it against the manifest."""
+        graphs = []
+        for entry in manifest['shards']:
+            path = os.path.join(self.directory, entry['path'])
+            with open(path, 'rb') as file_object:
+                self.assertEqual(hashlib.sha256(file_object.read()).hexdigest(), entry['sha256'])
+            graph = rdflib.Graph()
+            with gzip.open(path, 'rb') as file_object:
+                graph.parse(data=file_object.read(), format='nt')
+            self.assertEqual(len(graph), entry['triples'])
+            graphs.append(graph)
+        with open(os.path.join(self.directory, sharding.MANIFEST_NAME)) as file_object:
+            self.assertEqual(json.load(file_object), manifest)
+        self.assertEqual(sum(len(graph) for graph in graphs), manifest['triples'])
+        return graphs
+
+    def testShardBySubject(self):
+        graph = _graph()
+        manifest = sharding.write_shards(graph, self.directory, 'nt', 4, workers=2)
+        self.assertEqual(len(manifest['shards']), 4)
+        self.assertEqual(manifest['triples'], len(graph))
+        for shard in self._read_shards(manifest):
+            # Each property bundle is in the shard of its trace.
+            for property_bundle in shard.objects(None, EXAMPLE.propertyBundle):
+                self.assertEqual(len(list(shard.triples((property_bundle, None, None)))), 2)
+        # The directory of the spooled triples is removed.
+        self.assertEqual(sorted(os.listdir(self.directory)), sorted(
+            [sharding.MANIFEST_NAME] + [entry['path'] for entry in manifest['shards']]))
+
+    def testShardByTriples(self):
+        graph = _graph()
+        manifest = sharding.write_shards(
+            graph, self.directory, 'nt', 7, shard_by='triples', workers=2)
+        self.assertEqual(manifest['triples'], len(graph))
+        merged = rdflib.Graph()
+        for shard in self._read_shards(manifest):
+            merged += shard
+        # Blank nodes are skolemized, so the shards agree on the property bundles.
+        self.assertEqual(set(merged), set(
+            (sharding._skolemize(subject), predicate, sharding._skolemize(object_))
+            for subject, predicate, object_ in graph))
+        property_bundles = set(merged.objects(None, EXAMPLE.propertyBundle))
+        self.assertEqual(len(property_bundles), 50)
+        for property_bundle in property_bundles:
+            self.assertIsInstance(property_bundle, rdflib.URIRef)
+            self.assertTrue(property_bundle.startswith(sharding.SKOLEM_AUTHORITY))
+            self.assertEqual(len(list(merged.triples((property_bundle, None, None)))), 2)
+
+    def testUnsupported(self):
+        with self.assertRaises(ValueError):
+            sharding.write_shards(_graph(), self.directory, 'nt', 2, compression='zip')
+        with self.assertRaises(ValueError):
+            sharding.write_shards(_graph(), self.directory, 'nt', 2, shard_by='object')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""Tests for the sidecar index of the timestamps and hashes of an export."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import case
+import rdflib
+from case import CASE
+
+from benchmarks import synthetic
+from case_plaso import plaso_exporter, sidecar
+
+
+class SidecarIndexTest(unittest.TestCase):
+    """Tests for SidecarIndex and IndexingGraph."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'output.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _export(self, index):
+        """Exports synthetic events through an IndexingGraph into a new graph."""
+        graph = rdflib.Graph()
+        document = case.Document(sidecar.IndexingGraph(graph, index))
+        exporter = plaso_exporter.PlasoExporter(document)
+        generator = synthetic.EventGenerator(
+            mix={'fs:stat': 3, 'android:event:call': 1}, distinct=0.2, snapshots=2)
+        exporter.export_events(generator.generate(500))
+        document.graph.flush()
+        return graph
+
+    def _traces(self, graph):
+        """Maps each property bundle of the graph to the trace holding it."""
+        return dict((property_bundle, trace) for trace, property_bundle in
+                    graph.subject_objects(CASE.propertyBundle))
+
+    def testFindTimestamps(self):
+        index = sidecar.SidecarIndex(self.path)
+        graph = self._export(index)
+        traces = self._traces(graph)
+        expected_rows = set()
+        for node, predicate, object_ in graph:
+            # Leaves out the (timezone naive) createdTime the CASE API gives each object.
+            if (isinstance(object_, rdflib.Literal) and object_.datatype == rdflib.XSD.dateTime and
+                    object_.value.tzinfo):
+                expected_rows.add((
+                    sidecar._to_timestamp(object_.value), unicode(predicate),
+                    sidecar._node(traces.get(node, node))))
+        self.assertGreater(len(expected_rows), 100)
+
+        rows = index.find_timestamps(-2 ** 63, 2 ** 63 - 1)
+        self.assertEqual(set(rows), expected_rows)
+        self.assertEqual(rows, sorted(rows))
+        start, end = sorted(expected_rows)[10][0], sorted(expected_rows)[-10][0]
+        self.assertEqual(
+            set(index.find_timestamps(start, end)),
+            set(row for row in expected_rows if start <= row[0] <= end))
+        index.close()
+
+    def testFindHashes(self):
+        index = sidecar.SidecarIndex(self.path)
+        graph = self._export(index)
+        traces = self._traces(graph)
+        hash_values = list(graph.subject_objects(CASE.hashValue))
+        self.assertGreater(len(hash_values), 0)
+        for hash_node, value in hash_values:
+            method = graph.value(hash_node, CASE.hashMethod)
+            expected_rows = set(
+                (unicode(method), sidecar._node(traces[property_bundle]))
+                for property_bundle in graph.subjects(CASE.hash, hash_node))
+            self.assertTrue(expected_rows)
+            # Hash values are matched regardless of case.
+            self.assertEqual(set(index.find_hashes(unicode(value).upper())), expected_rows)
+        self.assertEqual(index.find_hashes(u'0' * 31), [])
+        index.close()
+
+    def testResume(self):
+        index = sidecar.SidecarIndex(self.path)
+        index.add('hash_values', (u'_:hash', u'abc'))
+        index.commit()
+        # Not committed, like the rows of an export interrupted after a checkpoint.
+        index.add('hash_values', (u'_:other', u'def'))
+        index._write_rows()
+        index._connection.close()
+
+        index = sidecar.SidecarIndex(self.path, resume=True)
+        self.assertEqual(
+            index._connection.execute('SELECT * FROM hash_values').fetchall(), [(u'_:hash', u'abc')])
+        index.close()
+        index = sidecar.SidecarIndex(self.path)
+        self.assertEqual(index._connection.execute('SELECT * FROM hash_values').fetchall(), [])
+        index.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
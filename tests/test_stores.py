@@ -0,0 +1,91 @@
+"""Tests for building the exported graph in a persistent rdflib store."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import rdflib
+
+from case_plaso import stores
+
+
+EXAMPLE = rdflib.Namespace('http://example.org/')
+GRAPH_NAME = rdflib.URIRef('file:///cases/image.plaso')
+
+
+def _triples(start, stop):
+    """Creates a trace, a typed one and a literal triple per index."""
+    triples = []
+    for index in range(start, stop):
+        trace = EXAMPLE['trace{}'.format(index)]
+        triples.append((trace, rdflib.RDF.type, EXAMPLE.Trace))
+        triples.append((trace, EXAMPLE.propertyBundle, EXAMPLE['bundle{}'.format(index)]))
+        triples.append((trace, EXAMPLE.fileName, rdflib.Literal(u'file{}'.format(index))))
+    return triples
+
+
+@unittest.skipIf(stores.rdflib_sqlalchemy is None, 'rdflib-sqlalchemy is not installed')
+class SQLAlchemyStoreTest(unittest.TestCase):
+    """Tests for BatchedGraph with the SQLAlchemy store."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.specification = 'SQLAlchemy:sqlite:///' + os.path.join(self.directory, 'export.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _add(self, batches):
+        """Adds the given batches of triples to the store, reopening it for each batch."""
+        triple_count = 0
+        for triples in batches:
+            with stores.open_store(self.specification, GRAPH_NAME, batch_size=7) as graph:
+                for triple in triples:
+                    graph.add(triple)
+                graph.addN(triple + (graph,) for triple in triples[:5])
+            triple_count += graph.triple_count
+        return triple_count
+
+    def _assertStored(self, triple_count, expected_triples):
+        self.assertEqual(triple_count, len(set(expected_triples)))
+        graph = rdflib.Graph('SQLAlchemy', identifier=GRAPH_NAME)
+        graph.open(self.specification.partition(':')[2])
+        try:
+            self.assertEqual(sorted(graph), sorted(set(expected_triples)))
+        finally:
+            graph.close()
+
+    def testInsertOrIgnore(self):
+        # Re-added triples, including ones stored by earlier batches and runs.
+        triple_count = self._add([_triples(0, 20) + _triples(0, 5), _triples(10, 30)])
+        self._assertStored(triple_count, _triples(0, 30))
+
+    def testAddN(self):
+        # Other databases and releases of rdflib-sqlalchemy use the store's addN().
+        self.addCleanup(setattr, stores, '_SQLALCHEMY_STORE_VERSION', stores._SQLALCHEMY_STORE_VERSION)
+        stores._SQLALCHEMY_STORE_VERSION = '0.0.'
+        with stores.open_store(self.specification, GRAPH_NAME) as graph:
+            self.assertFalse(graph._inserts_or_ignores())
+        triple_count = self._add([_triples(0, 20) + _triples(0, 5), _triples(10, 30)])
+        self._assertStored(triple_count, _triples(0, 30))
+
+
+class OpenStoreTest(unittest.TestCase):
+    """Tests for open_store()."""
+
+    def testMemoryStore(self):
+        graph = stores.open_store('IOMemory:unused', GRAPH_NAME, batch_size=7)
+        for triple in _triples(0, 10) + _triples(0, 10):
+            graph.add(triple)
+        graph.flush()
+        self.assertEqual(len(graph.graph), 30)
+        self.assertEqual(graph.triple_count, 30)
+
+    def testMalformed(self):
+        with self.assertRaises(ValueError):
+            stores.open_store('SQLAlchemy', GRAPH_NAME)
+
+
+if __name__ == '__main__':
+    unittest.main()
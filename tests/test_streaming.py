@@ -0,0 +1,178 @@
+"""Tests for the graph sinks writing triples out as they are added."""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import case
+import rdflib
+
+from case_plaso import streaming
+
+
+SUBJECT = rdflib.URIRef('http://example.org/message')
+GRAPH_NAME = rdflib.URIRef('file:///cases/image.plaso')
+
+TRIPLES = [
+    (SUBJECT, rdflib.URIRef('http://example.org/body'), rdflib.Literal(u'yo\nline')),
+    (SUBJECT, rdflib.URIRef('http://example.org/quoted'),
+     rdflib.Literal(u'say "hi"\r\n\\ \xe4 """', lang='en')),
+    (SUBJECT, rdflib.URIRef('http://example.org/count'), rdflib.Literal(2)),
+    (SUBJECT, rdflib.URIRef('http://example.org/sender'), rdflib.BNode('sender')),
+]
+
+
+class StreamingGraphTest(unittest.TestCase):
+    """Tests for StreamingGraph."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, name, format, triples):
+        destination = os.path.join(self.directory, name)
+        with streaming.StreamingGraph(destination, format=format, graph_name=GRAPH_NAME) as graph:
+            graph.add(triples[0])
+            graph.addN((subject, predicate, object_, None)
+                       for subject, predicate, object_ in triples[1:])
+        self.assertEqual(graph.triple_count, len(triples))
+        return destination
+
+    def _assertLines(self, destination, line_count):
+        # Each triple is written on a line of its own.
+        with io.open(destination, 'rb') as file_object:
+            self.assertEqual(len(file_object.readlines()), line_count)
+
+    def _assertTriples(self, triples, expected_triples):
+        # Blank node labels are not kept by the parser.
+        self.assertEqual(
+            sorted(triple for triple in triples if not isinstance(triple[2], rdflib.BNode)),
+            sorted(triple for triple in expected_triples if not isinstance(triple[2], rdflib.BNode)))
+        self.assertEqual(len(triples), len(expected_triples))
+
+    def testNTriples(self):
+        destination = self._write('output.nt', 'nt', TRIPLES)
+        self._assertLines(destination, len(TRIPLES))
+        self._assertTriples(list(rdflib.Graph().parse(destination, format='nt')), TRIPLES)
+
+    def testNQuads(self):
+        destination = self._write('output.nq', 'nquads', TRIPLES)
+        self._assertLines(destination, len(TRIPLES))
+        dataset = rdflib.ConjunctiveGraph()
+        dataset.parse(destination, format='nquads')
+        self._assertTriples(list(dataset.get_context(GRAPH_NAME)), TRIPLES)
+
+    def testAddNTriplesFile(self):
+        source = self._write('source.nt', 'nt', TRIPLES)
+        destination = os.path.join(self.directory, 'output.nq')
+        with streaming.StreamingGraph(destination, format='nquads', graph_name=GRAPH_NAME) as graph:
+            graph.add_ntriples_file(source)
+        self.assertEqual(graph.triple_count, len(TRIPLES))
+        dataset = rdflib.ConjunctiveGraph()
+        dataset.parse(destination, format='nquads')
+        self._assertTriples(list(dataset.get_context(GRAPH_NAME)), TRIPLES)
+
+
+class JsonLdStreamingGraphTest(unittest.TestCase):
+    """Tests for JsonLdStreamingGraph."""
+
+    # Including CASE terms, which are compacted with the context.
+    TRIPLES = TRIPLES + [
+        (SUBJECT, rdflib.RDF.type, case.CASE.Trace),
+        (SUBJECT, case.CASE.propertyBundle, rdflib.BNode('message')),
+        (rdflib.BNode('message'), rdflib.RDF.type, case.CASE.Message),
+        (rdflib.BNode('message'), case.CASE.sentTime,
+         rdflib.Literal(u'2016-09-08T19:45:34+00:00', datatype=rdflib.XSD.dateTime)),
+    ]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.destination = os.path.join(self.directory, 'output.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _expand(self):
+        """Reads the triples of the written document, which uses a fixed context."""
+        with open(self.destination) as file_object:
+            document = json.load(file_object)
+        context = document['@context']
+        self.assertEqual(context, streaming.JsonLdStreamingGraph.CONTEXT)
+
+        def _iri(term):
+            prefix, separator, name = term.partition(':')
+            if not separator:
+                return rdflib.URIRef(context['@vocab'] + term)
+            if prefix in context:
+                return rdflib.URIRef(context[prefix] + name)
+            return rdflib.URIRef(term)
+
+        def _node(node_id):
+            if node_id.startswith('_:'):
+                return rdflib.BNode(node_id[2:])
+            return rdflib.URIRef(node_id)
+
+        def _value(value):
+            if not isinstance(value, dict):
+                return rdflib.Literal(value)
+            if '@id' in value:
+                return _node(value['@id'])
+            if '@language' in value:
+                return rdflib.Literal(value['@value'], lang=value['@language'])
+            return rdflib.Literal(value['@value'], datatype=_iri(value['@type']))
+
+        triples = []
+        for node in document['@graph']:
+            subject = _node(node['@id'])
+            for key, values in node.items():
+                if key == '@id':
+                    continue
+                if not isinstance(values, list):
+                    values = [values]
+                for value in values:
+                    if key == '@type':
+                        triples.append((subject, rdflib.RDF.type, _iri(value)))
+                    else:
+                        triples.append((subject, _iri(key), _value(value)))
+        return triples
+
+    def testDocument(self):
+        with streaming.JsonLdStreamingGraph(self.destination, batch_size=3) as graph:
+            graph.addN(triple + (None,) for triple in self.TRIPLES)
+        self.assertEqual(graph.triple_count, len(self.TRIPLES))
+        self.assertEqual(sorted(self._expand()), sorted(self.TRIPLES))
+
+    def testResume(self):
+        graph = streaming.JsonLdStreamingGraph(self.destination, batch_size=2)
+        for triple in self.TRIPLES[:4]:
+            graph.add(triple)
+        graph.flush()
+        offset = graph.tell()
+        # Written after the checkpoint, so discarded when resuming.
+        for triple in self.TRIPLES[4:6]:
+            graph.add(triple)
+        graph.flush()
+        graph._file.close()
+
+        with streaming.JsonLdStreamingGraph(self.destination, offset=offset, batch_size=2) as graph:
+            for triple in self.TRIPLES[4:]:
+                graph.add(triple)
+        self.assertEqual(sorted(self._expand()), sorted(self.TRIPLES))
+
+    @unittest.skipUnless(
+        'json-ld' in [plugin.name for plugin in rdflib.plugin.plugins(kind=rdflib.parser.Parser)],
+        'rdflib-jsonld is not installed')
+    def testParse(self):
+        with streaming.JsonLdStreamingGraph(self.destination, batch_size=3) as graph:
+            graph.addN(triple + (None,) for triple in self.TRIPLES)
+        parsed_graph = rdflib.Graph().parse(self.destination, format='json-ld')
+        self.assertEqual(len(parsed_graph), len(self.TRIPLES))
+
+
+if __name__ == '__main__':
+    unittest.main()